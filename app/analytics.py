@@ -0,0 +1,192 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Fuso usado nos mapas de hora/dia da semana (horas em relação ao UTC; padrão Brasília)
+STATS_UTC_OFFSET_MS = int(float(os.getenv('STATS_UTC_OFFSET', '-3')) * 3600 * 1000)
+ANALYTICS_MAX_USERS = int(os.getenv('ANALYTICS_MAX_USERS', '500'))
+DAY_MS = 86400000
+HOUR_MS = 3600000
+WEEKDAYS = ['Seg', 'Ter', 'Qua', 'Qui', 'Sex', 'Sáb', 'Dom']
+TOP_N = 5
+
+
+class Column:
+    """Coluna NumPy que cresce por duplicação, com append amortizado O(1)"""
+
+    def __init__(self, dtype, capacity=256):
+        self._data = np.empty(capacity, dtype=dtype)
+        self.size = 0
+
+    def extend(self, values):
+        end = self.size + len(values)
+        if end > len(self._data):
+            grown = np.empty(max(end, 2 * len(self._data)), dtype=self._data.dtype)
+            grown[:self.size] = self._data[:self.size]
+            self._data = grown
+        self._data[self.size:end] = values
+        self.size = end
+
+    @property
+    def values(self):
+        return self._data[:self.size]
+
+
+def add_counts(totals, ids, size):
+    """Soma as ocorrências de ids ao vetor de contagens, crescendo-o se surgiram ids novos"""
+    counts = np.bincount(ids, minlength=size)
+    if len(totals) < size:
+        totals = np.concatenate([totals, np.zeros(size - len(totals), dtype=totals.dtype)])
+    return totals + counts
+
+
+def streaks(days, today):
+    """(sequência atual, maior sequência) de dias consecutivos com reprodução"""
+    if not len(days):
+        return 0, 0
+    breaks = np.flatnonzero(np.diff(days) != 1)
+    starts = np.concatenate([[0], breaks + 1])
+    ends = np.concatenate([breaks, [len(days) - 1]])
+    runs = ends - starts + 1
+    current = int(runs[-1]) if days[-1] >= today - 1 else 0
+    return current, int(runs.max())
+
+
+class ListeningStats:
+    """Reproduções de um usuário em colunas NumPy e os agregados mantidos a cada lote novo.
+
+    Cada lote só toca as linhas novas; o resumo trabalha sobre contagens por
+    artista/música e dias distintos, então não cresce com o total de reproduções.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()  # um resumo por vez para o mesmo usuário
+        self.watermark = 0
+        self.played_at = Column(np.int64)
+        self.track = Column(np.int32)
+        self.artist = Column(np.int32)
+        self.duration = Column(np.int32)
+        self.track_ids, self.track_names = {}, []
+        self.artist_ids, self.artist_keys, self.artist_names = {}, [], []
+        self.heatmap = np.zeros((7, 24), dtype=np.int64)
+        self.track_plays = np.zeros(0, dtype=np.int64)
+        self.artist_plays = np.zeros(0, dtype=np.int64)
+        self.days = np.zeros(0, dtype=np.int64)
+        self.total_ms = 0
+
+    def _code(self, ids, names, key, name, keys=None):
+        code = ids.get(key)
+        if code is None:
+            code = ids[key] = len(names)
+            names.append(name or '')
+            if keys is not None:
+                keys.append(key)
+        return code
+
+    def append(self, rows):
+        """rows: (played_at_ms, track_id, track_name, artist_id, artist_name, duration_ms) em ordem cronológica"""
+        n = len(rows)
+        played_at = np.fromiter((r[0] for r in rows), np.int64, n)
+        track = np.fromiter((self._code(self.track_ids, self.track_names, r[1], r[2]) for r in rows), np.int32, n)
+        artist = np.fromiter(
+            (self._code(self.artist_ids, self.artist_names, r[3] or '', r[4], self.artist_keys) for r in rows), np.int32, n,
+        )
+        duration = np.fromiter((r[5] or 0 for r in rows), np.int32, n)
+        for column, values in ((self.played_at, played_at), (self.track, track), (self.artist, artist), (self.duration, duration)):
+            column.extend(values)
+
+        local = played_at + STATS_UTC_OFFSET_MS
+        day = local // DAY_MS
+        hour = (local % DAY_MS) // HOUR_MS
+        weekday = (day + 3) % 7  # 01/01/1970 foi quinta-feira; 0 = segunda
+        np.add.at(self.heatmap, (weekday, hour), 1)
+
+        self.track_plays = add_counts(self.track_plays, track, len(self.track_names))
+        self.artist_plays = add_counts(self.artist_plays, artist, len(self.artist_names))
+        self.total_ms += int(duration.sum(dtype=np.int64))
+
+        new_days = np.unique(day)
+        if len(self.days):
+            new_days = new_days[new_days > self.days[-1]]
+        self.days = np.concatenate([self.days, new_days])
+        self.watermark = int(played_at[-1])
+
+    def top(self, plays, names, n=TOP_N):
+        order = np.argsort(-plays, kind='stable')[:n]
+        return [{'name': names[i], 'plays': int(plays[i])} for i in order if plays[i] > 0]
+
+    def genre_shares(self, genres_by_artist, n=8):
+        """Fração das reproduções (de artistas com gênero conhecido) em que cada gênero aparece"""
+        totals, known = {}, 0
+        for artist_id, genres in genres_by_artist.items():
+            code = self.artist_ids.get(artist_id)
+            if code is None or not genres:
+                continue
+            plays = int(self.artist_plays[code])
+            known += plays
+            for genre in genres:
+                totals[genre] = totals.get(genre, 0) + plays
+        if not known:
+            return []
+        ranked = sorted(totals.items(), key=lambda item: -item[1])[:n]
+        return [{'genre': genre, 'share': round(plays / known, 3)} for genre, plays in ranked]
+
+    def summary(self, genres_by_artist, now_ms=None):
+        now_ms = now_ms or int(time.time() * 1000)
+        played_at = self.played_at.values
+        # Colunas em ordem cronológica: a janela recente é uma busca binária
+        recent = np.searchsorted(played_at, now_ms - 30 * DAY_MS)
+        current, longest = streaks(self.days, (now_ms + STATS_UTC_OFFSET_MS) // DAY_MS)
+        peak = np.unravel_index(int(np.argmax(self.heatmap)), self.heatmap.shape)
+        return {
+            'total_plays': int(self.played_at.size),
+            'minutes': round(self.total_ms / 60000),
+            'minutes_last_30_days': round(int(self.duration.values[recent:].sum(dtype=np.int64)) / 60000),
+            'heatmap': self.heatmap.tolist(),
+            'heatmap_max': int(self.heatmap.max()),
+            'weekdays': WEEKDAYS,
+            'peak': {'weekday': WEEKDAYS[peak[0]], 'hour': int(peak[1])} if self.played_at.size else None,
+            'streak': {'current': current, 'longest': longest},
+            'active_days': int(len(self.days)),
+            'top_tracks': self.top(self.track_plays, self.track_names),
+            'top_artists': self.top(self.artist_plays, self.artist_names),
+            'genres': self.genre_shares(genres_by_artist),
+        }
+
+
+class AnalyticsEngine:
+    """Estatísticas de audição por usuário sobre o histórico local, atualizadas incrementalmente"""
+
+    def __init__(self, history, max_users=ANALYTICS_MAX_USERS):
+        self.history = history
+        self.max_users = max_users
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _stats(self, user_key):
+        stats = self._users.get(user_key)
+        if stats is None:
+            stats = self._users[user_key] = ListeningStats()
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        self._users.move_to_end(user_key)
+        return stats
+
+    def summary(self, user_key):
+        with self._lock:
+            stats = self._stats(user_key)
+        # Trava só deste usuário: o primeiro resumo de um histórico longo não segura o /stats dos outros
+        with stats.lock:
+            # Só as reproduções que chegaram desde o último resumo
+            rows = self.history.plays_since(user_key, stats.watermark)
+            if rows:
+                stats.append(rows)
+            played_artists = [stats.artist_keys[i] for i in np.flatnonzero(stats.artist_plays)]
+            return stats.summary(self.history.artist_genres(played_artists))
+
+    def discard(self, user_key):
+        with self._lock:
+            self._users.pop(user_key, None)
@@ -0,0 +1,442 @@
+"""Modo de execução assíncrono (ASGI) com as mesmas rotas do app Flask.
+
+Uso: uvicorn asgi:app --host 0.0.0.0 --port 8000
+
+As chamadas ao Spotify usam uma aiohttp.ClientSession compartilhada, então um único
+processo mantém milhares de chamadas em andamento sem uma thread por requisição.
+Cache, tokens, perfis, templates, a sessão e os loaders das páginas são os mesmos do main.py.
+"""
+import asyncio
+import json
+import queue
+from contextlib import asynccontextmanager
+from functools import partial
+from urllib.parse import quote
+
+from itsdangerous import BadSignature
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.responses import HTMLResponse, JSONResponse, PlainTextResponse, RedirectResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+import main
+from assets import CompressionMiddleware, manifest
+from cache import CachedSpotify, user_cache_key
+from export import EXPORT_FORMATS, parse_sections
+from fanout import run_steps_async
+from metrics import MetricsMiddleware, metrics_denied, registry, timed_render
+from models import Track
+from nowplaying import HEARTBEAT_INTERVAL, now_playing_state
+from paging import STREAM_PAGES, InvalidCursor, list_context
+from playlists import PlaylistNotFound
+from search_index import SUGGEST_LIMIT, UPSTREAM_LIMIT
+from sessions import ServerSideSessionInterface, cookie_max_age, cookie_options
+from spotify_async import AsyncCachedSpotify, AsyncSpotify, close_http_client
+from templates_registry import TEMPLATES
+from transport import create_spotify
+from views import json_etag, playlist_payload
+
+# Mesma sessão do Flask (store no servidor ou cookie assinado): vale nos dois modos
+session_interface = main.app.session_interface
+SESSION_COOKIE = main.app.config['SESSION_COOKIE_NAME']
+SESSION_MAX_AGE = cookie_max_age(main.app)
+SESSION_COOKIE_OPTIONS = cookie_options(session_interface, main.app)
+
+
+async def load_session(raw):
+    if isinstance(session_interface, ServerSideSessionInterface):
+        return await asyncio.to_thread(session_interface.load, raw)
+    if raw:
+        try:
+            return dict(session_interface.get_signing_serializer(main.app).loads(raw, max_age=SESSION_MAX_AGE))
+        except BadSignature:
+            pass
+    return {}
+
+
+async def save_session(session, original, response):
+    # Mesmo cookie do Flask: atributos de SESSION_COOKIE_* e validade de PERMANENT_SESSION_LIFETIME
+    if isinstance(session_interface, ServerSideSessionInterface):
+        action = await asyncio.to_thread(session_interface.cookie_action, main.app, session)
+        if action == 'set':
+            response.set_cookie(SESSION_COOKIE, session.sid, max_age=SESSION_MAX_AGE, **SESSION_COOKIE_OPTIONS)
+        elif action == 'delete':
+            response.delete_cookie(SESSION_COOKIE, **SESSION_COOKIE_OPTIONS)
+    elif session != original:
+        if session:
+            # Como no SecureCookieSessionInterface: só sessões permanentes sobrevivem ao fechar o navegador
+            response.set_cookie(
+                SESSION_COOKIE, session_interface.get_signing_serializer(main.app).dumps(session),
+                max_age=SESSION_MAX_AGE if session.get('_permanent') else None, **SESSION_COOKIE_OPTIONS,
+            )
+        else:
+            response.delete_cookie(SESSION_COOKIE, **SESSION_COOKIE_OPTIONS)
+
+
+def with_session(handler):
+    """Carrega a sessão em request.state.session e grava de volta ao fim da requisição"""
+    async def endpoint(request):
+        session = await load_session(request.cookies.get(SESSION_COOKIE))
+        original = dict(session)
+        request.state.session = session
+        response = await handler(request)
+        await save_session(session, original, response)
+        return response
+    return endpoint
+
+
+def current_user_key(session):
+    return session.get('user_key') or user_cache_key(session['token_info'])
+
+
+async def get_spotify_client(session):
+    token_info = session.get('token_info')
+    if not token_info:
+        return None
+    user_key = current_user_key(session)
+    # Como no Flask, o token vem do store compartilhado (outro worker pode já ter renovado);
+    # o TokenManager é síncrono e o store pode ser o Redis, então roda fora do event loop
+    try:
+        token_info = await asyncio.to_thread(main.token_manager.get_token, user_key, token_info)
+    except Exception:
+        return None
+    if token_info['access_token'] != session['token_info']['access_token']:
+        session['token_info'] = token_info
+    return AsyncCachedSpotify(AsyncSpotify(token_info['access_token'], user_key=user_key), main.response_cache, user_key)
+
+
+def render_page(name, **context):
+    return HTMLResponse(timed_render(name, lambda: TEMPLATES[name].render(**context)))
+
+
+def load_request(request):
+    return main.LoadRequest(current_user_key(request.state.session), request.query_params, request.path_params)
+
+
+async def load_one(load, request, sp):
+    """Loader do main.py executado com o cliente assíncrono"""
+    return await run_steps_async(load(load_request(request)), sp)
+
+
+async def load_list(load, request, sp):
+    """Mesmas páginas iniciais do modo Flask, carregadas antes de renderizar (sem streaming)"""
+    req = load_request(request)
+    first = await run_steps_async(load(req), sp)
+    pages = [first]
+    while len(pages) < STREAM_PAGES and pages[-1]['next_cursor']:
+        try:
+            pages.append(await run_steps_async(load(req, pages[-1]['next_cursor']), sp))
+        except Exception:
+            break  # o cursor continua no HTML: a rolagem tenta essa página de novo
+    return list_context(first, pages)
+
+
+PAGES = {
+    '/dashboard': (partial(load_one, main.load_dashboard), 'dashboard.html', 'Erro ao carregar dashboard'),
+    '/stats': (partial(load_one, main.load_stats), 'stats.html', 'Erro ao carregar estatísticas'),
+    '/top-artists': (partial(load_list, main.load_top_artists), 'top_artists.html', 'Erro ao carregar top artistas'),
+    '/recent': (partial(load_list, main.load_recent), 'recent.html', 'Erro ao carregar músicas recentes'),
+    '/top-tracks': (partial(load_list, main.load_top_tracks), 'top_tracks.html', 'Erro ao carregar top tracks'),
+    '/playlists': (partial(load_one, main.load_playlists), 'playlists.html', 'Erro ao carregar playlists'),
+}
+
+
+async def index(request):
+    code = request.query_params.get('code')
+    if code:
+        return RedirectResponse(f'/callback?code={quote(code)}', status_code=302)
+    return render_page('index.html')
+
+
+async def login(request):
+    return RedirectResponse(main.get_spotify_oauth().get_authorize_url(), status_code=302)
+
+
+async def callback(request):
+    code = request.query_params.get('code')
+    error = request.query_params.get('error')
+
+    if error:
+        return PlainTextResponse(f"Erro na autorização: {error}")
+    if not code:
+        return PlainTextResponse("Código de autorização não encontrado")
+
+    try:
+        sp_oauth = main.get_spotify_oauth()
+        token_info = await asyncio.to_thread(sp_oauth.get_access_token, code, as_dict=True)
+        user_key = user_cache_key(token_info)
+        if hasattr(request.state.session, 'rotate'):
+            request.state.session.rotate()
+        request.state.session['token_info'] = token_info
+        request.state.session['user_key'] = user_key
+        main.token_manager.save(user_key, token_info)
+        main.profile_store.put(user_key, await AsyncSpotify(token_info['access_token'], user_key=user_key).current_user())
+        return RedirectResponse('/dashboard', status_code=302)
+    except Exception as e:
+        return PlainTextResponse(f"Erro ao obter token: {e}")
+
+
+async def page(request):
+    load, template, error_message = PAGES[request.url.path]
+    session = request.state.session
+    sp = await get_spotify_client(session)
+    if not sp:
+        return RedirectResponse('/login', status_code=302)
+
+    try:
+        return render_page(template, **await load(request, sp))
+    except Exception as e:
+        return PlainTextResponse(f"{error_message}: {e}")
+
+
+async def search(request):
+    query = request.query_params.get('q', '')
+    tracks = []
+
+    if query:
+        sp = await get_spotify_client(request.state.session)
+        if sp:
+            try:
+                results = await sp.search(q=query, type='track', limit=15)
+                if results and 'tracks' in results and 'items' in results['tracks']:
+                    tracks = [Track.from_api(t) for t in results['tracks']['items'] if t]
+                    main.remember_tracks(current_user_key(request.state.session), tracks)
+            except Exception as e:
+                return PlainTextResponse(f"Erro na busca: {e}")
+
+    return render_page('search.html', query=query, tracks=tracks)
+
+
+async def search_suggest(request):
+    query = request.query_params.get('q', '')
+    session = request.state.session
+    sp = await get_spotify_client(session)
+    if not sp:
+        return JSONResponse({'success': False, 'error': 'Não autenticado'}, status_code=401)
+
+    user_key = current_user_key(session)
+    items, upstream_query = main.search_index.lookup(user_key, query)
+    source = 'index'
+    if upstream_query:
+        try:
+            results = await sp.search(q=upstream_query, type='track', limit=UPSTREAM_LIMIT)
+            items = main.search_index.merge_upstream(user_key, query, items, results)
+            source = 'spotify'
+        except Exception as e:
+            if not items:
+                return JSONResponse({'success': False, 'error': str(e)}, status_code=502)
+    return JSONResponse({'query': query, 'source': source, 'items': items[:SUGGEST_LIMIT]})
+
+
+def etag_response(request, body, etag):
+    headers = {'ETag': f'"{etag}"', 'Cache-Control': 'private, no-cache'}
+    if_none_match = request.headers.get('if-none-match', '')
+    if f'"{etag}"' in [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')] or if_none_match.strip() == '*':
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type='application/json', headers=headers)
+
+
+async def json_view(request):
+    view = request.path_params['view']
+    if view not in main.JSON_VIEWS:
+        return JSONResponse({'success': False, 'error': 'Não encontrado'}, status_code=404)
+    session = request.state.session
+    sp = await get_spotify_client(session)
+    if not sp:
+        return JSONResponse({'success': False, 'error': 'Não autenticado'}, status_code=401)
+
+    load, payload = main.JSON_VIEWS[view]
+    try:
+        body, etag = json_etag(payload(await load_one(load, request, sp)))
+    except InvalidCursor as e:
+        return JSONResponse({'success': False, 'error': str(e)}, status_code=400)
+    except Exception as e:
+        return JSONResponse({'success': False, 'error': str(e)}, status_code=502)
+    return etag_response(request, body, etag)
+
+
+async def playlist_detail(request):
+    sp = await get_spotify_client(request.state.session)
+    if not sp:
+        return RedirectResponse('/login', status_code=302)
+
+    try:
+        return render_page('playlist.html', **await load_list(main.load_playlist, request, sp))
+    except PlaylistNotFound as e:
+        return PlainTextResponse(str(e), status_code=404)
+    except Exception as e:
+        return PlainTextResponse(f"Erro ao carregar playlist: {e}")
+
+
+async def playlist_json(request):
+    sp = await get_spotify_client(request.state.session)
+    if not sp:
+        return JSONResponse({'success': False, 'error': 'Não autenticado'}, status_code=401)
+
+    try:
+        body, etag = json_etag(playlist_payload(await load_one(main.load_playlist, request, sp)))
+    except InvalidCursor as e:
+        return JSONResponse({'success': False, 'error': str(e)}, status_code=400)
+    except PlaylistNotFound as e:
+        return JSONResponse({'success': False, 'error': str(e)}, status_code=404)
+    except Exception as e:
+        return JSONResponse({'success': False, 'error': str(e)}, status_code=502)
+    return etag_response(request, body, etag)
+
+
+async def playback_command(request):
+    session = request.state.session
+    sp = await get_spotify_client(session)
+    if not sp:
+        return JSONResponse({'success': False, 'error': 'Não autenticado'})
+
+    user_key = current_user_key(session)
+    try:
+        profile = await main.profile_store.get_async(user_key, sp)
+    except Exception:
+        profile = {}
+    if profile.get('product') != 'premium':
+        return JSONResponse({'success': False, 'error': 'Spotify Premium necessário'})
+
+    command = main.PLAYBACK_COMMANDS[request.url.path.rsplit('/', 1)[1]]
+    try:
+        state = main.playback_pipeline.known_state(user_key)
+        if state is None and command == 'toggle':
+            state = now_playing_state(await sp.current_user_playing_track())
+        _, optimistic = main.playback_pipeline.submit(
+            user_key, command, main.make_client_factory(user_key, True, session['token_info']), state or {},
+        )
+        return JSONResponse({'success': True, 'state': optimistic})
+    except Exception as e:
+        return JSONResponse({'success': False, 'error': str(e)})
+
+
+async def export_library(request):
+    session = request.state.session
+    if not await get_spotify_client(session):
+        return JSONResponse({'success': False, 'error': 'Não autenticado'}, status_code=401)
+
+    fmt = request.query_params.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        return JSONResponse({'success': False, 'error': f'Formato inválido: {fmt}'}, status_code=400)
+    try:
+        sections = parse_sections(request.query_params.get('sections'))
+    except ValueError as e:
+        return JSONResponse({'success': False, 'error': str(e)}, status_code=400)
+    # O exportador é síncrono: o Starlette consome o gerador numa thread do pool
+    user_key = current_user_key(session)
+    sp = CachedSpotify(create_spotify(session['token_info']['access_token'], user_key), main.response_cache, user_key)
+    encode, media_type, filename = EXPORT_FORMATS[fmt]
+    return StreamingResponse(
+        encode(main.exporter.records(user_key, sp, sections)), media_type=media_type,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"', 'Cache-Control': 'no-store'},
+    )
+
+
+async def lyrics(request):
+    if not request.state.session.get('token_info'):
+        return JSONResponse({'success': False, 'error': 'Não autenticado'}, status_code=401)
+
+    track = request.query_params.get('track', '').strip()
+    artist = request.query_params.get('artist', '').strip()
+    if not track or not artist:
+        return JSONResponse({'success': False, 'error': 'Informe track e artist'}, status_code=400)
+    try:
+        # Cache em SQLite e provedor síncronos: numa thread para não travar o event loop
+        text, source = await asyncio.to_thread(main.lyrics_cache.get, track, artist)
+    except Exception as e:
+        return JSONResponse({'success': False, 'error': f'Erro ao buscar letra: {e}'}, status_code=502)
+    headers = {'Cache-Control': 'private, max-age=3600'}
+    if text is None:
+        return JSONResponse({'success': False, 'error': 'Letra não encontrada'}, status_code=404, headers=headers)
+    return JSONResponse({'success': True, 'lyrics': text, 'source': source}, headers=headers)
+
+
+async def now_playing_stream(request):
+    session = request.state.session
+    if not await get_spotify_client(session):
+        return JSONResponse({'success': False, 'error': 'Não autenticado'}, status_code=401)
+    user_key = current_user_key(session)
+    poller, q = main.now_playing_hub.subscribe(user_key, main.make_client_factory(user_key))
+
+    async def events():
+        # O poller roda em thread; aqui a fila é lida sem bloquear o event loop
+        try:
+            yield 'retry: 5000\n\n'
+            idle = 0.0
+            while True:
+                try:
+                    state = q.get_nowait()
+                except queue.Empty:
+                    await asyncio.sleep(0.5)
+                    idle += 0.5
+                    if idle >= HEARTBEAT_INTERVAL:
+                        idle = 0.0
+                        yield ': ping\n\n'
+                    continue
+                idle = 0.0
+                yield f'event: now-playing\ndata: {json.dumps(state)}\n\n'
+        finally:
+            poller.unsubscribe(q)
+
+    return StreamingResponse(
+        events(), media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+async def static_asset(request):
+    status, body, headers = manifest.response(
+        request.path_params['filename'], request.headers.get('accept-encoding'), request.headers.get('if-none-match'),
+    )
+    return Response(body, status_code=status, headers=headers)
+
+
+async def metrics(request):
+    status = metrics_denied(request.headers.get('authorization'))
+    if status is not None:
+        return Response(status_code=status, headers={'WWW-Authenticate': 'Bearer'} if status == 401 else {})
+    return PlainTextResponse(registry.render(), media_type='text/plain; version=0.0.4')
+
+
+async def logout(request):
+    session = request.state.session
+    if session.get('token_info'):
+        user_key = current_user_key(session)
+        main.profile_store.discard(user_key)
+        main.search_index.discard(user_key)
+        main.analytics.discard(user_key)
+        main.playback_pipeline.discard(user_key)
+        main.token_manager.discard(user_key)
+    session.clear()
+    return RedirectResponse('/', status_code=302)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await close_http_client()
+
+
+routes = [
+    Route('/', with_session(index)),
+    Route('/login', with_session(login)),
+    Route('/callback', with_session(callback)),
+    *[Route(path, with_session(page)) for path in PAGES],
+    Route('/search', with_session(search)),
+    Route('/api/search/suggest', with_session(search_suggest)),
+    Route('/api/toggle-playback', with_session(playback_command), methods=['POST']),
+    Route('/api/next-track', with_session(playback_command), methods=['POST']),
+    Route('/api/previous-track', with_session(playback_command), methods=['POST']),
+    Route('/api/now-playing/stream', with_session(now_playing_stream)),
+    Route('/api/export', with_session(export_library)),
+    Route('/api/lyrics', with_session(lyrics)),
+    Route('/static/{filename:path}', static_asset),
+    Route('/metrics', metrics),
+    Route('/playlists/{playlist_id}', with_session(playlist_detail)),
+    Route('/api/playlists/{playlist_id}', with_session(playlist_json)),
+    Route('/api/{view}', with_session(json_view)),
+    Route('/logout', with_session(logout)),
+]
+
+app = Starlette(routes=routes, lifespan=lifespan, middleware=[Middleware(MetricsMiddleware), Middleware(CompressionMiddleware)])
@@ -0,0 +1,214 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import zlib
+
+from starlette.datastructures import MutableHeaders
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli
+except ImportError:  # sem brotli, só gzip
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+# Respostas menores que isso não compensam compressão
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', '5'))
+COMPRESSIBLE = {'text/html', 'application/json', 'application/x-ndjson', 'text/css', 'text/javascript', 'application/javascript'}
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def encodings():
+    return ['br', 'gzip'] if brotli else ['gzip']
+
+
+def choose_encoding(accept_encoding):
+    """Melhor codificação aceita pelo cliente (None se nenhuma)"""
+    if not accept_encoding:
+        return None
+    return parse_accept_header(accept_encoding).best_match(encodings())
+
+
+def compress(data, encoding, best=False):
+    if encoding == 'br':
+        return brotli.compress(data, quality=11 if best else BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=9 if best else GZIP_LEVEL, mtime=0)
+
+
+def compress_stream(chunks, encoding):
+    """Comprime um corpo em streaming, descarregando o compressor a cada COMPRESS_MIN_SIZE bytes
+    para que cada parte (ex.: uma página de linhas) chegue ao navegador assim que é gerada"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        process, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        process, finish = compressor.compress, compressor.flush
+        flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)
+    pending = 0
+    for chunk in chunks:
+        data = process(chunk)
+        pending += len(chunk)
+        if pending >= COMPRESS_MIN_SIZE:
+            data += flush()
+            pending = 0
+        if data:
+            yield data
+    yield finish()
+
+
+class Asset:
+    """Arquivo estático em memória, com o hash do conteúdo e as versões pré-comprimidas"""
+
+    def __init__(self, path, data):
+        self.path = path
+        self.mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if self.mimetype.startswith('text/') or self.mimetype == 'application/javascript':
+            self.mimetype += '; charset=utf-8'
+        self.digest = hashlib.sha256(data).hexdigest()[:12]
+        root, ext = os.path.splitext(path)
+        self.hashed_path = f'{root}.{self.digest}{ext}'
+        self.variants = {None: data}
+        if len(data) >= COMPRESS_MIN_SIZE and self.mimetype.split(';')[0] in COMPRESSIBLE:
+            for encoding in encodings():
+                self.variants[encoding] = compress(data, encoding, best=True)
+
+
+class AssetManifest:
+    """Arquivos de app/static carregados na inicialização: nome lógico -> nome com hash"""
+
+    def __init__(self, root=STATIC_DIR):
+        self.assets = {}
+        self.by_url = {}
+        for directory, _, files in os.walk(root):
+            for name in sorted(files):
+                full = os.path.join(directory, name)
+                path = os.path.relpath(full, root).replace(os.sep, '/')
+                with open(full, 'rb') as f:
+                    asset = Asset(path, f.read())
+                self.assets[path] = asset
+                self.by_url[asset.hashed_path] = (asset, True)
+                self.by_url.setdefault(path, (asset, False))
+
+    def url(self, path):
+        """URL com o hash do conteúdo: muda sempre que o arquivo muda"""
+        return f'/static/{self.assets[path].hashed_path}'
+
+    def response(self, filename, accept_encoding=None, if_none_match=None):
+        """(status, corpo, cabeçalhos) do arquivo pedido, na melhor codificação aceita"""
+        found = self.by_url.get(filename)
+        if found is None:
+            return 404, b'', {}
+        asset, hashed = found
+        encoding = choose_encoding(accept_encoding)
+        if encoding not in asset.variants:
+            encoding = None
+        headers = {
+            'Cache-Control': IMMUTABLE if hashed else 'no-cache',
+            'ETag': f'"{asset.digest}"',
+            'Vary': 'Accept-Encoding',
+        }
+        if if_none_match and f'"{asset.digest}"' in if_none_match:
+            return 304, b'', headers
+        headers['Content-Type'] = asset.mimetype
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        return 200, asset.variants[encoding], headers
+
+
+manifest = AssetManifest()
+
+
+def static_url(path):
+    return manifest.url(path)
+
+
+def should_compress(status, headers, size=None):
+    """size None: corpo em streaming, tamanho desconhecido"""
+    return (
+        200 <= status < 300 and status != 204
+        and (size is None or size >= COMPRESS_MIN_SIZE)
+        and 'Content-Encoding' not in headers
+        and (headers.get('Content-Type') or '').split(';')[0].strip() in COMPRESSIBLE
+    )
+
+
+def weak_etag(etag):
+    """O corpo comprimido não é byte a byte o original: o ETag passa a ser fraco"""
+    return etag if not etag or etag.startswith('W/') else f'W/{etag}'
+
+
+def init_assets(app):
+    """Rota /static com arquivos versionados, static_url nos templates e compressão das respostas"""
+    from flask import Response, request
+
+    app.jinja_env.globals['static_url'] = static_url
+
+    @app.route('/static/<path:filename>')
+    def static_asset(filename):
+        status, body, headers = manifest.response(
+            filename, request.headers.get('Accept-Encoding'), request.headers.get('If-None-Match'),
+        )
+        return Response(body, status, headers)
+
+    @app.after_request
+    def compress_response(response):
+        if response.direct_passthrough:
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+        if response.is_streamed:
+            # HTML em streaming é comprimido parte a parte; SSE e outros tipos passam direto
+            if encoding and should_compress(response.status_code, response.headers):
+                response.response = compress_stream(response.iter_encoded(), encoding)
+                response.headers['Content-Encoding'] = encoding
+                response.headers.pop('Content-Length', None)
+            return response
+        if not encoding or not should_compress(response.status_code, response.headers, len(response.get_data())):
+            return response
+        response.set_data(compress(response.get_data(), encoding))
+        response.headers['Content-Encoding'] = encoding
+        if 'ETag' in response.headers:
+            response.headers['ETag'] = weak_etag(response.headers['ETag'])
+        return response
+
+
+class CompressionMiddleware:
+    """Middleware ASGI equivalente ao compress_response; respostas em streaming passam direto"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        accept = dict(scope['headers']).get(b'accept-encoding', b'').decode('latin-1')
+        encoding = choose_encoding(accept)
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message['type'] == 'http.response.start':
+                start = message
+                return
+            if start is None:
+                return await send(message)
+            headers = MutableHeaders(raw=start['headers'])
+            body = message.get('body', b'')
+            if 'Content-Encoding' not in headers:
+                headers.add_vary_header('Accept-Encoding')
+            if encoding and not message.get('more_body') and should_compress(start['status'], headers, len(body)):
+                body = compress(body, encoding)
+                headers['Content-Encoding'] = encoding
+                headers['Content-Length'] = str(len(body))
+                if 'ETag' in headers:
+                    headers['ETag'] = weak_etag(headers['ETag'])
+                message = {**message, 'body': body}
+            await send({**start, 'headers': headers.raw})
+            start = None
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
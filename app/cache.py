@@ -0,0 +1,335 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# TTL (segundos) por endpoint do Spotify. Métodos fora desta tabela não são cacheados.
+CACHE_TTLS = {
+    'current_user_top_tracks': 3600,
+    'current_user_top_artists': 3600,
+    'current_user': 600,
+    'search': 300,
+    'current_user_recently_played': 60,
+    'current_user_playing_track': 5,
+    'devices': 5,
+}
+
+# Comandos de reprodução invalidam o estado do player cacheado para o usuário
+INVALIDATES = {
+    'start_playback': ('current_user_playing_track', 'devices'),
+    'pause_playback': ('current_user_playing_track', 'devices'),
+    'next_track': ('current_user_playing_track', 'current_user_recently_played'),
+    'previous_track': ('current_user_playing_track', 'current_user_recently_played'),
+}
+
+REDIS_URL = os.getenv('REDIS_URL', 'redis://redis:6379/0')
+MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '5000'))
+
+
+class MemoryBackend:
+    """Cache em processo com TTL por entrada e despejo LRU"""
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisBackend:
+    """Cache no Redis do docker-compose; o LRU fica a cargo do maxmemory-policy do Redis"""
+
+    def __init__(self, client, namespace='spotify-cache:'):
+        self.client = client
+        self.namespace = namespace
+
+    def get(self, key):
+        raw = self.client.get(self.namespace + key)
+        if raw is None:
+            return None
+        return json.loads(raw)
+
+    def set(self, key, value, ttl):
+        self.client.setex(self.namespace + key, int(max(1, ttl)), json.dumps(value))
+
+    def delete_prefix(self, prefix):
+        keys = list(self.client.scan_iter(match=self.namespace + prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+class FakeRedis:
+    """Substituto local do cliente redis (get/set/setex/expire/delete/scan_iter) para testes"""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key, value, ex=None, nx=False):
+        with self._lock:
+            if nx and key in self._data and (self._data[key][0] is None or self._data[key][0] > time.monotonic()):
+                return None
+            expires_at = time.monotonic() + ex if ex else None
+            self._data[key] = (expires_at, value if isinstance(value, bytes) else str(value).encode())
+        return True
+
+    def setex(self, key, ttl, value):
+        return self.set(key, value, ex=ttl)
+
+    def expire(self, key, ttl):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or (entry[0] is not None and entry[0] <= time.monotonic()):
+                return False
+            self._data[key] = (time.monotonic() + ttl, entry[1])
+        return True
+
+    def delete(self, *keys):
+        with self._lock:
+            return sum(1 for key in keys if self._data.pop(key, None) is not None)
+
+    def scan_iter(self, match='*'):
+        prefix = match.rstrip('*')
+        with self._lock:
+            return [k for k in self._data if k.startswith(prefix)]
+
+
+class FlightCancelled(Exception):
+    """A chamada compartilhada foi cancelada antes de terminar; quem esperava por ela recebe este erro"""
+
+
+async def wait_shared(future):
+    """Espera um Future compartilhado sem propagar o próprio cancelamento para ele"""
+    waiter = asyncio.wrap_future(future)
+    # O resultado é lido mesmo se ninguém mais espera, para não gerar "exception was never retrieved"
+    waiter.add_done_callback(lambda f: f.cancelled() or f.exception())
+    return await asyncio.shield(waiter)
+
+
+class SingleFlight:
+    """Chamadas idênticas simultâneas (usuário, endpoint, parâmetros) compartilham uma ida ao Spotify"""
+
+    def __init__(self):
+        self._inflight = {}  # chave -> Future
+        self._lock = threading.Lock()
+        self.upstream = {}  # endpoint -> chamadas feitas
+        self.saved = {}  # endpoint -> chamadas evitadas
+
+    def _join(self, key, endpoint):
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.saved[endpoint] = self.saved.get(endpoint, 0) + 1
+                return future, False
+            future = self._inflight[key] = Future()
+            self.upstream[endpoint] = self.upstream.get(endpoint, 0) + 1
+            return future, True
+
+    def _finish(self, key, future, value=None, error=None):
+        with self._lock:
+            del self._inflight[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(value)
+
+    def do(self, key, endpoint, fn):
+        future, leader = self._join(key, endpoint)
+        if not leader:
+            return future.result()
+        try:
+            value = fn()
+        except Exception as e:
+            self._finish(key, future, error=e)
+            raise
+        except BaseException:
+            # Líder cancelado (CancelledError, KeyboardInterrupt): libera a chave e acorda quem esperava
+            self._finish(key, future, error=FlightCancelled(f'{endpoint} cancelado'))
+            raise
+        self._finish(key, future, value)
+        return value
+
+    async def do_async(self, key, endpoint, fn):
+        future, leader = self._join(key, endpoint)
+        if not leader:
+            return await wait_shared(future)
+        try:
+            value = await fn()
+        except Exception as e:
+            self._finish(key, future, error=e)
+            raise
+        except BaseException:
+            # Líder cancelado (CancelledError, KeyboardInterrupt): libera a chave e acorda quem esperava
+            self._finish(key, future, error=FlightCancelled(f'{endpoint} cancelado'))
+            raise
+        self._finish(key, future, value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            upstream = sum(self.upstream.values())
+            saved = sum(self.saved.values())
+            return {
+                'upstream_calls': upstream,
+                'saved_calls': saved,
+                'saved_ratio': saved / (upstream + saved) if upstream + saved else 0.0,
+                'in_flight': len(self._inflight),
+                'by_endpoint': {
+                    endpoint: {'upstream_calls': calls, 'saved_calls': self.saved.get(endpoint, 0)}
+                    for endpoint, calls in self.upstream.items()
+                },
+            }
+
+
+class ResponseCache:
+    """Cache de respostas da API com contadores de acertos e falhas.
+
+    Falhas simultâneas na mesma chave viram uma única chamada (SingleFlight).
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.flights = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value, ttl):
+        self.backend.set(key, value, ttl)
+
+    def invalidate(self, user_key, method):
+        self.backend.delete_prefix(f'{user_key}:{method}:')
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / total if total else 0.0,
+            'coalescing': self.flights.stats(),
+        }
+
+
+def cache_key(user_key, name, args, kwargs):
+    params = json.dumps([args, kwargs], sort_keys=True, default=str)
+    return f'{user_key}:{name}:{hashlib.sha1(params.encode()).hexdigest()}'
+
+
+class CachedSpotify:
+    """Envolve um spotipy.Spotify cacheando as leituras por usuário e endpoint"""
+
+    def __init__(self, client, cache, user_key, ttls=CACHE_TTLS):
+        self._client = client
+        self._cache = cache
+        self._user_key = user_key
+        self._ttls = ttls
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name in self._ttls:
+            return self._cached(name, attr)
+        if name in INVALIDATES:
+            return self._invalidating(name, attr)
+        return attr
+
+    def _cached(self, name, method):
+        def call(*args, **kwargs):
+            key = cache_key(self._user_key, name, args, kwargs)
+            value = self._cache.get(key)
+            if value is not None:
+                return value
+            return self._cache.flights.do(key, name, lambda: self._fetch(key, name, method, args, kwargs))
+        return call
+
+    def _fetch(self, key, name, method, args, kwargs):
+        value = method(*args, **kwargs)
+        # Respostas vazias (ex.: nada tocando) não são guardadas
+        if value is not None:
+            self._cache.set(key, value, self._ttls[name])
+        return value
+
+    def _invalidating(self, name, method):
+        def call(*args, **kwargs):
+            try:
+                return method(*args, **kwargs)
+            finally:
+                for stale in INVALIDATES[name]:
+                    self._cache.invalidate(self._user_key, stale)
+        return call
+
+
+def user_cache_key(token_info):
+    """Chave estável por usuário derivada do refresh token (não muda a cada renovação)"""
+    secret = token_info.get('refresh_token') or token_info['access_token']
+    return hashlib.sha256(secret.encode()).hexdigest()[:16]
+
+
+def redis_client_from_env(variable):
+    """Cliente Redis conforme a variável de ambiente do backend (memory, redis ou fake-redis).
+
+    None quando o backend é a memória do processo; cache, tokens e sessões
+    escolhem o store a partir daqui.
+    """
+    kind = os.getenv(variable, 'memory')
+    if kind == 'redis':
+        import redis
+        return redis.Redis.from_url(REDIS_URL)
+    if kind == 'fake-redis':
+        return FakeRedis()
+    return None
+
+
+def create_backend():
+    """Escolhe o backend pelo ambiente: CACHE_BACKEND=memory (padrão), redis ou fake-redis"""
+    client = redis_client_from_env('CACHE_BACKEND')
+    return MemoryBackend() if client is None else RedisBackend(client)
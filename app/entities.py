@@ -0,0 +1,182 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from cache import FlightCancelled, wait_shared
+from models import Artist, Track
+from views import artist_view, track_view
+
+# Artistas e músicas são dados públicos: um cache por processo, compartilhado entre usuários
+ENTITY_TTL = int(os.getenv('ENTITY_TTL', '86400'))
+ENTITY_MAX_ENTRIES = int(os.getenv('ENTITY_MAX_ENTRIES', '50000'))
+BATCH_SIZE = 50  # máximo de IDs por chamada de /artists e /tracks
+
+# tipo -> (método do cliente, chave da lista na resposta, modelo, view)
+KINDS = {
+    'artist': ('artists', 'artists', Artist, artist_view),
+    'track': ('tracks', 'tracks', Track, track_view),
+}
+
+
+class EntityCache:
+    """Artistas e músicas por ID do Spotify, com busca em lote e coalescência.
+
+    IDs ausentes são buscados em lotes de até 50; se outra requisição já está
+    buscando um ID, a segunda espera o mesmo resultado em vez de repetir a
+    chamada. As views (artist_view/track_view) são calculadas uma vez por
+    versão da entidade; a versão só muda quando chega um dado diferente.
+    """
+
+    def __init__(self, max_entries=ENTITY_MAX_ENTRIES, ttl=ENTITY_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # (tipo, id) -> (expira_em, versão, modelo)
+        self._views = OrderedDict()  # (tipo, id, versão) -> view
+        self._inflight = {}  # (tipo, id) -> Future
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.batches = 0
+
+    def _store(self, kind, payload):
+        payload = KINDS[kind][2].from_api(payload)
+        key = (kind, payload.id)
+        entry = self._entries.get(key)
+        version = 0
+        if entry is not None:
+            version = entry[1] if entry[2] == payload else entry[1] + 1
+        self._entries[key] = (time.monotonic() + self.ttl, version, payload)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return payload
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, kind, items):
+        """Guarda entidades completas já recebidas (ex.: top artistas) sem chamar a API"""
+        with self._lock:
+            for item in items:
+                if item:
+                    self._store(kind, item)
+
+    def view(self, kind, payload):
+        """View memoizada da versão atual da entidade"""
+        with self._lock:
+            payload = KINDS[kind][2].from_api(payload)
+            entry = self._lookup((kind, payload.id))
+            if entry is None or entry[2] is not payload:
+                self._store(kind, payload)
+                entry = self._entries[(kind, payload.id)]
+            memo_key = (kind, payload.id, entry[1])
+            view = self._views.get(memo_key)
+            if view is not None:
+                self._views.move_to_end(memo_key)
+                return view
+        view = KINDS[kind][3](payload)
+        with self._lock:
+            self._views[memo_key] = view
+            while len(self._views) > self.max_entries:
+                self._views.popitem(last=False)
+        return view
+
+    def views(self, kind, items):
+        return [self.view(kind, item) for item in items if item]
+
+    def _claim(self, kind, ids):
+        """Separa os IDs em encontrados, já em busca por outra requisição e a buscar agora"""
+        found, waiting, claimed = {}, {}, []
+        with self._lock:
+            for entity_id in dict.fromkeys(i for i in ids if i):
+                key = (kind, entity_id)
+                entry = self._lookup(key)
+                if entry is not None:
+                    found[entity_id] = entry[2]
+                    self.hits += 1
+                elif key in self._inflight:
+                    waiting[entity_id] = self._inflight[key]
+                    self.coalesced += 1
+                else:
+                    self._inflight[key] = Future()
+                    claimed.append(entity_id)
+                    self.misses += 1
+        return found, waiting, claimed
+
+    def _resolve(self, kind, chunk, items=None, error=None):
+        """Guarda o lote buscado, acorda quem esperava esses IDs e devolve {id: modelo}"""
+        with self._lock:
+            self.batches += 1
+            by_id = {model.id: model for model in (self._store(kind, item) for item in items or [] if item)}
+            for entity_id in chunk:
+                future = self._inflight.pop((kind, entity_id))
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(by_id.get(entity_id))
+        return by_id
+
+    def get_many(self, kind, ids, sp):
+        """{id: modelo} dos IDs pedidos; ausentes são buscados em lotes pelo cliente sp"""
+        method, field = KINDS[kind][:2]
+        found, waiting, claimed = self._claim(kind, ids)
+        for start in range(0, len(claimed), BATCH_SIZE):
+            chunk = claimed[start:start + BATCH_SIZE]
+            try:
+                items = getattr(sp, method)(chunk)[field]
+            except Exception as e:
+                self._resolve(kind, chunk, error=e)
+                for rest in range(start + BATCH_SIZE, len(claimed), BATCH_SIZE):
+                    self._resolve(kind, claimed[rest:rest + BATCH_SIZE], error=e)
+                raise
+            found.update(self._resolve(kind, chunk, items))
+        for entity_id, future in waiting.items():
+            found[entity_id] = future.result()
+        return {entity_id: payload for entity_id, payload in found.items() if payload is not None}
+
+    async def get_many_async(self, kind, ids, sp):
+        method, field = KINDS[kind][:2]
+        found, waiting, claimed = self._claim(kind, ids)
+        chunks = [claimed[start:start + BATCH_SIZE] for start in range(0, len(claimed), BATCH_SIZE)]
+        pending = list(chunks)
+        try:
+            responses = await asyncio.gather(*(getattr(sp, method)(chunk) for chunk in chunks), return_exceptions=True)
+            error = None
+            for chunk, response in zip(chunks, responses):
+                pending.remove(chunk)
+                if isinstance(response, BaseException):
+                    error = error or response
+                    self._resolve(kind, chunk, error=response)
+                else:
+                    found.update(self._resolve(kind, chunk, response[field]))
+            if error is not None:
+                raise error
+        finally:
+            # Cancelada no meio do gather: os IDs reservados não podem ficar presos em _inflight
+            for chunk in pending:
+                self._resolve(kind, chunk, error=FlightCancelled(f'{method} cancelado'))
+        for entity_id, future in waiting.items():
+            found[entity_id] = await wait_shared(future)
+        return {entity_id: payload for entity_id, payload in found.items() if payload is not None}
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'views': len(self._views),
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'batches': self.batches,
+            }
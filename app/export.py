@@ -0,0 +1,188 @@
+import json
+import os
+import time
+from collections import deque
+from functools import partial
+
+from assets import compress_stream
+from fanout import ContextExecutor
+from paging import TIME_RANGES
+from playlists import page_offsets
+from views import items_of, track_view
+
+# Linhas por bloco no formato colunar (e por leitura do SQLite)
+EXPORT_BATCH = int(os.getenv('EXPORT_BATCH', '500'))
+# Chamadas ao Spotify em andamento à frente da que está sendo escrita
+EXPORT_PREFETCH = int(os.getenv('EXPORT_PREFETCH', '4'))
+# Páginas das exportações em pool próprio: exportações longas não seguram as threads do fan-out
+EXPORT_WORKERS = int(os.getenv('EXPORT_WORKERS', '8'))
+TOP_BATCH = 50  # máximo aceito pelos endpoints de top
+SECTIONS = ('top_tracks', 'top_artists', 'recent', 'playlists')
+
+
+def parse_sections(value):
+    """Seções pedidas em ?sections=a,b (todas se vazio), sempre na ordem de SECTIONS"""
+    if not value:
+        return SECTIONS
+    wanted = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = wanted - set(SECTIONS)
+    if unknown:
+        raise ValueError(f"Seção desconhecida: {', '.join(sorted(unknown))}")
+    return tuple(name for name in SECTIONS if name in wanted)
+
+
+export_pool = ContextExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix='export')
+
+
+def ordered(calls, prefetch=EXPORT_PREFETCH):
+    """Executa as funções em paralelo, no máximo prefetch à frente, e devolve os resultados na ordem"""
+    pending = deque()
+    try:
+        for fn in calls:
+            pending.append(export_pool.submit(fn))
+            if len(pending) > prefetch:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # Cliente desconectou: o que ainda não começou não chega a ir ao Spotify
+        for future in pending:
+            future.cancel()
+
+
+def artist_record(artist):
+    return {
+        'id': artist.get('id'),
+        'name': artist.get('name'),
+        'popularity': artist.get('popularity', 0),
+        'genres': artist.get('genres') or [],
+        'followers': (artist.get('followers') or {}).get('total') or 0,
+    }
+
+
+class LibraryExporter:
+    """Biblioteca do usuário (tops, histórico, playlists) como uma sequência de registros.
+
+    Os registros saem um a um, na mesma ordem a cada exportação: as páginas do
+    Spotify são buscadas em paralelo, mas escritas na ordem em que foram pedidas,
+    e o histórico e as playlists são lidos do SQLite em blocos de EXPORT_BATCH.
+    """
+
+    def __init__(self, history, playlists):
+        self.history = history
+        self.playlists = playlists
+
+    def records(self, user_key, sp, sections=SECTIONS):
+        """(seção, registro) de cada linha; falha numa seção vira um registro de erro e a exportação segue"""
+        producers = {
+            'top_tracks': partial(self._top, sp, 'top_tracks'),
+            'top_artists': partial(self._top, sp, 'top_artists'),
+            'recent': partial(self._recent, user_key, sp),
+            'playlists': partial(self._playlists, user_key, sp),
+        }
+        yield 'export', {'exported_at': int(time.time()), 'sections': list(sections)}
+        for name in sections:
+            try:
+                yield from producers[name]()
+            except Exception as e:
+                yield 'errors', {'section': name, 'error': str(e)}
+
+    def _top(self, sp, section):
+        fetch = sp.current_user_top_tracks if section == 'top_tracks' else sp.current_user_top_artists
+        call = lambda time_range, offset: fetch(limit=TOP_BATCH, offset=offset, time_range=time_range)
+        # Primeiras páginas dos três períodos em paralelo; depois as restantes, também em paralelo
+        firsts = list(ordered(partial(call, time_range, 0) for time_range in TIME_RANGES))
+        rest = [(time_range, offset) for time_range, first in zip(TIME_RANGES, firsts) for offset in page_offsets(first, TOP_BATCH)]
+        rest_pages = ordered(partial(call, time_range, offset) for time_range, offset in rest)
+        for time_range, first in zip(TIME_RANGES, firsts):
+            pages = [(0, first)] + [(offset, next(rest_pages)) for tr, offset in rest if tr == time_range]
+            for offset, page in pages:
+                for index, item in enumerate(items_of(page)):
+                    record = track_view(item) if section == 'top_tracks' else artist_record(item)
+                    yield section, {'time_range': time_range, 'rank': offset + index + 1, **record}
+
+    def _recent(self, user_key, sp):
+        self.history.refresh(user_key, sp)
+        before = None
+        while True:
+            plays, before = self.history.page(user_key, before=before, limit=EXPORT_BATCH)
+            for play in plays:
+                yield 'recent', {'played_at': play.played_at, **track_view(play.track)}
+            if before is None:
+                return
+
+    def _playlists(self, user_key, sp):
+        self.playlists.refresh(user_key, sp)
+        listed = self.playlists.playlists(user_key)
+        for playlist in listed:
+            yield 'playlists', {key: value for key, value in playlist.items() if key != 'synced'}
+        # Playlists desatualizadas são baixadas em paralelo (só as de snapshot_id novo)
+        stale = dict(self.playlists.stale(user_key))
+        synced = ordered(
+            partial(self._sync_playlist, playlist['id'], stale[playlist['id']], sp)
+            if playlist['id'] in stale else (lambda: None)
+            for playlist in listed
+        )
+        for playlist in listed:
+            error = next(synced)
+            if error is not None:
+                # Exporta o que já estava salvo e segue para a próxima playlist
+                yield 'errors', {'section': 'playlists', 'playlist_id': playlist['id'], 'error': str(error)}
+            position = 0
+            while position is not None:
+                items, position = self.playlists.items(playlist['id'], position, limit=EXPORT_BATCH)
+                for item in items:
+                    yield 'playlist_items', {
+                        'playlist_id': playlist['id'],
+                        'position': item['position'],
+                        'added_at': item['added_at'],
+                        **track_view(item['track']),
+                    }
+
+    def _sync_playlist(self, playlist_id, snapshot_id, sp):
+        """Erro devolvido em vez de lançado: uma playlist com falha não interrompe as outras"""
+        try:
+            self.playlists.sync_playlist(playlist_id, snapshot_id, sp)
+        except Exception as e:
+            return e
+        return None
+
+
+def dumps(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+def ndjson_stream(records):
+    """Um objeto JSON por linha, com o tipo do registro"""
+    for section, record in records:
+        yield (dumps({'type': section, **record}) + '\n').encode()
+
+
+def columnar_blocks(records, batch=EXPORT_BATCH):
+    """Blocos {section, columns: {campo: [valores]}} de até batch linhas de uma mesma seção"""
+    section, rows = None, []
+
+    def block():
+        fields = list(dict.fromkeys(field for row in rows for field in row))
+        columns = {field: [row.get(field) for row in rows] for field in fields}
+        return (dumps({'section': section, 'rows': len(rows), 'columns': columns}) + '\n').encode()
+
+    for name, record in records:
+        if rows and (name != section or len(rows) >= batch):
+            yield block()
+            rows = []
+        section = name
+        rows.append(record)
+    if rows:
+        yield block()
+
+
+def columnar_stream(records):
+    """Blocos colunares em JSON, um por linha, num arquivo gzip gerado em streaming"""
+    return compress_stream(columnar_blocks(records), 'gzip')
+
+
+EXPORT_FORMATS = {
+    'ndjson': (ndjson_stream, 'application/x-ndjson', 'spotify-export.ndjson'),
+    'columnar': (columnar_stream, 'application/gzip', 'spotify-export.columnar.jsonl.gz'),
+}
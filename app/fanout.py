@@ -0,0 +1,168 @@
+import asyncio
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import partial
+
+# Pool compartilhado por todas as requisições; limita chamadas simultâneas ao Spotify
+FANOUT_WORKERS = int(os.getenv('FANOUT_WORKERS', '16'))
+FANOUT_TIMEOUT = float(os.getenv('FANOUT_TIMEOUT', '8'))
+# Sincronizações em segundo plano (histórico, playlists, perfis) têm pool próprio e pequeno:
+# uma sincronização longa não ocupa as threads que as páginas esperam no fan-out
+BACKGROUND_WORKERS = int(os.getenv('BACKGROUND_WORKERS', '2'))
+
+
+class ContextExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor que leva o contexto de quem submete (rota das métricas) para a thread"""
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+executor = ContextExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix='spotify-fanout')
+background_executor = ContextExecutor(max_workers=BACKGROUND_WORKERS, thread_name_prefix='background-sync')
+
+
+class FanOutTimeout(Exception):
+    pass
+
+
+def fan_out(calls, timeout=FANOUT_TIMEOUT):
+    """Executa chamadas independentes em paralelo dentro de um prazo.
+
+    Recebe {nome: função sem argumentos} e devolve (resultados, erros).
+    Chamadas que falham ou estouram o prazo ficam com None nos resultados e o
+    erro correspondente em erros. Se todas falharem, o primeiro erro é relançado.
+    """
+    deadline = time.monotonic() + timeout
+    futures = {name: executor.submit(fn) for name, fn in calls.items()}
+    wait(futures.values(), timeout=max(0, deadline - time.monotonic()))
+
+    results, errors = {}, {}
+    for name, future in futures.items():
+        results[name] = None
+        if not future.done():
+            future.cancel()
+            errors[name] = FanOutTimeout(f'{name} excedeu {timeout}s')
+        elif future.exception() is not None:
+            errors[name] = future.exception()
+        else:
+            results[name] = future.result()
+
+    if calls and len(errors) == len(calls):
+        raise next(iter(errors.values()))
+    return results, errors
+
+
+async def fan_out_async(calls, timeout=FANOUT_TIMEOUT):
+    """Versão asyncio de fan_out: recebe {nome: corrotina} e devolve (resultados, erros)"""
+    names = list(calls)
+    tasks = [asyncio.ensure_future(coro) for coro in calls.values()]
+    _, pending = await asyncio.wait(tasks, timeout=timeout) if tasks else (set(), set())
+
+    results, errors = {}, {}
+    for name, task in zip(names, tasks):
+        results[name] = None
+        if task in pending:
+            task.cancel()
+            errors[name] = FanOutTimeout(f'{name} excedeu {timeout}s')
+        elif task.exception() is not None:
+            errors[name] = task.exception()
+        else:
+            results[name] = task.result()
+
+    if calls and len(errors) == len(calls):
+        raise next(iter(errors.values()))
+    return results, errors
+
+
+# Loaders das páginas escritos uma vez para os dois modos (Flask e ASGI): são geradores
+# que produzem passos (ou um dict de passos, executados em paralelo como no fan_out) e
+# recebem o resultado de volta. run_steps executa com o cliente síncrono; run_steps_async
+# com o assíncrono, sem bloquear o event loop.
+
+class SpotifyCall:
+    """Passo: método do cliente do Spotify"""
+
+    def __init__(self, method, **kwargs):
+        self.method = method
+        self.kwargs = kwargs
+
+    def run(self, sp):
+        return getattr(sp, self.method)(**self.kwargs)
+
+    async def run_async(self, sp):
+        return await getattr(sp, self.method)(**self.kwargs)
+
+
+class ClientCall:
+    """Passo: método de um componente que recebe o cliente como último argumento
+    (no modo assíncrono, a versão _async do método)"""
+
+    def __init__(self, target, method, *args):
+        self.target = target
+        self.method = method
+        self.args = args
+
+    def run(self, sp):
+        return getattr(self.target, self.method)(*self.args, sp)
+
+    async def run_async(self, sp):
+        return await getattr(self.target, f'{self.method}_async')(*self.args, sp)
+
+
+class Blocking:
+    """Passo: trabalho local bloqueante (SQLite); no modo assíncrono roda numa thread"""
+
+    def __init__(self, fn, *args, **kwargs):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+
+    def run(self, sp):
+        return self.fn(*self.args, **self.kwargs)
+
+    async def run_async(self, sp):
+        return await asyncio.to_thread(self.fn, *self.args, **self.kwargs)
+
+
+def _run_step(step, sp):
+    if isinstance(step, dict):
+        return fan_out({name: partial(_run_step, item, sp) for name, item in step.items()})[0]
+    return step.run(sp)
+
+
+async def _run_step_async(step, sp):
+    if isinstance(step, dict):
+        return (await fan_out_async({name: _run_step_async(item, sp) for name, item in step.items()}))[0]
+    return await step.run_async(sp)
+
+
+def run_steps(steps, sp):
+    """Executa um loader com o cliente síncrono; erros de um passo voltam para dentro do gerador"""
+    value, error = None, None
+    while True:
+        try:
+            step = steps.throw(error) if error else steps.send(value)
+        except StopIteration as done:
+            return done.value
+        value, error = None, None
+        try:
+            value = _run_step(step, sp)
+        except Exception as e:
+            error = e
+
+
+async def run_steps_async(steps, sp):
+    value, error = None, None
+    while True:
+        try:
+            step = steps.throw(error) if error else steps.send(value)
+        except StopIteration as done:
+            return done.value
+        value, error = None, None
+        try:
+            value = await _run_step_async(step, sp)
+        except Exception as e:
+            error = e
@@ -0,0 +1,198 @@
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+
+from localstore import SyncedStore
+from models import Play
+from views import items_of
+
+# Histórico de reproduções guardado localmente (SQLite em modo WAL)
+HISTORY_DB = os.getenv('HISTORY_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'history.db'))
+# Intervalo mínimo (segundos) entre sincronizações de um usuário
+HISTORY_SYNC_INTERVAL = int(os.getenv('HISTORY_SYNC_INTERVAL', '60'))
+HISTORY_PAGE_SIZE = 30
+SYNC_BATCH = 50  # máximo aceito pelo endpoint recently-played
+SYNC_MAX_PAGES = 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS plays (
+    user_key TEXT NOT NULL,
+    played_at_ms INTEGER NOT NULL,
+    played_at TEXT NOT NULL,
+    track_id TEXT NOT NULL,
+    PRIMARY KEY (user_key, played_at_ms)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS artists (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    genres TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    user_key TEXT PRIMARY KEY,
+    cursor_ms INTEGER NOT NULL,
+    synced_at REAL NOT NULL
+);
+"""
+
+
+def played_at_ms(played_at):
+    return int(datetime.fromisoformat(played_at.replace('Z', '+00:00')).timestamp() * 1000)
+
+
+def slim_track(track):
+    """Música sem a lista de mercados, que é a maior parte do JSON e não é exibida"""
+    track = {k: v for k, v in track.items() if k != 'available_markets'}
+    if isinstance(track.get('album'), dict):
+        track['album'] = {k: v for k, v in track['album'].items() if k != 'available_markets'}
+    return track
+
+
+class HistoryStore(SyncedStore):
+    """Histórico de reproduções por usuário, sincronizado de forma incremental.
+
+    Cada sincronização pede ao Spotify só o que tocou depois do último cursor
+    (parâmetro after) e grava músicas e reproduções em uma única transação.
+    A página /recent lê daqui, paginando por played_at (keyset), e o histórico
+    cresce além da janela de 50 reproduções da API.
+    """
+
+    schema = SCHEMA
+
+    def __init__(self, path=HISTORY_DB, sync_interval=HISTORY_SYNC_INTERVAL):
+        self.sync_interval = sync_interval
+        super().__init__(path)
+
+    def state(self, user_key):
+        """(cursor_ms, synced_at) da última sincronização, ou None se nunca sincronizou"""
+        return self._connect().execute(
+            'SELECT cursor_ms, synced_at FROM sync_state WHERE user_key = ?', (user_key,)
+        ).fetchone()
+
+    def record(self, user_key, page):
+        """Grava uma página do recently-played em lote; devolve quantas reproduções eram novas"""
+        items = [item for item in items_of(page) if (item.get('track') or {}).get('id')]
+        plays = [(user_key, played_at_ms(item['played_at']), item['played_at'], item['track']['id']) for item in items]
+        tracks = {item['track']['id']: json.dumps(slim_track(item['track'])) for item in items}
+        cursor = max((play[1] for play in plays), default=0)
+
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                'INSERT INTO tracks (id, data) VALUES (?, ?) ON CONFLICT(id) DO UPDATE SET data = excluded.data',
+                tracks.items(),
+            )
+            before = conn.total_changes
+            conn.executemany('INSERT OR IGNORE INTO plays VALUES (?, ?, ?, ?)', plays)
+            added = conn.total_changes - before
+            conn.execute(
+                'INSERT INTO sync_state (user_key, cursor_ms, synced_at) VALUES (?, ?, ?) '
+                'ON CONFLICT(user_key) DO UPDATE SET '
+                'cursor_ms = max(sync_state.cursor_ms, excluded.cursor_ms), synced_at = excluded.synced_at',
+                (user_key, cursor, time.time()),
+            )
+        return added
+
+    def page(self, user_key, before=None, limit=HISTORY_PAGE_SIZE):
+        """Reproduções mais recentes primeiro e o cursor da próxima página (None se acabou)"""
+        rows = self._connect().execute(
+            'SELECT p.played_at_ms, p.played_at, t.data FROM plays p JOIN tracks t ON t.id = p.track_id '
+            'WHERE p.user_key = ? AND p.played_at_ms < ? ORDER BY p.played_at_ms DESC LIMIT ?',
+            (user_key, before or 2 ** 62, limit + 1),
+        ).fetchall()
+        registry = {}
+        items = [
+            Play.from_api({'played_at': played_at, 'track': json.loads(data)}, registry)
+            for _, played_at, data in rows[:limit]
+        ]
+        next_before = rows[limit - 1][0] if len(rows) > limit else None
+        return items, next_before
+
+    def plays_since(self, user_key, after_ms):
+        """Reproduções posteriores a after_ms em ordem cronológica, com os campos das análises"""
+        return self._connect().execute(
+            "SELECT p.played_at_ms, p.track_id, json_extract(t.data, '$.name'), "
+            "json_extract(t.data, '$.artists[0].id'), json_extract(t.data, '$.artists[0].name'), "
+            "coalesce(json_extract(t.data, '$.duration_ms'), 0) "
+            'FROM plays p JOIN tracks t ON t.id = p.track_id '
+            'WHERE p.user_key = ? AND p.played_at_ms > ? ORDER BY p.played_at_ms',
+            (user_key, after_ms),
+        ).fetchall()
+
+    def record_artists(self, artists):
+        """Guarda os gêneros dos artistas já carregados (top artistas) para as análises"""
+        rows = [(a['id'], a['name'], json.dumps(a.get('genres') or [])) for a in artists if a and a.get('id')]
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                'INSERT INTO artists (id, name, genres) VALUES (?, ?, ?) '
+                'ON CONFLICT(id) DO UPDATE SET name = excluded.name, genres = excluded.genres',
+                rows,
+            )
+
+    def artist_genres(self, artist_ids):
+        genres = {}
+        conn = self._connect()
+        for start in range(0, len(artist_ids), 500):
+            chunk = artist_ids[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            for artist_id, data in conn.execute(f'SELECT id, genres FROM artists WHERE id IN ({placeholders})', chunk):
+                genres[artist_id] = json.loads(data)
+        return genres
+
+    def _next_cursor(self, user_key, cursor, page):
+        """Cursor da próxima página da sincronização, ou None quando não há mais o que buscar"""
+        if not cursor or len(items_of(page)) < SYNC_BATCH:
+            # Primeira sincronização: a API só oferece a janela mais recente
+            return None
+        new_cursor = self.state(user_key)[0]
+        return new_cursor if new_cursor > cursor else None
+
+    def sync(self, user_key, sp):
+        """Busca só as reproduções posteriores ao cursor e grava; devolve quantas entraram"""
+        state = self.state(user_key)
+        cursor = state[0] if state else 0
+        added = 0
+        for _ in range(SYNC_MAX_PAGES):
+            page = sp.current_user_recently_played(limit=SYNC_BATCH, after=cursor or None)
+            added += self.record(user_key, page)
+            cursor = self._next_cursor(user_key, cursor, page)
+            if cursor is None:
+                break
+        return added
+
+    async def sync_async(self, user_key, sp):
+        state = await asyncio.to_thread(self.state, user_key)
+        cursor = state[0] if state else 0
+        added = 0
+        for _ in range(SYNC_MAX_PAGES):
+            page = await sp.current_user_recently_played(limit=SYNC_BATCH, after=cursor or None)
+            added += await asyncio.to_thread(self.record, user_key, page)
+            cursor = await asyncio.to_thread(self._next_cursor, user_key, cursor, page)
+            if cursor is None:
+                break
+        return added
+
+    def is_stale(self, state):
+        return state is None or time.time() - state[1] >= self.sync_interval
+
+    # Primeira visita sincroniza na hora; depois, se venceu o intervalo, em segundo plano
+    def sync_first(self, user_key, sp):
+        self.sync(user_key, sp)
+
+    def needs_background(self, state):
+        return state is not None and self.is_stale(state)
+
+    def sync_background(self, user_key, sp, state):
+        self.sync(user_key, sp)
+
+    async def sync_first_async(self, user_key, sp):
+        await self.sync_async(user_key, sp)
+
+    async def sync_background_async(self, user_key, sp, state):
+        await self.sync_async(user_key, sp)
@@ -0,0 +1,86 @@
+import asyncio
+import sqlite3
+import threading
+
+from fanout import background_executor
+
+
+class SQLiteStore:
+    """Base dos stores em SQLite: uma conexão por thread e o esquema criado na abertura"""
+
+    schema = ''
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(self.schema)
+
+    def _connect(self):
+        # Uma conexão por thread; WAL deixa leituras seguirem durante as escritas
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+
+class SyncedStore(SQLiteStore):
+    """Store sincronizado com o Spotify por usuário: na primeira visita na hora, depois em segundo plano.
+
+    As subclasses dizem o que fazer em cada etapa: state(), sync_first(),
+    needs_background() e sync_background() (e as versões _async). Só uma
+    sincronização em segundo plano por usuário roda de cada vez; falhas mantêm
+    o que já foi gravado e a próxima visita tenta de novo.
+    """
+
+    def __init__(self, path):
+        self._syncing = set()
+        self._tasks = set()
+        self._lock = threading.Lock()
+        super().__init__(path)
+
+    def _claim(self, user_key):
+        with self._lock:
+            if user_key in self._syncing:
+                return False
+            self._syncing.add(user_key)
+            return True
+
+    def _release(self, user_key):
+        with self._lock:
+            self._syncing.discard(user_key)
+
+    def refresh(self, user_key, sp):
+        state = self.state(user_key)
+        if state is None:
+            self.sync_first(user_key, sp)
+        if self.needs_background(state) and self._claim(user_key):
+            background_executor.submit(self._sync_in_background, user_key, sp, state)
+
+    def _sync_in_background(self, user_key, sp, state):
+        try:
+            self.sync_background(user_key, sp, state)
+        except Exception:
+            pass  # mantém o que já foi gravado; tenta de novo na próxima visita
+        finally:
+            self._release(user_key)
+
+    async def refresh_async(self, user_key, sp):
+        state = await asyncio.to_thread(self.state, user_key)
+        if state is None:
+            await self.sync_first_async(user_key, sp)
+        if self.needs_background(state) and self._claim(user_key):
+            task = asyncio.create_task(self._sync_async_in_background(user_key, sp, state))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _sync_async_in_background(self, user_key, sp, state):
+        try:
+            await self.sync_background_async(user_key, sp, state)
+        except Exception:
+            pass
+        finally:
+            self._release(user_key)
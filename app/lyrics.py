@@ -0,0 +1,204 @@
+import os
+import re
+import threading
+import time
+import zlib
+from urllib.parse import quote
+
+from cache import SingleFlight
+from localstore import SQLiteStore
+from search_index import words_of
+from transport import HTTP_TIMEOUT, http_session
+
+LYRICS_DB = os.getenv('LYRICS_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lyrics.db'))
+# Orçamento do cache em disco (bytes das letras comprimidas); acima disso sai a menos usada
+LYRICS_CACHE_BYTES = int(os.getenv('LYRICS_CACHE_BYTES', str(64 * 1024 * 1024)))
+# Letras não encontradas são lembradas por esse tempo antes de perguntar de novo ao provedor
+LYRICS_MISS_TTL = int(os.getenv('LYRICS_MISS_TTL', '86400'))
+LYRICS_DIR = os.getenv('LYRICS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lyrics'))
+LYRICS_HTTP_URL = os.getenv('LYRICS_HTTP_URL', 'https://api.lyrics.ovh/v1/{artist}/{track}')
+# O último acesso só é regravado depois desse intervalo: leituras seguidas não viram escritas
+TOUCH_INTERVAL = 60
+MISS_SIZE = 64  # custo aproximado de uma entrada negativa no orçamento
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lyrics (
+    key TEXT PRIMARY KEY,
+    data BLOB,
+    size INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS lyrics_lru ON lyrics (accessed_at);
+"""
+
+
+def clean_title(track):
+    """Sem "(feat. X)", "[Live]" ou "- Remastered 2011": versões da mesma música têm a mesma letra"""
+    track = re.sub(r'\s*[\(\[][^\)\]]*[\)\]]', '', track)
+    return re.split(r'\s+-\s+', track)[0]
+
+
+def lyrics_key(track, artist):
+    """Chave normalizada (artista, música): caixa, acentos e pontuação não importam"""
+    return f"{' '.join(words_of(artist))}|{' '.join(words_of(clean_title(track)))}"
+
+
+class LocalLyricsProvider:
+    """Letras em arquivos "Artista - Música.txt" de um diretório (substituto local, usado em testes)"""
+
+    def __init__(self, directory=LYRICS_DIR):
+        self.files = {}
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                base, ext = os.path.splitext(name)
+                if ext == '.txt' and ' - ' in base:
+                    artist, track = base.split(' - ', 1)
+                    self.files[lyrics_key(track, artist)] = os.path.join(directory, name)
+
+    def fetch(self, track, artist):
+        """Letra ou None se não existe; exceções são falhas (não entram no cache)"""
+        path = self.files.get(lyrics_key(track, artist))
+        if path is None:
+            return None
+        with open(path, encoding='utf-8') as f:
+            return f.read()
+
+
+class HttpLyricsProvider:
+    """Provedor HTTP no formato do lyrics.ovh: 404 é letra inexistente, {"lyrics": "..."} é achada"""
+
+    def __init__(self, url=LYRICS_HTTP_URL, session=None, timeout=HTTP_TIMEOUT):
+        self.url = url
+        self.session = session or http_session
+        self.timeout = timeout
+
+    def fetch(self, track, artist):
+        # Com prazo: um provedor lento não pode prender a requisição nem quem espera a mesma letra
+        response = self.session.get(
+            self.url.format(artist=quote(artist, safe=''), track=quote(clean_title(track), safe='')), timeout=self.timeout,
+        )
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return (response.json().get('lyrics') or '').strip() or None
+
+
+def create_lyrics_provider():
+    """Provedor de letras escolhido por LYRICS_PROVIDER (local ou http).
+
+    Sem LYRICS_PROVIDER, usa o diretório local se ele existir e o http caso contrário;
+    local pedido sem o diretório é erro de configuração (toda busca viraria "não encontrada").
+    """
+    kind = os.getenv('LYRICS_PROVIDER') or ('local' if os.path.isdir(LYRICS_DIR) else 'http')
+    if kind == 'http':
+        return HttpLyricsProvider()
+    if kind != 'local':
+        raise ValueError(f'LYRICS_PROVIDER inválido: {kind}')
+    if not os.path.isdir(LYRICS_DIR):
+        raise RuntimeError(f'LYRICS_PROVIDER=local, mas o diretório de letras não existe: {LYRICS_DIR}')
+    return LocalLyricsProvider(LYRICS_DIR)
+
+
+class LyricsCache(SQLiteStore):
+    """Letras em SQLite por chave normalizada, com orçamento em bytes e despejo LRU.
+
+    Achadas ficam até serem despejadas; não achadas viram entradas negativas que
+    valem LYRICS_MISS_TTL. Só chaves fora do cache vão ao provedor, e buscas
+    simultâneas da mesma chave compartilham uma única ida.
+    """
+
+    schema = SCHEMA
+
+    def __init__(self, provider, path=LYRICS_DB, max_bytes=LYRICS_CACHE_BYTES, miss_ttl=LYRICS_MISS_TTL):
+        self.provider = provider
+        self.max_bytes = max_bytes
+        self.miss_ttl = miss_ttl
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+        self.hits = 0
+        self.negative_hits = 0
+        self.lookups = 0
+        self.evictions = 0
+        super().__init__(path)
+
+    @property
+    def bytes(self):
+        """Bytes ocupados, lidos do SQLite: o arquivo é compartilhado pelos workers"""
+        return self._connect().execute('SELECT coalesce(sum(size), 0) FROM lyrics').fetchone()[0]
+
+    def _read(self, key):
+        """(achou no cache, letra ou None)"""
+        row = self._connect().execute('SELECT data, fetched_at, accessed_at FROM lyrics WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return False, None
+        data, fetched_at, accessed_at = row
+        now = time.time()
+        if data is None and now - fetched_at >= self.miss_ttl:
+            return False, None
+        if now - accessed_at >= TOUCH_INTERVAL:
+            with self._connect() as conn:
+                conn.execute('UPDATE lyrics SET accessed_at = ? WHERE key = ?', (now, key))
+        return True, zlib.decompress(data).decode() if data is not None else None
+
+    def _write(self, key, lyrics):
+        data = zlib.compress(lyrics.encode()) if lyrics is not None else None
+        size = len(data) + len(key) if data is not None else MISS_SIZE
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        conn = self._connect()
+        evicted = 0
+        with conn:
+            # Transação de escrita desde o início: o total lido não muda por outro worker até o commit
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('INSERT OR REPLACE INTO lyrics VALUES (?, ?, ?, ?, ?)', (key, data, size, now, now))
+            total = conn.execute('SELECT coalesce(sum(size), 0) FROM lyrics').fetchone()[0]
+            # Despeja as menos acessadas até caber no orçamento
+            while total > self.max_bytes:
+                victims = conn.execute(
+                    'SELECT key, size FROM lyrics WHERE key != ? ORDER BY accessed_at LIMIT 64', (key,)
+                ).fetchall()
+                if not victims:
+                    break
+                for victim, victim_size in victims:
+                    if total <= self.max_bytes:
+                        break
+                    conn.execute('DELETE FROM lyrics WHERE key = ?', (victim,))
+                    total -= victim_size
+                    evicted += 1
+        if evicted:
+            with self._lock:
+                self.evictions += evicted
+
+    def get(self, track, artist):
+        """(letra ou None, 'cache' ou 'provider')"""
+        key = lyrics_key(track, artist)
+        found, lyrics = self._read(key)
+        with self._lock:
+            self.lookups += 1
+            if found:
+                self.hits += lyrics is not None
+                self.negative_hits += lyrics is None
+        if found:
+            return lyrics, 'cache'
+        return self._flights.do(key, 'lyrics', lambda: self._fetch(key, track, artist)), 'provider'
+
+    def _fetch(self, key, track, artist):
+        lyrics = self.provider.fetch(track, artist)
+        self._write(key, lyrics)
+        return lyrics
+
+    def stats(self):
+        used = self.bytes
+        with self._lock:
+            return {
+                'lookups': self.lookups,
+                'hits': self.hits,
+                'negative_hits': self.negative_hits,
+                'hit_ratio': (self.hits + self.negative_hits) / self.lookups if self.lookups else 0.0,
+                'provider': self._flights.stats(),
+                'bytes': used,
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions,
+            }
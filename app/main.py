@@ -1,42 +1,190 @@
 import os
-import spotipy
+from collections import namedtuple
+from spotipy.cache_handler import MemoryCacheHandler
 from spotipy.oauth2 import SpotifyOAuth
-from flask import Flask, request, redirect, session, render_template_string, jsonify
+from flask import Flask, Response, request, redirect, session, jsonify
 from dotenv import load_dotenv
 import requests
+from analytics import AnalyticsEngine
+from assets import init_assets
+from cache import ResponseCache, CachedSpotify, create_backend, user_cache_key
+from entities import EntityCache
+from export import EXPORT_FORMATS, LibraryExporter, parse_sections
+from fanout import Blocking, ClientCall, SpotifyCall, run_steps
+from history import HistoryStore
+from lyrics import LyricsCache, create_lyrics_provider
+from metrics import init_metrics, registry
+from models import Playback, Track, track_page
+from profiles import ProfileStore
+from search_index import SUGGEST_LIMIT, UPSTREAM_LIMIT, SearchIndex
+from sessions import SESSION_TTL, create_session_interface
+from templates_registry import init_templates, render_page, stream_page
+from transport import create_spotify, http_session, pool_stats, scheduler
+from tokens import TokenManager, create_token_store
+from nowplaying import NowPlayingHub, now_playing_state, sse_stream
+from paging import (TOP_ARTISTS_PAGE_SIZE, TOP_TRACKS_PAGE_SIZE, InvalidCursor, int_arg, list_context,
+                    next_playlist_cursor, next_recent_cursor, next_top_cursor, playlist_position, recent_position,
+                    stream_pages, top_position)
+from playlists import PlaylistNotFound, PlaylistStore
+from playback import PlaybackPipeline
+from views import (conditional_json, dashboard_payload, items_of, playlist_payload, playlists_payload,
+                   recent_payload, stats_payload, top_artists_payload, top_tracks_payload)
 
 load_dotenv()
 
-app = Flask(__name__)
+app = Flask(__name__, static_folder=None)
 app.secret_key = os.getenv('SECRET_KEY', 'your-secret-key')
+# Validade do cookie de sessão = prazo da sessão no servidor
+app.config['PERMANENT_SESSION_LIFETIME'] = SESSION_TTL
+# Lax ainda envia o cookie no redirecionamento de volta do login do Spotify
+app.config['SESSION_COOKIE_SAMESITE'] = os.getenv('SESSION_COOKIE_SAMESITE', 'Lax')
+app.config['SESSION_COOKIE_SECURE'] = os.getenv('SESSION_COOKIE_SECURE', '0') == '1'
+# Sessão no servidor (SESSION_BACKEND); o cookie leva só um ID opaco
+app.session_interface = create_session_interface()
+
+# Templates compilados uma vez na inicialização (antes de qualquer uso de app.jinja_env,
+# senão o cache de bytecode configurado em jinja_options é ignorado)
+init_templates(app)
+
+# Arquivos estáticos versionados pelo conteúdo e compressão gzip/brotli das respostas
+init_assets(app)
+
+# Latência por rota e chamadas ao Spotify por endpoint em /metrics (formato Prometheus)
+init_metrics(app)
 
 # Configuração do Spotify
 SPOTIPY_CLIENT_ID = os.getenv('SPOTIPY_CLIENT_ID')
 SPOTIPY_CLIENT_SECRET = os.getenv('SPOTIPY_CLIENT_SECRET')
 SPOTIPY_REDIRECT_URI = os.getenv('SPOTIPY_REDIRECT_URI', 'https://d012-186-224-132-223.ngrok-free.app')
 
+# Cache de respostas da API compartilhado pelo processo
+response_cache = ResponseCache(create_backend())
+
+# Perfil do usuário resolvido no login e lido localmente pelas rotas
+profile_store = ProfileStore()
+
+# Índice local das músicas já vistas por usuário, usado nas sugestões da busca
+search_index = SearchIndex()
+
+# Artistas e músicas por ID, compartilhados entre usuários e buscados em lote
+entity_cache = EntityCache()
+
+# Histórico de reproduções sincronizado incrementalmente em SQLite
+history_store = HistoryStore()
+
+# Playlists e seus itens, baixados de novo só quando o snapshot_id muda
+playlist_store = PlaylistStore()
+
+# Exportação da biblioteca em streaming (NDJSON ou colunar comprimido)
+exporter = LibraryExporter(history_store, playlist_store)
+
+# Letras em cache persistente: só faixas nunca pedidas (ou misses vencidos) vão ao provedor
+lyrics_cache = LyricsCache(create_lyrics_provider())
+
+# Estatísticas de audição sobre o histórico local, atualizadas a cada lote novo
+analytics = AnalyticsEngine(history_store)
+
 # Scopes necessários
 scope = "user-read-playback-state,user-modify-playback-state,user-read-currently-playing,playlist-read-private,user-read-recently-played,user-top-read"
 
-def get_spotify_oauth():
+def get_spotify_oauth(cache_handler=None):
+    # Sem cache em arquivo: cada usuário tem seu token no token_manager
     return SpotifyOAuth(
         client_id=SPOTIPY_CLIENT_ID,
         client_secret=SPOTIPY_CLIENT_SECRET,
         redirect_uri=SPOTIPY_REDIRECT_URI,
         scope=scope,
-        show_dialog=True
+        show_dialog=True,
+        cache_handler=cache_handler or MemoryCacheHandler(),
+        requests_session=http_session
     )
 
+# Tokens por usuário, renovados antes de expirar
+token_manager = TokenManager(create_token_store(), get_spotify_oauth)
+
+def current_user_key():
+    """Chave do usuário logado, fixada no login para sobreviver à troca de refresh token"""
+    return session.get('user_key') or user_cache_key(session['token_info'])
+
 def get_spotify_client():
     token_info = session.get('token_info')
     if not token_info:
         return None
-    return spotipy.Spotify(auth=token_info['access_token'])
+    user_key = current_user_key()
+    try:
+        token_info = token_manager.get_token(user_key, token_info)
+    except Exception:
+        return None
+    if token_info['access_token'] != session['token_info']['access_token']:
+        session['token_info'] = token_info
+    sp = create_spotify(token_info['access_token'], user_key)
+    return CachedSpotify(sp, response_cache, user_key)
+
+def make_client_factory(user_key, cached=False, fallback=None):
+    """Cria clientes fora do contexto da requisição (ex.: threads de polling)"""
+    def factory():
+        token_info = token_manager.get_token(user_key, fallback)
+        if not token_info:
+            return None
+        sp = create_spotify(token_info['access_token'], user_key)
+        return CachedSpotify(sp, response_cache, user_key) if cached else sp
+    return factory
+
+# Um poller do player por usuário, compartilhado pelas abas abertas
+now_playing_hub = NowPlayingHub()
+
+# Comandos do player enviados sem leituras prévias e combinados por usuário
+playback_pipeline = PlaybackPipeline(now_playing_hub)
+
+@registry.collector
+def component_metrics():
+    """Acertos dos caches, fila do scheduler, pool HTTP e sincronizações, lidos dos stats() a cada scrape"""
+    responses, entities, lyrics = response_cache.stats(), entity_cache.stats(), lyrics_cache.stats()
+    searches, playback, playlists = search_index.stats(), playback_pipeline.stats(), playlist_store.stats()
+    queue, pool = scheduler.stats(), pool_stats()
+    caches = {
+        'responses': (responses['hits'], responses['misses']),
+        'entities': (entities['hits'], entities['misses']),
+        'lyrics': (lyrics['hits'] + lyrics['negative_hits'], lyrics['lookups'] - lyrics['hits'] - lyrics['negative_hits']),
+        'search': (searches['local_hits'], searches['upstream_calls']),
+    }
+    return [
+        ('cache_hits_total', 'counter', 'Leituras atendidas pelo cache', [({'cache': name}, hits) for name, (hits, _) in caches.items()]),
+        ('cache_misses_total', 'counter', 'Leituras que foram à origem', [({'cache': name}, misses) for name, (_, misses) in caches.items()]),
+        ('cache_hit_ratio', 'gauge', 'Fração das leituras atendidas pelo cache', [
+            ({'cache': name}, hits / (hits + misses) if hits + misses else 0.0) for name, (hits, misses) in caches.items()
+        ]),
+        ('spotify_saved_calls_total', 'counter', 'Chamadas ao Spotify evitadas por coalescência', [
+            ({'source': 'responses'}, responses['coalescing']['saved_calls']),
+            ({'source': 'playback'}, playback['saved_calls']),
+        ]),
+        ('lyrics_cache_bytes', 'gauge', 'Bytes ocupados pelo cache de letras', [({}, lyrics['bytes'])]),
+        ('lyrics_cache_evictions_total', 'counter', 'Letras despejadas do cache', [({}, lyrics['evictions'])]),
+        ('playlist_syncs_total', 'counter', 'Sincronizações de playlists', [
+            ({'kind': 'list'}, playlists['lists_synced']),
+            ({'kind': 'synced'}, playlists['playlists_synced']),
+            ({'kind': 'skipped'}, playlists['playlists_skipped']),
+        ]),
+        ('scheduler_queue_depth', 'gauge', 'Chamadas esperando a vez no scheduler', [({}, queue['queue_depth'])]),
+        ('scheduler_throttle_events_total', 'counter', 'Respostas 429 que pausaram a fila', [({}, queue['throttle_events'])]),
+        ('scheduler_wait_seconds_avg', 'gauge', 'Espera média na fila do scheduler', [({}, queue['avg_wait_ms'] / 1000)]),
+        ('http_pool_in_use', 'gauge', 'Conexões do pool HTTP em uso', [({}, pool['in_use'])]),
+        ('http_pool_reuse_ratio', 'gauge', 'Fração das requisições em conexões reaproveitadas', [({}, pool['reuse_ratio'])]),
+    ]
+
+def get_user_profile(sp):
+    """Perfil do usuário logado, lido do profile_store"""
+    return profile_store.get(current_user_key(), sp)
+
+def remember_tracks(user_key, tracks):
+    """Alimenta o índice de busca do usuário com músicas já carregadas"""
+    search_index.add(user_key, tracks)
+    entity_cache.put('track', tracks)
 
 def check_premium(sp):
     """Verifica se o usuário tem Spotify Premium"""
     try:
-        user = sp.current_user()
+        user = get_user_profile(sp)
         return user.get('product') == 'premium'
     except:
         return False
@@ -47,37 +195,7 @@ def index():
     if code:
         return redirect(f'/callback?code={code}')
     
-    return render_template_string('''
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Spotify Music App</title>
-        <style>
-            body { font-family: Arial, sans-serif; margin: 40px; background: #191414; color: white; text-align: center; }
-            .btn { background: #1db954; color: white; padding: 15px 30px; text-decoration: none; border-radius: 25px; font-weight: bold; font-size: 18px; }
-            .btn:hover { background: #1ed760; }
-            h1 { color: #1db954; font-size: 3em; margin-bottom: 20px; }
-            .subtitle { color: #b3b3b3; font-size: 1.2em; margin-bottom: 40px; }
-            .features { text-align: left; max-width: 600px; margin: 40px auto; }
-            .feature { margin: 15px 0; padding: 10px; background: #282828; border-radius: 8px; }
-        </style>
-    </head>
-    <body>
-        <h1>🎵 Spotify Music Controller</h1>
-        <p class="subtitle">Explore e controle sua música!</p>
-        
-        <div class="features">
-            <div class="feature">🎧 <strong>Visualizar</strong> música atual e histórico</div>
-            <div class="feature">🔍 <strong>Buscar</strong> músicas, artistas e álbuns</div>
-            <div class="feature">🏆 <strong>Ver</strong> suas top músicas e artistas</div>
-            <div class="feature">📊 <strong>Analisar</strong> seus hábitos musicais</div>
-            <div class="feature">🎮 <strong>Controlar</strong> reprodução (Premium)</div>
-        </div>
-        
-        <a href="/login" class="btn">🎧 Conectar ao Spotify</a>
-    </body>
-    </html>
-    ''')
+    return render_page('index.html')
 
 @app.route('/login')
 def login():
@@ -98,11 +216,137 @@ def callback():
     
     try:
         token_info = sp_oauth.get_access_token(code, as_dict=True)
+        user_key = user_cache_key(token_info)
+        if hasattr(session, 'rotate'):
+            session.rotate()
         session['token_info'] = token_info
+        session['user_key'] = user_key
+        token_manager.save(user_key, token_info)
+        sp = create_spotify(token_info['access_token'], user_key)
+        profile_store.put(user_key, sp.current_user())
         return redirect('/dashboard')
     except Exception as e:
         return f"Erro ao obter token: {e}"
 
+# Loaders das páginas e da API JSON, compartilhados com o asgi.py: geradores de passos
+# (fanout.run_steps / run_steps_async) que recebem o LoadRequest da requisição
+LoadRequest = namedtuple('LoadRequest', 'user_key args params')
+
+def load_request():
+    return LoadRequest(current_user_key(), request.args, request.view_args or {})
+
+def track_artists(tracks):
+    """Artista principal de cada música (gêneros, seguidores) via cache de entidades"""
+    ids = [track.artists[0].id for track in tracks if track.artists]
+    artists = yield ClientCall(entity_cache, 'get_many', 'artist', ids)
+    return {artist_id: entity_cache.view('artist', artist) for artist_id, artist in artists.items()}
+
+def load_dashboard(req):
+    # Chamadas independentes em paralelo; falhas parciais não derrubam a página
+    results = yield {
+        'current_track': SpotifyCall('current_user_playing_track'),
+        'devices': SpotifyCall('devices'),
+    }
+    current_track = Playback.from_api(results['current_track'])
+    user_profile = yield ClientCall(profile_store, 'get', req.user_key)
+    return {
+        'current_track': current_track,
+        'now_playing': now_playing_state(current_track),
+        'user_name': user_profile.get('display_name', 'Usuário'),
+        'devices': results['devices'],
+        'is_premium': user_profile.get('product') == 'premium',
+    }
+
+def load_stats(req):
+    # Top tracks e artistas em diferentes períodos
+    results = yield {
+        'history': ClientCall(history_store, 'refresh', req.user_key),
+        'top_tracks_short': SpotifyCall('current_user_top_tracks', limit=5, time_range='short_term'),
+        'top_tracks_medium': SpotifyCall('current_user_top_tracks', limit=5, time_range='medium_term'),
+        'top_artists_short': SpotifyCall('current_user_top_artists', limit=5, time_range='short_term'),
+        'top_artists_medium': SpotifyCall('current_user_top_artists', limit=5, time_range='medium_term'),
+    }
+    empty = {'items': []}
+    top_tracks_short = track_page(results['top_tracks_short'])
+    top_tracks_medium = track_page(results['top_tracks_medium'])
+    remember_tracks(req.user_key, top_tracks_short['items'] + top_tracks_medium['items'])
+    yield Blocking(history_store.record_artists, items_of(results['top_artists_short']) + items_of(results['top_artists_medium']))
+    return {
+        'top_tracks_short': top_tracks_short,
+        'top_tracks_medium': top_tracks_medium,
+        'artists_short_processed': entity_cache.views('artist', (results['top_artists_short'] or empty)['items']),
+        'artists_medium_processed': entity_cache.views('artist', (results['top_artists_medium'] or empty)['items']),
+        'listening': (yield Blocking(analytics.summary, req.user_key)),
+    }
+
+def load_top_artists(req, cursor=None):
+    time_range, offset = top_position(cursor or req.args.get('cursor'), req.args.get('range'))
+    top_artists_data = yield SpotifyCall('current_user_top_artists', limit=TOP_ARTISTS_PAGE_SIZE, offset=offset, time_range=time_range)
+    yield Blocking(history_store.record_artists, top_artists_data['items'])
+    return {
+        'processed_artists': entity_cache.views('artist', top_artists_data['items']),
+        'time_range': time_range,
+        'offset': offset,
+        'next_cursor': next_top_cursor(top_artists_data, time_range, offset),
+    }
+
+def load_recent(req, cursor=None):
+    # Lido do histórico local; o Spotify só é consultado para trazer reproduções novas
+    before = recent_position(cursor or req.args.get('cursor'), int_arg(req.args, 'before'))
+    if before is None:
+        yield ClientCall(history_store, 'refresh', req.user_key)
+    items, next_before = yield Blocking(history_store.page, req.user_key, before=before)
+    tracks = [play.track for play in items]
+    remember_tracks(req.user_key, tracks)
+    return {
+        'recent': {'items': items},
+        'next_before': next_before,
+        'next_cursor': next_recent_cursor(next_before),
+        'artists': (yield from track_artists(tracks)),
+    }
+
+def load_top_tracks(req, cursor=None):
+    time_range, offset = top_position(cursor or req.args.get('cursor'), req.args.get('range'))
+    page = yield SpotifyCall('current_user_top_tracks', limit=TOP_TRACKS_PAGE_SIZE, offset=offset, time_range=time_range)
+    top_tracks = track_page(page)
+    remember_tracks(req.user_key, top_tracks['items'])
+    return {
+        'top_tracks': top_tracks,
+        'artists': (yield from track_artists(top_tracks['items'])),
+        'time_range': time_range,
+        'offset': offset,
+        'next_cursor': next_top_cursor(page, time_range, offset),
+    }
+
+def load_playlists(req):
+    # Lista local; o Spotify é conferido em segundo plano depois da primeira visita
+    yield ClientCall(playlist_store, 'refresh', req.user_key)
+    return {'playlists': (yield Blocking(playlist_store.playlists, req.user_key))}
+
+def load_playlist(req, cursor=None):
+    playlist_id = req.params['playlist_id']
+    position = playlist_position(cursor or req.args.get('cursor'))
+    yield ClientCall(playlist_store, 'refresh', req.user_key)
+    playlist = yield ClientCall(playlist_store, 'ensure', req.user_key, playlist_id)
+    items, next_position = yield Blocking(playlist_store.items, playlist_id, position)
+    remember_tracks(req.user_key, [item['track'] for item in items])
+    return {
+        'playlist': playlist,
+        'items': items,
+        'offset': position,
+        'next_cursor': next_playlist_cursor(next_position),
+    }
+
+def load_page(load, sp):
+    """Executa um loader na requisição atual com o cliente síncrono"""
+    return run_steps(load(load_request()), sp)
+
+def stream_list(template, load, sp):
+    """Primeira página carregada antes de responder; as seguintes seguem no mesmo HTML em streaming"""
+    req = load_request()
+    first = run_steps(load(req), sp)
+    return stream_page(template, **list_context(first, stream_pages(first, lambda cursor: run_steps(load(req, cursor), sp))))
+
 @app.route('/dashboard')
 def dashboard():
     sp = get_spotify_client()
@@ -110,260 +354,7 @@ def dashboard():
         return redirect('/login')
     
     try:
-        current_track = sp.current_user_playing_track()
-        user_profile = sp.current_user()
-        devices = sp.devices()
-        is_premium = check_premium(sp)
-        
-        return render_template_string('''
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>Dashboard - Spotify Controller</title>
-            <style>
-                body { font-family: Arial, sans-serif; margin: 0; background: #191414; color: white; }
-                .container { max-width: 1000px; margin: 0 auto; padding: 20px; }
-                .player-card { background: linear-gradient(135deg, #1db954, #1ed760); padding: 30px; border-radius: 15px; margin: 20px 0; text-align: center; }
-                .controls { display: flex; justify-content: center; gap: 15px; margin: 20px 0; }
-                .control-btn { background: rgba(255,255,255,0.2); border: none; color: white; padding: 15px; border-radius: 50%; cursor: pointer; font-size: 20px; transition: all 0.3s; }
-                .control-btn:hover { background: rgba(255,255,255,0.3); transform: scale(1.1); }
-                .control-btn:disabled { opacity: 0.5; cursor: not-allowed; }
-                .play-pause { background: #fff; color: #1db954; font-size: 24px; padding: 20px; }
-                .track-info { margin: 20px 0; }
-                .track-title { font-size: 24px; font-weight: bold; margin: 10px 0; }
-                .track-artist { font-size: 18px; opacity: 0.9; }
-                .btn { background: #1db954; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px; margin: 5px; display: inline-block; }
-                .btn:hover { background: #1ed760; }
-                .card { background: #282828; padding: 20px; margin: 20px 0; border-radius: 10px; }
-                h1 { color: #1db954; text-align: center; }
-                .premium-badge { background: #ffd700; color: #000; padding: 5px 10px; border-radius: 15px; font-size: 12px; font-weight: bold; }
-                .free-badge { background: #666; color: #fff; padding: 5px 10px; border-radius: 15px; font-size: 12px; }
-                .warning { background: #ff6b35; color: white; padding: 15px; border-radius: 8px; margin: 10px 0; }
-                .spotify-link { background: #1db954; color: white; padding: 8px 15px; text-decoration: none; border-radius: 20px; font-size: 14px; }
-                .track-details { background: rgba(0,0,0,0.3); padding: 15px; border-radius: 10px; margin: 15px 0; }
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <h1>🎵 Olá, {{ user_name }}! 
-                    {% if is_premium %}
-                        <span class="premium-badge">PREMIUM</span>
-                    {% else %}
-                        <span class="free-badge">FREE</span>
-                    {% endif %}
-                </h1>
-                
-                <div class="player-card">
-                    <div class="track-info">
-                        {% if current_track and current_track.item %}
-                            <div class="track-title">{{ current_track.item.name }}</div>
-                            <div class="track-artist">{{ current_track.item.artists[0].name }}</div>
-                            
-                            <div class="track-details">
-                                <div>💿 <strong>Álbum:</strong> {{ current_track.item.album.name }}</div>
-                                <div>📅 <strong>Lançamento:</strong> {{ current_track.item.album.release_date }}</div>
-                                <div>⭐ <strong>Popularidade:</strong> {{ current_track.item.popularity }}/100</div>
-                                <div>⏱️ <strong>Duração:</strong> {{ (current_track.item.duration_ms // 60000) }}:{{ '%02d'|format((current_track.item.duration_ms % 60000) // 1000) }}</div>
-                            </div>
-                            
-                            <div style="margin: 10px 0;">
-                                <span style="background: rgba(0,0,0,0.3); padding: 5px 10px; border-radius: 15px;">
-                                    {{ "▶️ Tocando" if current_track.is_playing else "⏸️ Pausado" }}
-                                </span>
-                            </div>
-                            
-                            <a href="{{ current_track.item.external_urls.spotify }}" target="_blank" class="spotify-link">
-                                🎧 Abrir no Spotify
-                            </a>
-                        {% else %}
-                            <div class="track-title">Nenhuma música tocando</div>
-                            <div class="track-artist">Abra o Spotify e comece a tocar algo!</div>
-                        {% endif %}
-                    </div>
-                    
-                    {% if not is_premium %}
-                    <div class="warning">
-                        ⚠️ <strong>Controles de reprodução requerem Spotify Premium</strong><br>
-                        <small>Você pode visualizar informações e usar outras funcionalidades</small>
-                    </div>
-                    {% endif %}
-                    
-                    <div class="controls">
-                        <button class="control-btn" onclick="previousTrack()" {{ "disabled" if not is_premium }}>⏮️</button>
-                        <button class="control-btn play-pause" onclick="togglePlayPause()" {{ "disabled" if not is_premium }}>
-                            {{ "⏸️" if current_track and current_track.is_playing else "▶️" }}
-                        </button>
-                        <button class="control-btn" onclick="nextTrack()" {{ "disabled" if not is_premium }}>⏭️</button>
-                    </div>
-                    
-                    {% if current_track and current_track.item %}
-                    <div style="margin-top: 20px;">
-                        <button class="btn" onclick="showLyrics('{{ current_track.item.name }}', '{{ current_track.item.artists[0].name }}')">
-                            📝 Ver Letra
-                        </button>
-                        <button class="btn" onclick="shareTrack('{{ current_track.item.external_urls.spotify }}', '{{ current_track.item.name }}', '{{ current_track.item.artists[0].name }}')" style="background: #3b82f6;">
-                            📤 Compartilhar
-                        </button>
-                    </div>
-                    {% endif %}
-                </div>
-                
-                {% if devices and devices.devices %}
-                <div class="card">
-                    <h3>🔊 Dispositivos Spotify:</h3>
-                    {% for device in devices.devices %}
-                        <div style="background: #333; padding: 10px; border-radius: 5px; margin: 10px 0;">
-                            <strong>{{ device.name }}</strong> ({{ device.type }}) 
-                            {% if device.is_active %}
-                                <span style="color: #1db954;">● Ativo</span>
-                            {% endif %}
-                            <br><small>Volume: {{ device.volume_percent }}%</small>
-                        </div>
-                    {% endfor %}
-                </div>
-                {% endif %}
-                
-                <div class="card" style="text-align: center;">
-                    <h3>🎯 Explore sua Música:</h3>
-                    <a href="/search" class="btn">🔍 Buscar Músicas</a>
-                    <a href="/top-tracks" class="btn">🏆 Top Músicas</a>
-                    <a href="/top-artists" class="btn">🎤 Top Artistas</a>
-                    <a href="/recent" class="btn">🕒 Recentes</a>
-                    <a href="/stats" class="btn">📊 Estatísticas</a>
-                    <a href="/logout" class="btn" style="background: #e22134;">🚪 Logout</a>
-                </div>
-            </div>
-            
-            <!-- Modal para letras -->
-            <div id="lyricsModal" style="display: none; position: fixed; top: 0; left: 0; width: 100%; height: 100%; background: rgba(0,0,0,0.8); z-index: 1000;">
-                <div style="position: absolute; top: 50%; left: 50%; transform: translate(-50%, -50%); background: #282828; padding: 30px; border-radius: 15px; max-width: 600px; max-height: 80%; overflow-y: auto;">
-                    <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 20px;">
-                        <h3 id="lyricsTitle" style="color: #1db954; margin: 0;"></h3>
-                        <button onclick="closeLyrics()" style="background: #e22134; color: white; border: none; padding: 10px 15px; border-radius: 5px; cursor: pointer;">✕</button>
-                    </div>
-                    <div id="lyricsContent" style="line-height: 1.6; white-space: pre-line;"></div>
-                </div>
-            </div>
-            
-            <script>
-                const isPremium = {{ is_premium|lower }};
-                
-                async function togglePlayPause() {
-                    if (!isPremium) {
-                        alert('⚠️ Esta funcionalidade requer Spotify Premium');
-                        return;
-                    }
-                    
-                    try {
-                        const response = await fetch('/api/toggle-playback', { method: 'POST' });
-                        const result = await response.json();
-                        if (result.success) {
-                            setTimeout(() => location.reload(), 500);
-                        } else {
-                            alert('Erro: ' + result.error);
-                        }
-                    } catch (error) {
-                        alert('Erro ao controlar reprodução: ' + error);
-                    }
-                }
-                
-                async function nextTrack() {
-                    if (!isPremium) {
-                        alert('⚠️ Esta funcionalidade requer Spotify Premium');
-                        return;
-                    }
-                    
-                    try {
-                        const response = await fetch('/api/next-track', { method: 'POST' });
-                        const result = await response.json();
-                        if (result.success) {
-                            setTimeout(() => location.reload(), 1000);
-                        } else {
-                            alert('Erro: ' + result.error);
-                        }
-                    } catch (error) {
-                        alert('Erro ao avançar música: ' + error);
-                    }
-                }
-                
-                async function previousTrack() {
-                    if (!isPremium) {
-                        alert('⚠️ Esta funcionalidade requer Spotify Premium');
-                        return;
-                    }
-                    
-                    try {
-                        const response = await fetch('/api/previous-track', { method: 'POST' });
-                        const result = await response.json();
-                        if (result.success) {
-                            setTimeout(() => location.reload(), 1000);
-                        } else {
-                            alert('Erro: ' + result.error);
-                        }
-                    } catch (error) {
-                        alert('Erro ao voltar música: ' + error);
-                    }
-                }
-                
-                function showLyrics(trackName, artistName) {
-                    document.getElementById('lyricsTitle').textContent = trackName + ' - ' + artistName;
-                    document.getElementById('lyricsContent').innerHTML = `
-                        <p>🎵 <strong>Onde encontrar a letra:</strong></p>
-                        <p>• <a href="https://www.google.com/search?q=${encodeURIComponent(trackName + ' ' + artistName + ' letra')}" target="_blank" style="color: #1db954;">Google: "${trackName}" letra</a></p>
-                        <p>• <a href="https://www.letras.mus.br/" target="_blank" style="color: #1db954;">Letras.mus.br</a></p>
-                        <p>• <a href="https://genius.com/" target="_blank" style="color: #1db954;">Genius.com</a></p>
-                        <p>• <a href="https://www.azlyrics.com/" target="_blank" style="color: #1db954;">AZLyrics.com</a></p>
-                        <br>
-                        <p><small>💡 <em>Dica: Clique nos links acima para buscar a letra em sites especializados!</em></small></p>
-                    `;
-                    document.getElementById('lyricsModal').style.display = 'block';
-                }
-                
-                function shareTrack(spotifyUrl, trackName, artistName) {
-                    if (navigator.share) {
-                        navigator.share({
-                            title: trackName + ' - ' + artistName,
-                            text: 'Escute esta música no Spotify!',
-                            url: spotifyUrl
-                        });
-                    } else {
-                        // Fallback para navegadores sem Web Share API
-                        const text = `🎵 Escutando: ${trackName} - ${artistName}\\n${spotifyUrl}`;
-                        navigator.clipboard.writeText(text).then(() => {
-                            alert('Link copiado para a área de transferência!');
-                        }).catch(() => {
-                            prompt('Copie este link:', spotifyUrl);
-                        });
-                    }
-                }
-                
-                function closeLyrics() {
-                    document.getElementById('lyricsModal').style.display = 'none';
-                }
-                
-                // Fechar modal clicando fora
-                document.getElementById('lyricsModal').onclick = function(e) {
-                    if (e.target === this) {
-                        closeLyrics();
-                    }
-                }
-                
-                // Auto-refresh a cada 30 segundos para atualizar música atual
-                setInterval(() => {
-                    if (document.visibilityState === 'visible') {
-                        location.reload();
-                    }
-                }, 30000);
-            </script>
-        </body>
-        </html>
-        ''', 
-        current_track=current_track, 
-        user_name=user_profile.get('display_name', 'Usuário'),
-        devices=devices,
-        is_premium=is_premium
-        )
-        
+        return render_page('dashboard.html', **load_page(load_dashboard, sp))
     except Exception as e:
         return f"Erro ao carregar dashboard: {e}"
 
@@ -375,133 +366,7 @@ def stats():
         return redirect('/login')
     
     try:
-        # Top tracks e artistas em diferentes períodos
-        top_tracks_short = sp.current_user_top_tracks(limit=5, time_range='short_term')
-        top_tracks_medium = sp.current_user_top_tracks(limit=5, time_range='medium_term')
-        top_artists_short = sp.current_user_top_artists(limit=5, time_range='short_term')
-        top_artists_medium = sp.current_user_top_artists(limit=5, time_range='medium_term')
-        
-        # Processar dados dos artistas para evitar erros de template
-        def process_artists(artists_data):
-            processed = []
-            for artist in artists_data['items']:
-                genres_text = "Gênero não especificado"
-                if artist.get('genres') and len(artist['genres']) > 0:
-                    genres_list = artist['genres'][:3]  # Pegar até 3 gêneros
-                    genres_text = ', '.join(genres_list)
-                
-                processed.append({
-                    'name': artist['name'],
-                    'popularity': artist.get('popularity', 0),
-                    'genres_text': genres_text,
-                    'followers': artist.get('followers', {}).get('total', 0)
-                })
-            return processed
-        
-        artists_short_processed = process_artists(top_artists_short)
-        artists_medium_processed = process_artists(top_artists_medium)
-        
-        return render_template_string('''
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>Estatísticas - Spotify App</title>
-            <style>
-                body { font-family: Arial, sans-serif; margin: 20px; background: #191414; color: white; }
-                .container { max-width: 1000px; margin: 0 auto; }
-                .btn { background: #1db954; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px; margin: 5px; }
-                .stats-grid { display: grid; grid-template-columns: 1fr 1fr; gap: 20px; margin: 20px 0; }
-                .stat-card { background: #282828; padding: 20px; border-radius: 10px; }
-                h1, h2 { color: #1db954; }
-                ul { list-style: none; padding: 0; }
-                li { background: #333; margin: 8px 0; padding: 12px; border-radius: 5px; }
-                .period { background: #1db954; color: white; padding: 5px 10px; border-radius: 15px; font-size: 12px; margin-bottom: 15px; display: inline-block; }
-                .track-info, .artist-info { color: #b3b3b3; font-size: 0.9em; margin-top: 5px; }
-                .rank { color: #1db954; font-weight: bold; margin-right: 8px; }
-                @media (max-width: 768px) { .stats-grid { grid-template-columns: 1fr; } }
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <h1>📊 Suas Estatísticas Musicais</h1>
-                
-                <div class="stats-grid">
-                    <div class="stat-card">
-                        <span class="period">🔥 ÚLTIMAS 4 SEMANAS</span>
-                        <h2>🎵 Top 5 Músicas</h2>
-                        <ul>
-                        {% for track in top_tracks_short.items %}
-                            <li>
-                                <span class="rank">{{ loop.index }}.</span>
-                                <strong>{{ track.name }}</strong><br>
-                                <div class="track-info">🎤 {{ track.artists[0].name }}</div>
-                                <div class="track-info">⭐ {{ track.popularity }}/100</div>
-                            </li>
-                        {% endfor %}
-                        </ul>
-                    </div>
-                    
-                    <div class="stat-card">
-                        <span class="period">📅 ÚLTIMOS 6 MESES</span>
-                        <h2>🎵 Top 5 Músicas</h2>
-                        <ul>
-                        {% for track in top_tracks_medium.items %}
-                            <li>
-                                <span class="rank">{{ loop.index }}.</span>
-                                <strong>{{ track.name }}</strong><br>
-                                <div class="track-info">🎤 {{ track.artists[0].name }}</div>
-                                <div class="track-info">⭐ {{ track.popularity }}/100</div>
-                            </li>
-                        {% endfor %}
-                        </ul>
-                    </div>
-                    
-                    <div class="stat-card">
-                        <span class="period">🔥 ÚLTIMAS 4 SEMANAS</span>
-                        <h2>🎤 Top 5 Artistas</h2>
-                        <ul>
-                        {% for artist in artists_short_processed %}
-                            <li>
-                                <span class="rank">{{ loop.index }}.</span>
-                                <strong>{{ artist.name }}</strong><br>
-                                <div class="artist-info">🎵 {{ artist.genres_text }}</div>
-                                <div class="artist-info">⭐ {{ artist.popularity }}/100</div>
-                            </li>
-                        {% endfor %}
-                        </ul>
-                    </div>
-                    
-                    <div class="stat-card">
-                        <span class="period">📅 ÚLTIMOS 6 MESES</span>
-                        <h2>🎤 Top 5 Artistas</h2>
-                        <ul>
-                        {% for artist in artists_medium_processed %}
-                            <li>
-                                <span class="rank">{{ loop.index }}.</span>
-                                <strong>{{ artist.name }}</strong><br>
-                                <div class="artist-info">🎵 {{ artist.genres_text }}</div>
-                                <div class="artist-info">⭐ {{ artist.popularity }}/100</div>
-                            </li>
-                        {% endfor %}
-                        </ul>
-                    </div>
-                </div>
-                
-                <div style="text-align: center; margin: 30px 0;">
-                    <a href="/dashboard" class="btn">← Voltar ao Dashboard</a>
-                    <a href="/top-tracks" class="btn">🏆 Ver Mais Músicas</a>
-                    <a href="/top-artists" class="btn">🎤 Ver Mais Artistas</a>
-                </div>
-            </div>
-        </body>
-        </html>
-        ''', 
-        top_tracks_short=top_tracks_short,
-        top_tracks_medium=top_tracks_medium,
-        artists_short_processed=artists_short_processed,
-        artists_medium_processed=artists_medium_processed
-        )
-        
+        return render_page('stats.html', **load_page(load_stats, sp))
     except Exception as e:
         return f"Erro ao carregar estatísticas: {e}"
 
@@ -512,110 +377,43 @@ def top_artists():
         return redirect('/login')
     
     try:
-        top_artists_data = sp.current_user_top_artists(limit=20, time_range='medium_term')
-        
-        # Processar dados para evitar erros
-        processed_artists = []
-        for artist in top_artists_data['items']:
-            genres_text = "Gênero não especificado"
-            if artist.get('genres') and len(artist['genres']) > 0:
-                genres_list = artist['genres'][:3]  # Pegar até 3 gêneros
-                genres_text = ', '.join(genres_list)
-            
-            followers_count = artist.get('followers', {}).get('total', 0)
-            followers_formatted = "{:,}".format(followers_count).replace(',', '.')
-            
-            processed_artists.append({
-                'name': artist['name'],
-                'popularity': artist.get('popularity', 0),
-                'genres_text': genres_text,
-                'followers_formatted': followers_formatted
-            })
-        
-        return render_template_string('''
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>Top Artistas - Spotify App</title>
-            <style>
-                body { font-family: Arial, sans-serif; margin: 20px; background: #191414; color: white; }
-                .container { max-width: 800px; margin: 0 auto; }
-                .btn { background: #1db954; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px; margin: 5px; }
-                ul { list-style: none; padding: 0; }
-                li { background: #282828; margin: 10px 0; padding: 15px; border-radius: 5px; }
-                .rank { background: #1db954; color: white; padding: 5px 10px; border-radius: 50%; margin-right: 10px; font-size: 14px; }
-                h1 { color: #1db954; }
-                .genres { color: #b3b3b3; font-size: 0.9em; margin-top: 5px; }
-                .popularity { color: #ffd700; margin-left: 10px; }
-                .followers { color: #b3b3b3; font-size: 0.9em; margin-top: 5px; }
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <h1>🎤 Seus Top 20 Artistas</h1>
-                <p style="color: #b3b3b3; text-align: center; margin-bottom: 30px;">Baseado nos últimos 6 meses</p>
-                
-                <ul>
-                {% for artist in processed_artists %}
-                    <li>
-                        <span class="rank">{{ loop.index }}</span>
-                        <strong>{{ artist.name }}</strong>
-                        <span class="popularity">⭐ {{ artist.popularity }}/100</span><br>
-                        <div class="genres">🎵 {{ artist.genres_text }}</div>
-                        <div class="followers">👥 {{ artist.followers_formatted }} seguidores</div>
-                    </li>
-                {% endfor %}
-                </ul>
-                
-                <div style="text-align: center; margin: 30px 0;">
-                    <a href="/dashboard" class="btn">← Voltar ao Dashboard</a>
-                    <a href="/stats" class="btn">📊 Ver Estatísticas</a>
-                </div>
-            </div>
-        </body>
-        </html>
-        ''', processed_artists=processed_artists)
-        
+        return stream_list('top_artists.html', load_top_artists, sp)
     except Exception as e:
         return f"Erro ao carregar top artistas: {e}"
     
-# APIs para controle de reprodução (com verificação Premium)
-@app.route('/api/toggle-playback', methods=['POST'])
-def toggle_playback():
+@app.route('/playlists')
+def playlists():
     sp = get_spotify_client()
     if not sp:
-        return jsonify({'success': False, 'error': 'Não autenticado'})
-    
-    if not check_premium(sp):
-        return jsonify({'success': False, 'error': 'Spotify Premium necessário'})
+        return redirect('/login')
     
     try:
-        current = sp.current_user_playing_track()
-        if current and current['is_playing']:
-            sp.pause_playback()
-        else:
-            sp.start_playback()
-        return jsonify({'success': True})
+        return render_page('playlists.html', **load_page(load_playlists, sp))
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)})
+        return f"Erro ao carregar playlists: {e}"
 
-@app.route('/api/next-track', methods=['POST'])
-def next_track():
+@app.route('/playlists/<playlist_id>')
+def playlist_detail(playlist_id):
     sp = get_spotify_client()
     if not sp:
-        return jsonify({'success': False, 'error': 'Não autenticado'})
-    
-    if not check_premium(sp):
-        return jsonify({'success': False, 'error': 'Spotify Premium necessário'})
+        return redirect('/login')
     
     try:
-        sp.next_track()
-        return jsonify({'success': True})
+        return stream_list('playlist.html', load_playlist, sp)
+    except PlaylistNotFound as e:
+        return str(e), 404
     except Exception as e:
-        return jsonify({'success': False, 'error': str(e)})
+        return f"Erro ao carregar playlist: {e}"
+
+# APIs para controle de reprodução (com verificação Premium)
+PLAYBACK_COMMANDS = {
+    'toggle-playback': 'toggle',
+    'next-track': 'next',
+    'previous-track': 'previous',
+}
 
-@app.route('/api/previous-track', methods=['POST'])
-def previous_track():
+@app.route('/api/<any("toggle-playback", "next-track", "previous-track"):action>', methods=['POST'])
+def playback_command(action):
     sp = get_spotify_client()
     if not sp:
         return jsonify({'success': False, 'error': 'Não autenticado'})
@@ -623,9 +421,16 @@ def previous_track():
     if not check_premium(sp):
         return jsonify({'success': False, 'error': 'Spotify Premium necessário'})
     
+    user_key = current_user_key()
+    command = PLAYBACK_COMMANDS[action]
     try:
-        sp.previous_track()
-        return jsonify({'success': True})
+        # Play/pause decidido pelo estado em cache; só lê o player se não houver nenhum
+        state = playback_pipeline.known_state(user_key)
+        if state is None and command == 'toggle':
+            state = now_playing_state(sp.current_user_playing_track())
+        # Resposta otimista na hora: o resultado real (ou o erro) chega às abas pelo SSE
+        _, optimistic = playback_pipeline.submit(user_key, command, make_client_factory(user_key, True, session['token_info']), state or {})
+        return jsonify({'success': True, 'state': optimistic})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
@@ -642,80 +447,34 @@ def search():
             try:
                 results = sp.search(q=query, type='track', limit=15)
                 if results and 'tracks' in results and 'items' in results['tracks']:
-                    tracks = results['tracks']['items']
+                    tracks = [Track.from_api(t) for t in results['tracks']['items'] if t]
+                    remember_tracks(current_user_key(), tracks)
             except Exception as e:
                 return f"Erro na busca: {e}"
     
-    return render_template_string('''
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Buscar - Spotify App</title>
-        <style>
-            body { font-family: Arial, sans-serif; margin: 20px; background: #191414; color: white; }
-            .container { max-width: 800px; margin: 0 auto; }
-            input { padding: 12px; width: 350px; border: none; border-radius: 25px; margin-right: 10px; font-size: 16px; }
-            button { background: #1db954; color: white; padding: 12px 25px; border: none; border-radius: 25px; cursor: pointer; font-size: 16px; }
-            .btn { background: #1db954; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px; }
-            ul { list-style: none; padding: 0; }
-            li { background: #282828; margin: 15px 0; padding: 20px; border-radius: 10px; }
-            h1 { color: #1db954; }
-            .track-name { font-size: 1.2em; font-weight: bold; margin-bottom: 8px; }
-            .track-info { color: #b3b3b3; margin: 5px 0; }
-            .spotify-btn { background: #1db954; color: white; padding: 8px 15px; text-decoration: none; border-radius: 20px; font-size: 14px; margin: 5px; }
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>🔍 Buscar Músicas</h1>
-            
-            <form method="GET" style="text-align: center; margin: 30px 0;">
-                <input type="text" name="q" value="{{ query }}" placeholder="Digite o nome da música, artista ou álbum..." autofocus>
-                <button type="submit">🔍 Buscar</button>
-            </form>
-            
-            {% if tracks %}
-                <h2>Resultados ({{ tracks|length }}):</h2>
-                <ul>
-                {% for track in tracks %}
-                    <li>
-                        <div class="track-name">{{ track.name }}</div>
-                        <div class="track-info">🎤 {{ track.artists[0].name }}</div>
-                        <div class="track-info">💿 {{ track.album.name }} ({{ track.album.release_date[:4] }})</div>
-                        <div class="track-info">⭐ {{ track.popularity }}/100 | ⏱️ {{ (track.duration_ms // 60000) }}:{{ '%02d'|format((track.duration_ms % 60000) // 1000) }}</div>
-                        <div style="margin-top: 10px;">
-                            <a href="{{ track.external_urls.spotify }}" target="_blank" class="spotify-btn">🎧 Abrir no Spotify</a>
-                            <button class="spotify-btn" onclick="showLyrics('{{ track.name }}', '{{ track.artists[0].name }}')" style="background: #e22134; border: none; cursor: pointer;">📝 Letra</button>
-                        </div>
-                    </li>
-                {% endfor %}
-                </ul>
-            {% elif query %}
-                <div style="text-align: center; margin: 40px 0;">
-                    <h3>😔 Nenhum resultado encontrado</h3>
-                    <p>Tente buscar por outro termo: "{{ query }}"</p>
-                </div>
-            {% else %}
-                <div style="text-align: center; margin: 40px 0; color: #b3b3b3;">
-                    <p>💡 Digite algo para buscar músicas, artistas ou álbuns...</p>
-                    <p><small>Exemplos: "Anitta", "rock nacional", "samba"</small></p>
-                </div>
-            {% endif %}
-            
-            <div style="text-align: center; margin: 30px 0;">
-                <a href="/dashboard" class="btn">← Voltar ao Dashboard</a>
-            </div>
-        </div>
-        
-        <script>
-            function showLyrics(trackName, artistName) {
-                const searchUrl = `https://www.google.com/search?q=${encodeURIComponent(trackName + ' ' + artistName + ' letra')}`;
-                window.open(searchUrl, '_blank');
-            }
-        </script>
-    </body>
-    </html>
-    ''', query=query, tracks=tracks)
+    return render_page('search.html', query=query, tracks=tracks)
+
+@app.route('/api/search/suggest')
+def search_suggest():
+    """Sugestões instantâneas: índice local primeiro, Spotify (cacheado) só se ele não bastar"""
+    query = request.args.get('q', '')
+    sp = get_spotify_client()
+    if not sp:
+        return jsonify({'success': False, 'error': 'Não autenticado'}), 401
+    
+    user_key = current_user_key()
+    items, upstream_query = search_index.lookup(user_key, query)
+    source = 'index'
+    if upstream_query:
+        try:
+            # Consulta normalizada: variações de caixa/acentos caem na mesma entrada do cache
+            results = sp.search(q=upstream_query, type='track', limit=UPSTREAM_LIMIT)
+            items = search_index.merge_upstream(user_key, query, items, results)
+            source = 'spotify'
+        except Exception as e:
+            if not items:
+                return jsonify({'success': False, 'error': str(e)}), 502
+    return jsonify({'query': query, 'source': source, 'items': items[:SUGGEST_LIMIT]})
 
 # Manter outras rotas (recent, top-tracks, logout)...
 @app.route('/recent')
@@ -725,46 +484,7 @@ def recent_tracks():
         return redirect('/login')
     
     try:
-        recent = sp.current_user_recently_played(limit=30)
-        return render_template_string('''
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>Músicas Recentes - Spotify App</title>
-            <style>
-                body { font-family: Arial, sans-serif; margin: 20px; background: #191414; color: white; }
-                .container { max-width: 800px; margin: 0 auto; }
-                .btn { background: #1db954; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px; }
-                ul { list-style: none; padding: 0; }
-                li { background: #282828; margin: 10px 0; padding: 15px; border-radius: 5px; }
-                h1 { color: #1db954; }
-                .time { color: #b3b3b3; font-size: 0.9em; }
-                .spotify-link { background: #1db954; color: white; padding: 5px 10px; text-decoration: none; border-radius: 15px; font-size: 12px; }
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <h1>🕒 Músicas Tocadas Recentemente</h1>
-                
-                <ul>
-                {% for item in recent.items %}
-                    <li>
-                        <strong>{{ item.track.name }}</strong><br>
-                        <em>{{ item.track.artists[0].name }}</em><br>
-                        <div class="time">📅 {{ item.played_at[:10] }} às {{ item.played_at[11:16] }}</div>
-                        <div style="margin-top: 8px;">
-                            <a href="{{ item.track.external_urls.spotify }}" target="_blank" class="spotify-link">🎧 Abrir no Spotify</a>
-                        </div>
-                    </li>
-                {% endfor %}
-                </ul>
-                
-                <a href="/dashboard" class="btn">← Voltar ao Dashboard</a>
-            </div>
-        </body>
-        </html>
-        ''', recent=recent)
-        
+        return stream_list('recent.html', load_recent, sp)
     except Exception as e:
         return f"Erro ao carregar músicas recentes: {e}"
 
@@ -775,54 +495,111 @@ def top_tracks():
         return redirect('/login')
     
     try:
-        top_tracks = sp.current_user_top_tracks(limit=25, time_range='medium_term')
-        
-        return render_template_string('''
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>Top Músicas - Spotify App</title>
-            <style>
-                body { font-family: Arial, sans-serif; margin: 20px; background: #191414; color: white; }
-                .container { max-width: 800px; margin: 0 auto; }
-                .btn { background: #1db954; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px; }
-                ul { list-style: none; padding: 0; }
-                li { background: #282828; margin: 10px 0; padding: 15px; border-radius: 5px; }
-                .rank { background: #1db954; color: white; padding: 8px 12px; border-radius: 50%; margin-right: 15px; font-weight: bold; }
-                h1 { color: #1db954; }
-                .spotify-link { background: #1db954; color: white; padding: 5px 10px; text-decoration: none; border-radius: 15px; font-size: 12px; }
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <h1>🏆 Suas Top 25 Músicas</h1>
-                <p style="color: #b3b3b3; text-align: center;">Baseado nos últimos 6 meses</p>
-                
-                <ul>
-                {% for track in top_tracks.items %}
-                    <li>
-                        <span class="rank">{{ loop.index }}</span>
-                        <strong>{{ track.name }}</strong><br>
-                        <em>{{ track.artists[0].name }}</em><br>
-                        <small>Popularidade: {{ track.popularity }}/100</small>
-                        <div style="margin-top: 8px;">
-                            <a href="{{ track.external_urls.spotify }}" target="_blank" class="spotify-link">🎧 Abrir no Spotify</a>
-                        </div>
-                    </li>
-                {% endfor %}
-                </ul>
-                
-                <a href="/dashboard" class="btn">← Voltar ao Dashboard</a>
-            </div>
-        </body>
-        </html>
-        ''', top_tracks=top_tracks)
-        
+        return stream_list('top_tracks.html', load_top_tracks, sp)
     except Exception as e:
         return f"Erro ao carregar top tracks: {e}"
 
+# API JSON de leitura com ETag: clientes que fazem polling recebem 304 se nada mudou
+JSON_VIEWS = {
+    'dashboard': (load_dashboard, dashboard_payload),
+    'stats': (load_stats, stats_payload),
+    'top-tracks': (load_top_tracks, top_tracks_payload),
+    'top-artists': (load_top_artists, top_artists_payload),
+    'recent': (load_recent, recent_payload),
+    'playlists': (load_playlists, playlists_payload),
+}
+
+@app.route('/api/<any(dashboard, stats, "top-tracks", "top-artists", recent, playlists):view>')
+def json_view(view):
+    sp = get_spotify_client()
+    if not sp:
+        return jsonify({'success': False, 'error': 'Não autenticado'}), 401
+    
+    load, payload = JSON_VIEWS[view]
+    try:
+        return conditional_json(payload(load_page(load, sp)))
+    except InvalidCursor as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 502
+
+@app.route('/api/playlists/<playlist_id>')
+def playlist_json(playlist_id):
+    sp = get_spotify_client()
+    if not sp:
+        return jsonify({'success': False, 'error': 'Não autenticado'}), 401
+    
+    try:
+        return conditional_json(playlist_payload(load_page(load_playlist, sp)))
+    except InvalidCursor as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except PlaylistNotFound as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 502
+
+@app.route('/api/export')
+def export_library():
+    """Biblioteca inteira gerada aos poucos: memória constante qualquer que seja o tamanho"""
+    sp = get_spotify_client()
+    if not sp:
+        return jsonify({'success': False, 'error': 'Não autenticado'}), 401
+    
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'success': False, 'error': f'Formato inválido: {fmt}'}), 400
+    try:
+        sections = parse_sections(request.args.get('sections'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    encode, mimetype, filename = EXPORT_FORMATS[fmt]
+    return Response(
+        encode(exporter.records(current_user_key(), sp, sections)), mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"', 'Cache-Control': 'no-store'},
+    )
+
+@app.route('/api/lyrics')
+def lyrics():
+    if not session.get('token_info'):
+        return jsonify({'success': False, 'error': 'Não autenticado'}), 401
+    
+    track = request.args.get('track', '').strip()
+    artist = request.args.get('artist', '').strip()
+    if not track or not artist:
+        return jsonify({'success': False, 'error': 'Informe track e artist'}), 400
+    try:
+        text, source = lyrics_cache.get(track, artist)
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'Erro ao buscar letra: {e}'}), 502
+    if text is None:
+        response = jsonify({'success': False, 'error': 'Letra não encontrada'})
+        response.status_code = 404
+    else:
+        response = jsonify({'success': True, 'lyrics': text, 'source': source})
+    response.headers['Cache-Control'] = 'private, max-age=3600'
+    return response
+
+@app.route('/api/now-playing/stream')
+def now_playing_stream():
+    if not get_spotify_client():
+        return jsonify({'success': False, 'error': 'Não autenticado'}), 401
+    user_key = current_user_key()
+    poller, q = now_playing_hub.subscribe(user_key, make_client_factory(user_key))
+    return Response(
+        sse_stream(poller, q),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/logout')
 def logout():
+    if session.get('token_info'):
+        user_key = current_user_key()
+        profile_store.discard(user_key)
+        search_index.discard(user_key)
+        analytics.discard(user_key)
+        playback_pipeline.discard(user_key)
+        token_manager.discard(user_key)
     session.clear()
     return redirect('/')
 
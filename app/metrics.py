@@ -0,0 +1,306 @@
+import contextvars
+import hmac
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Limites (segundos) dos baldes dos histogramas de latência
+LATENCY_BUCKETS = tuple(float(b) for b in os.getenv(
+    'METRICS_BUCKETS', '0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10'
+).split(','))
+# Coleções da API cujo segmento seguinte é um ID (playlists/{id}/tracks, artists/{id}/top-tracks)
+SPOTIFY_COLLECTIONS = {'albums', 'artists', 'audiobooks', 'chapters', 'episodes', 'playlists', 'shows', 'tracks', 'users'}
+# Respostas longas por natureza: a duração não diz nada sobre latência
+UNTIMED_TYPES = {'text/event-stream'}
+# /metrics exige 'Authorization: Bearer <METRICS_TOKEN>'; sem token configurado, fica desligado
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Rota que originou o trabalho atual; segue para as threads do fan-out e para as tasks do asyncio
+current_route = contextvars.ContextVar('current_route', default='background')
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in labels) + '}'
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} counter'
+        for labelvalues, value in values:
+            yield f'{self.name}{format_labels(zip(self.labelnames, labelvalues))} {value}'
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._values = {}  # labels -> [contagem por balde..., soma]
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, *labelvalues):
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._values.get(labelvalues)
+            if series is None:
+                series = self._values[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += seconds
+
+    def render(self):
+        with self._lock:
+            values = sorted((labels, list(series)) for labels, series in self._values.items())
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} histogram'
+        for labelvalues, series in values:
+            labels = list(zip(self.labelnames, labelvalues))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                yield f'{self.name}_bucket{format_labels(labels + [("le", le)])} {cumulative}'
+            yield f'{self.name}_sum{format_labels(labels)} {series[-1]}'
+            yield f'{self.name}_count{format_labels(labels)} {cumulative}'
+
+
+class Registry:
+    """Métricas do processo no formato texto do Prometheus.
+
+    Contadores e histogramas são atualizados no caminho das requisições;
+    coletores leem na hora do scrape os stats() que os componentes já mantêm.
+    """
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, name, help, labelnames=()):
+        metric = Counter(name, help, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def collector(self, fn):
+        """fn() devolve [(nome, tipo, ajuda, [(labels, valor)])]; erros num coletor não derrubam o scrape"""
+        self.collectors.append(fn)
+        return fn
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collect in self.collectors:
+            try:
+                families = collect()
+            except Exception:
+                continue
+            for name, kind, help, samples in families:
+                lines.append(f'# HELP {name} {help}')
+                lines.append(f'# TYPE {name} {kind}')
+                lines.extend(f'{name}{format_labels(sorted(labels.items()))} {value}' for labels, value in samples)
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    'http_requests_total', 'Requisições atendidas por rota, método e status', ('route', 'method', 'status'),
+)
+http_duration = registry.histogram(
+    'http_request_duration_seconds', 'Tempo de resposta por rota (até o último byte)', ('route', 'method'),
+)
+spotify_requests = registry.counter(
+    'spotify_requests_total', 'Chamadas à API do Spotify por endpoint, status e rota de origem',
+    ('route', 'endpoint', 'method', 'status'),
+)
+spotify_duration = registry.histogram(
+    'spotify_request_duration_seconds', 'Latência das chamadas à API do Spotify (sem a espera na fila)',
+    ('route', 'endpoint', 'method'),
+)
+template_duration = registry.histogram(
+    'template_render_duration_seconds', 'Tempo de renderização dos templates', ('template',),
+)
+
+
+def metrics_denied(authorization):
+    """Status a devolver no lugar das métricas (404 desligado, 401 token errado), ou None se autorizado"""
+    if not METRICS_TOKEN:
+        return 404
+    if not hmac.compare_digest((authorization or '').encode(), f'Bearer {METRICS_TOKEN}'.encode()):
+        return 401
+    return None
+
+
+def spotify_endpoint(path):
+    """Caminho da API sem IDs e sem query: playlists/abc123/tracks -> playlists/{id}/tracks"""
+    parts = path.split('?', 1)[0].strip('/').split('/')
+    return '/'.join(
+        '{id}' if index % 2 and parts[index - 1] in SPOTIFY_COLLECTIONS else part
+        for index, part in enumerate(parts)
+    )
+
+
+def observe_spotify(method, path, status, seconds):
+    """Registra uma tentativa de chamada ao Spotify (status 'error' para falhas de rede)"""
+    route, endpoint = current_route.get(), spotify_endpoint(path)
+    spotify_requests.inc(route, endpoint, method, str(status))
+    spotify_duration.observe(seconds, route, endpoint, method)
+
+
+def timed_render(name, render):
+    """Executa render() medindo o tempo do template"""
+    start = time.perf_counter()
+    try:
+        return render()
+    finally:
+        template_duration.observe(time.perf_counter() - start, name)
+
+
+def timed_stream(name, chunks):
+    """Como timed_render para templates em streaming: soma o tempo gasto gerando cada parte
+    (inclui as páginas que o template carrega enquanto é enviado)"""
+    elapsed = 0.0
+    try:
+        iterator = iter(chunks)
+        while True:
+            start = time.perf_counter()
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                elapsed += time.perf_counter() - start
+            yield chunk
+    finally:
+        template_duration.observe(elapsed, name)
+
+
+def timed_body(chunks, route, method, status, start):
+    """Corpo em streaming com a rota ativa enquanto é gerado; a requisição é registrada no último byte"""
+    try:
+        iterator = iter(chunks)
+        while True:
+            token = current_route.set(route)
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                current_route.reset(token)
+            yield chunk
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+        http_requests.inc(route, method, status)
+        http_duration.observe(time.perf_counter() - start, route, method)
+
+
+def init_metrics(app):
+    """Latência e status por rota no Flask e a rota /metrics"""
+    from flask import Response, g, request
+
+    @app.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+        g.metrics_route = current_route.set(request.url_rule.rule if request.url_rule else 'unmatched')
+
+    @app.after_request
+    def record_status(response):
+        g.metrics_status = response.status_code
+        g.metrics_untimed = response.mimetype in UNTIMED_TYPES
+        if response.is_streamed and not g.metrics_untimed:
+            # Geradores sem stream_with_context rodam depois do teardown: a medição acompanha o corpo
+            g.metrics_streamed = True
+            response.response = timed_body(
+                response.response, current_route.get(), request.method, str(response.status_code), g.metrics_start,
+            )
+        return response
+
+    @app.teardown_request
+    def observe_request(error=None):
+        token = g.pop('metrics_route', None)
+        if token is None:
+            return
+        route = current_route.get()
+        current_route.reset(token)
+        if g.get('metrics_streamed'):
+            return
+        status = 500 if error is not None else g.get('metrics_status', 500)
+        http_requests.inc(route, request.method, str(status))
+        if not g.get('metrics_untimed'):
+            http_duration.observe(time.perf_counter() - g.metrics_start, route, request.method)
+
+    @app.route('/metrics')
+    def metrics():
+        status = metrics_denied(request.headers.get('Authorization'))
+        if status is not None:
+            return Response(status=status, headers={'WWW-Authenticate': 'Bearer'} if status == 401 else {})
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+class MetricsMiddleware:
+    """Middleware ASGI equivalente ao init_metrics: a rota é o padrão do Starlette que casou"""
+
+    def __init__(self, app):
+        self.app = app
+
+    def route_of(self, scope):
+        from starlette.routing import Match
+
+        partial = None
+        for route in scope['app'].routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+            if match == Match.PARTIAL and partial is None:
+                partial = route.path
+        return partial or 'unmatched'
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        route = self.route_of(scope)
+        token = current_route.set(route)
+        start = time.perf_counter()
+        status, untimed = 500, False
+
+        async def send_timed(message):
+            nonlocal status, untimed
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                untimed = dict(message.get('headers', [])).get(b'content-type', b'').split(b';')[0].decode() in UNTIMED_TYPES
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            current_route.reset(token)
+            http_requests.inc(route, scope['method'], str(status))
+            if not untimed:
+                http_duration.observe(time.perf_counter() - start, route, scope['method'])
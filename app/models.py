@@ -0,0 +1,106 @@
+import sys
+
+
+def intern(text):
+    """Strings repetidas (IDs, nomes de artista/álbum, datas) compartilham um único objeto"""
+    return sys.intern(text) if text else ''
+
+
+class Model:
+    """Base dos modelos compactos: só os campos exibidos, em __slots__, sem dict por instância"""
+
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(getattr(self, s) == getattr(other, s) for s in self.__slots__)
+
+    __hash__ = None
+
+    def __repr__(self):
+        fields = ', '.join(f'{s}={getattr(self, s)!r}' for s in self.__slots__)
+        return f'{type(self).__name__}({fields})'
+
+    @classmethod
+    def from_api(cls, data, registry=None):
+        """Modelo a partir do JSON da API (ou o próprio modelo, se já convertido).
+
+        Com um registry (dict), entidades com o mesmo ID viram o mesmo objeto.
+        """
+        if data is None or isinstance(data, cls):
+            return data
+        key = (cls, data.get('id'))
+        if registry is not None and key[1] and key in registry:
+            return registry[key]
+        model = cls._parse(data, registry)
+        if registry is not None and key[1]:
+            registry[key] = model
+        return model
+
+
+class Album(Model):
+    __slots__ = ('id', 'name', 'release_date')
+
+    @classmethod
+    def _parse(cls, data, registry):
+        return cls(intern(data.get('id')), intern(data.get('name')), intern(data.get('release_date')))
+
+
+class Artist(Model):
+    __slots__ = ('id', 'name', 'genres', 'popularity', 'followers')
+
+    @classmethod
+    def _parse(cls, data, registry):
+        return cls(
+            intern(data.get('id')),
+            intern(data.get('name')),
+            tuple(intern(g) for g in data.get('genres') or ()),
+            data.get('popularity', 0),
+            (data.get('followers') or {}).get('total') or 0,
+        )
+
+
+class Track(Model):
+    __slots__ = ('id', 'name', 'artists', 'album', 'duration_ms', 'popularity', 'url')
+
+    @classmethod
+    def _parse(cls, data, registry):
+        # Artistas das músicas vêm resumidos (id, nome); gêneros ficam no cache de entidades
+        artists = tuple(Artist.from_api(a, registry) for a in data.get('artists') or ())
+        return cls(
+            intern(data.get('id')),
+            data.get('name', ''),
+            artists,
+            Album.from_api(data.get('album') or {}, registry),
+            data.get('duration_ms') or 0,
+            data.get('popularity', 0),
+            (data.get('external_urls') or {}).get('spotify', ''),
+        )
+
+
+class Play(Model):
+    __slots__ = ('played_at', 'track')
+
+    @classmethod
+    def from_api(cls, data, registry=None):
+        if data is None or isinstance(data, cls):
+            return data
+        return cls(data['played_at'], Track.from_api(data['track'], registry))
+
+
+class Playback(Model):
+    __slots__ = ('is_playing', 'progress_ms', 'item')
+
+    @classmethod
+    def from_api(cls, data, registry=None):
+        if data is None or isinstance(data, cls):
+            return data
+        return cls(bool(data.get('is_playing')), data.get('progress_ms') or 0, Track.from_api(data.get('item'), registry))
+
+
+def track_page(page, registry=None):
+    """Página da API ({'items': [...]}) com as músicas já convertidas"""
+    return {'items': [Track.from_api(t, registry) for t in (page or {}).get('items') or [] if t]}
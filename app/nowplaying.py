@@ -0,0 +1,178 @@
+import json
+import os
+import queue
+import threading
+
+from models import Playback
+from views import track_view
+
+# Limites do agendamento das consultas ao player (segundos)
+POLL_MIN_INTERVAL = float(os.getenv('NOW_PLAYING_MIN_INTERVAL', '2'))
+POLL_MAX_INTERVAL = float(os.getenv('NOW_PLAYING_MAX_INTERVAL', '30'))
+POLL_IDLE_INTERVAL = float(os.getenv('NOW_PLAYING_IDLE_INTERVAL', '15'))
+HEARTBEAT_INTERVAL = 15
+
+
+def now_playing_state(current_track):
+    """Estado compacto do player enviado ao navegador"""
+    playback = Playback.from_api(current_track)
+    if not playback or not playback.item:
+        return {'is_playing': False, 'track': None}
+    return {
+        'is_playing': playback.is_playing,
+        'progress_ms': playback.progress_ms,
+        'track': track_view(playback.item),
+    }
+
+
+def next_poll_delay(state):
+    """Próxima consulta quando a música atual deve terminar, dentro dos limites"""
+    track = state.get('track')
+    if not state.get('is_playing') or not track:
+        return POLL_IDLE_INTERVAL
+    remaining = (track['duration_ms'] - state.get('progress_ms', 0)) / 1000
+    return min(max(remaining + 0.5, POLL_MIN_INTERVAL), POLL_MAX_INTERVAL)
+
+
+def state_signature(state):
+    track = state.get('track')
+    return (track['id'] if track else None, state.get('is_playing'))
+
+
+class NowPlayingPoller:
+    """Uma thread por usuário que consulta o player e avisa todas as abas abertas"""
+
+    def __init__(self, user_key, client_factory, on_idle):
+        self.user_key = user_key
+        self.client_factory = client_factory
+        self.on_idle = on_idle
+        self.state = None
+        self.polls = 0
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name=f'now-playing-{user_key}', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=16)
+        with self._lock:
+            if self._stopped:
+                return None
+            self._subscribers.add(q)
+            if self.state is not None:
+                q.put_nowait(self.state)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+            if not self._subscribers:
+                self._stopped = True
+                self._wake.set()
+
+    def poke(self):
+        """Antecipa a próxima consulta (ex.: depois de um comando de reprodução)"""
+        self._wake.set()
+
+    def publish(self, state):
+        with self._lock:
+            # O erro de um comando é um aviso pontual: não fica no estado entregue a novas abas
+            remembered = {key: value for key, value in state.items() if key != 'error'}
+            if remembered:
+                self.state = remembered
+            for q in self._subscribers:
+                try:
+                    q.put_nowait(state)
+                except queue.Full:
+                    pass  # aba lenta: recebe o próximo estado
+
+    def _run(self):
+        delay = 0
+        while True:
+            if self._wake.wait(delay):
+                self._wake.clear()
+            if self._stopped:
+                break
+            try:
+                sp = self.client_factory()
+                if sp is None:
+                    break
+                state = now_playing_state(sp.current_user_playing_track())
+                self.polls += 1
+            except Exception:
+                delay = POLL_IDLE_INTERVAL
+                continue
+            if self.state is None or state_signature(state) != state_signature(self.state):
+                self.publish(state)
+            else:
+                self.state = state
+            delay = next_poll_delay(state)
+        with self._lock:
+            self._stopped = True
+        self.on_idle(self)
+
+
+class NowPlayingHub:
+    """Registro de pollers ativos, compartilhados pelas abas de um mesmo usuário"""
+
+    def __init__(self):
+        self._pollers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_key, client_factory):
+        with self._lock:
+            poller = self._pollers.get(user_key)
+            q = poller.subscribe() if poller is not None else None
+            if q is None:
+                # Sem poller ou com um que acabou de encerrar: inicia outro
+                poller = NowPlayingPoller(user_key, client_factory, self._remove)
+                self._pollers[user_key] = poller
+                q = poller.subscribe()
+                poller.start()
+            return poller, q
+
+    def poke(self, user_key):
+        with self._lock:
+            poller = self._pollers.get(user_key)
+        if poller is not None:
+            poller.poke()
+
+    def state(self, user_key):
+        """Último estado lido pelo poller do usuário (None sem poller ativo)"""
+        with self._lock:
+            poller = self._pollers.get(user_key)
+        return poller.state if poller is not None else None
+
+    def publish(self, user_key, state):
+        """Envia às abas um estado conhecido sem esperar a próxima consulta"""
+        with self._lock:
+            poller = self._pollers.get(user_key)
+        if poller is not None:
+            poller.publish(state)
+
+    def _remove(self, poller):
+        with self._lock:
+            if self._pollers.get(poller.user_key) is poller:
+                del self._pollers[poller.user_key]
+
+    def __len__(self):
+        return len(self._pollers)
+
+
+def sse_stream(poller, q):
+    """Gera os eventos SSE de uma aba; encerra a inscrição quando o cliente desconecta"""
+    try:
+        yield 'retry: 5000\n\n'
+        while True:
+            try:
+                state = q.get(timeout=HEARTBEAT_INTERVAL)
+            except queue.Empty:
+                yield ': ping\n\n'
+                continue
+            yield f'event: now-playing\ndata: {json.dumps(state)}\n\n'
+    finally:
+        poller.unsubscribe(q)
@@ -0,0 +1,109 @@
+import base64
+import binascii
+import json
+import os
+
+# Períodos aceitos pelos endpoints de top do Spotify
+TIME_RANGES = {
+    'short_term': 'Últimas 4 semanas',
+    'medium_term': 'Últimos 6 meses',
+    'long_term': 'Todo o período',
+}
+DEFAULT_TIME_RANGE = 'medium_term'
+TOP_TRACKS_PAGE_SIZE = int(os.getenv('TOP_TRACKS_PAGE_SIZE', '25'))
+TOP_ARTISTS_PAGE_SIZE = int(os.getenv('TOP_ARTISTS_PAGE_SIZE', '20'))
+# Páginas enviadas no HTML; as seguintes vêm da API JSON conforme o usuário rola
+STREAM_PAGES = int(os.getenv('STREAM_PAGES', '2'))
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(data):
+    """Cursor opaco para a URL (JSON em base64 sem padding)"""
+    raw = json.dumps(data, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, binascii.Error):
+        data = None
+    if not isinstance(data, dict):
+        raise InvalidCursor('Cursor inválido')
+    return data
+
+
+def top_position(cursor=None, time_range=None):
+    """(período, offset) da página pedida; sem cursor, a primeira página do período"""
+    if not cursor:
+        return (time_range if time_range in TIME_RANGES else DEFAULT_TIME_RANGE), 0
+    data = decode_cursor(cursor)
+    time_range, offset = data.get('range'), data.get('offset')
+    if time_range not in TIME_RANGES or not isinstance(offset, int) or offset < 0:
+        raise InvalidCursor('Cursor inválido')
+    return time_range, offset
+
+
+def next_top_cursor(page, time_range, offset):
+    """Cursor da página seguinte de um top (None se esta é a última)"""
+    count = len((page or {}).get('items') or [])
+    if count and offset + count < (page or {}).get('total', 0):
+        return encode_cursor({'range': time_range, 'offset': offset + count})
+    return None
+
+
+def int_arg(args, name):
+    """Parâmetro inteiro da query string (None se ausente ou inválido)"""
+    value = args.get(name)
+    return int(value) if value and value.isdigit() else None
+
+
+def recent_position(cursor=None, before=None):
+    """played_at_ms a partir do qual a página do histórico começa (None: as mais recentes)"""
+    if not cursor:
+        return before
+    before = decode_cursor(cursor).get('before')
+    if not isinstance(before, int):
+        raise InvalidCursor('Cursor inválido')
+    return before
+
+
+def next_recent_cursor(next_before):
+    return encode_cursor({'before': next_before}) if next_before else None
+
+
+def playlist_position(cursor=None):
+    """Posição do primeiro item da página de uma playlist"""
+    if not cursor:
+        return 0
+    position = decode_cursor(cursor).get('position')
+    if not isinstance(position, int) or position < 0:
+        raise InvalidCursor('Cursor inválido')
+    return position
+
+
+def next_playlist_cursor(next_position):
+    return encode_cursor({'position': next_position}) if next_position is not None else None
+
+
+def stream_pages(first, load_next, pages=STREAM_PAGES):
+    """Primeira página já carregada e as seguintes, buscadas só quando o template chega nelas"""
+    page = first
+    yield page
+    for _ in range(pages - 1):
+        if not page['next_cursor']:
+            return
+        try:
+            page = load_next(page['next_cursor'])
+        except Exception:
+            return  # o cursor continua no HTML: a rolagem tenta essa página de novo
+        yield page
+
+
+def list_context(first, pages):
+    """Contexto dos templates de lista: páginas (lista ou gerador) e, para o cabeçalho,
+    os campos da primeira página (período escolhido, playlist)"""
+    return {**first, 'pages': pages, 'time_ranges': TIME_RANGES}
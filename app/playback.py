@@ -0,0 +1,197 @@
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from nowplaying import now_playing_state
+
+# Estado do player guardado pelo pipeline vale por esse tempo para decidir play/pause
+PLAYER_STATE_TTL = float(os.getenv('PLAYER_STATE_TTL', '10'))
+# Espera antes de ler o estado real: o Spotify leva um instante para refletir o comando
+RECONCILE_DELAY = float(os.getenv('PLAYER_RECONCILE_DELAY', '0.5'))
+
+
+class CommandBatch:
+    """Cliques de um usuário ainda não enviados, já combinados num efeito líquido"""
+
+    def __init__(self, playing):
+        self.was_playing = playing
+        self.playing = playing
+        self.skip = 0  # > 0 avança, < 0 volta
+        self.clicks = 0
+        self.future = Future()
+
+    def add(self, command):
+        self.clicks += 1
+        if command == 'toggle':
+            self.playing = not self.playing
+        else:
+            self.skip += 1 if command == 'next' else -1
+            self.playing = True  # trocar de música volta a tocar
+
+    def calls(self, sp):
+        """Chamadas ao Spotify que produzem o efeito do lote"""
+        step = sp.next_track if self.skip > 0 else sp.previous_track
+        calls = [step] * abs(self.skip)
+        playing_after = True if self.skip else self.was_playing
+        if self.playing != playing_after:
+            calls.append(sp.start_playback if self.playing else sp.pause_playback)
+        return calls
+
+
+class Player:
+    def __init__(self):
+        self.state = None
+        self.updated = 0.0
+        self.pending = None
+        self.running = False
+        self.wake = threading.Event()
+
+
+def optimistic_state(state, batch):
+    state = dict(state or {'track': None}, is_playing=batch.playing, pending=True)
+    if batch.skip:
+        state['skip'] = batch.skip
+    return state
+
+
+class PlaybackPipeline:
+    """Comandos do player sem leituras prévias, com resposta otimista.
+
+    Play/pause é decidido pelo estado em cache (do pipeline ou do poller do
+    now playing). Cliques que chegam enquanto um lote está sendo enviado são
+    combinados no próximo: cinco "próxima" viram um lote, play+pause se anulam.
+    A rota responde com o estado otimista sem esperar o Spotify; depois de cada
+    lote o estado real é lido em segundo plano e enviado às abas, e um lote que
+    falha chega às abas como estado real com o campo error.
+    """
+
+    def __init__(self, hub, reconcile_delay=RECONCILE_DELAY):
+        self.hub = hub
+        self.reconcile_delay = reconcile_delay
+        self._players = {}
+        self._lock = threading.Lock()
+        self.clicks = 0
+        self.calls = 0
+        self.saved = 0
+        self.batches = 0
+        self.errors = 0
+
+    def _cached_state(self, player):
+        if player is not None and player.state is not None:
+            if player.pending is not None or time.monotonic() - player.updated < PLAYER_STATE_TTL:
+                return player.state
+        return None
+
+    def known_state(self, user_key):
+        """Estado do player sem chamar o Spotify (None se não há estado recente)"""
+        with self._lock:
+            state = self._cached_state(self._players.get(user_key))
+        return state if state is not None else self.hub.state(user_key)
+
+    def submit(self, user_key, command, client_factory, state):
+        """Enfileira o comando; devolve (Future do lote, estado otimista)"""
+        with self._lock:
+            self.clicks += 1
+            player = self._players.setdefault(user_key, Player())
+            # Outro clique pode ter mudado o estado desde que o chamador o leu
+            state = self._cached_state(player) or state
+            if player.pending is None:
+                player.pending = CommandBatch(bool(state.get('is_playing')))
+            player.pending.add(command)
+            batch = player.pending
+            player.state = optimistic_state(state, batch)
+            player.updated = time.monotonic()
+            player.wake.set()
+            start = not player.running
+            player.running = True
+            optimistic = player.state
+        # Antes de iniciar o envio: o estado real (ou o erro) do lote nunca chega às abas antes do otimista
+        if not batch.skip:
+            self.hub.publish(user_key, optimistic)
+        if start:
+            # Thread própria: a espera da reconciliação não ocupa o pool do fan-out
+            threading.Thread(target=self._drain, args=(user_key, player, client_factory),
+                             name=f'playback-{user_key}', daemon=True).start()
+        return batch.future, optimistic
+
+    def _drain(self, user_key, player, client_factory):
+        sp = None
+        while True:
+            with self._lock:
+                batch, player.pending = player.pending, None
+                if batch is None:
+                    player.running = False
+                    return
+                player.wake.clear()
+            try:
+                sp = sp or client_factory()
+                calls = batch.calls(sp)
+                for call in calls:
+                    call()
+            except Exception as e:
+                with self._lock:
+                    self.batches += 1
+                    self.errors += 1
+                    player.state = None
+                batch.future.set_exception(e)
+                self._report_failure(user_key, player, sp, e)
+                continue
+            with self._lock:
+                self.batches += 1
+                self.calls += len(calls)
+                self.saved += batch.clicks - len(calls)
+            batch.future.set_result(len(calls))
+            # Novos cliques durante a espera vão direto para o próximo lote
+            if not player.wake.wait(self.reconcile_delay):
+                self._reconcile(user_key, player, sp)
+
+    def _reconcile(self, user_key, player, sp):
+        try:
+            state = now_playing_state(sp.current_user_playing_track())
+        except Exception:
+            with self._lock:
+                player.state = None
+            return
+        with self._lock:
+            if player.pending is not None:
+                return
+            player.state = state
+            player.updated = time.monotonic()
+        self.hub.publish(user_key, state)
+
+    def _report_failure(self, user_key, player, sp, error):
+        """Desfaz o estado otimista nas abas: envia o estado real com o erro do lote"""
+        state = None
+        if sp is not None:
+            try:
+                state = now_playing_state(sp.current_user_playing_track())
+            except Exception:
+                pass
+        with self._lock:
+            if player.pending is not None:
+                return  # um novo clique já mudou o estado otimista
+            if state is not None:
+                player.state = state
+                player.updated = time.monotonic()
+        self.hub.publish(user_key, dict(state or {}, error=f'Erro ao enviar comando: {error}'))
+        if state is None:
+            # Estado real desconhecido: o poller lê de novo e corrige as abas
+            self.hub.poke(user_key)
+
+    def discard(self, user_key):
+        with self._lock:
+            player = self._players.get(user_key)
+            if player is not None and not player.running:
+                del self._players[user_key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'clicks': self.clicks,
+                'upstream_calls': self.calls,
+                'saved_calls': self.saved,
+                'batches': self.batches,
+                'errors': self.errors,
+                'users': len(self._players),
+            }
@@ -0,0 +1,324 @@
+import asyncio
+import json
+import os
+import time
+
+from cache import SingleFlight
+from fanout import ContextExecutor
+from history import HISTORY_DB, slim_track
+from localstore import SyncedStore
+from models import Track
+from views import items_of
+
+# Playlists ficam no mesmo SQLite do histórico (a tabela de músicas é compartilhada)
+PLAYLIST_DB = os.getenv('PLAYLIST_DB', HISTORY_DB)
+# Intervalo mínimo (segundos) entre conferências da lista de playlists de um usuário
+PLAYLIST_SYNC_INTERVAL = int(os.getenv('PLAYLIST_SYNC_INTERVAL', '300'))
+# Páginas buscadas ao mesmo tempo por sincronização
+PLAYLIST_SYNC_WORKERS = int(os.getenv('PLAYLIST_SYNC_WORKERS', '8'))
+PLAYLIST_PAGE_SIZE = 50
+LIST_BATCH = 50  # máximo aceito pelo endpoint me/playlists
+ITEMS_BATCH = 100  # máximo aceito pelo endpoint playlists/{id}/tracks
+# Só os campos exibidos: corta a maior parte do JSON de cada página de itens
+ITEM_FIELDS = (
+    'total,items(added_at,track(id,name,duration_ms,popularity,external_urls,'
+    'album(id,name,release_date),artists(id,name)))'
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS playlists (
+    user_key TEXT NOT NULL,
+    id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    snapshot_id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (user_key, id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS playlist_snapshots (
+    playlist_id TEXT PRIMARY KEY,
+    snapshot_id TEXT NOT NULL,
+    synced_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS playlist_items (
+    playlist_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    track_id TEXT NOT NULL,
+    added_at TEXT,
+    PRIMARY KEY (playlist_id, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS playlist_sync (
+    user_key TEXT PRIMARY KEY,
+    synced_at REAL NOT NULL
+);
+"""
+
+
+class PlaylistNotFound(LookupError):
+    pass
+
+
+def playlist_summary(item):
+    """Campos de uma playlist exibidos na lista e no cabeçalho da página da playlist"""
+    images = item.get('images') or []
+    return {
+        'id': item['id'],
+        'name': item.get('name') or '',
+        'description': item.get('description') or '',
+        'owner': (item.get('owner') or {}).get('display_name') or '',
+        'public': item.get('public'),
+        'collaborative': bool(item.get('collaborative')),
+        'tracks_total': (item.get('tracks') or {}).get('total') or 0,
+        'image': images[0]['url'] if images else None,
+        'url': (item.get('external_urls') or {}).get('spotify', ''),
+    }
+
+
+def page_offsets(first, batch):
+    """Offsets das páginas restantes, conhecidos a partir do total da primeira"""
+    return range(batch, (first or {}).get('total') or 0, batch)
+
+
+class PlaylistStore(SyncedStore):
+    """Playlists por usuário e seus itens, sincronizados pelo snapshot_id.
+
+    A lista de playlists é lida página a página em paralelo e guarda o
+    snapshot_id de cada uma. Os itens de uma playlist só são baixados de novo
+    quando o snapshot_id muda; o conteúdo é compartilhado entre usuários que
+    seguem a mesma playlist. As páginas servem tudo daqui, sem esperar o Spotify.
+    """
+
+    schema = SCHEMA
+
+    def __init__(self, path=PLAYLIST_DB, sync_interval=PLAYLIST_SYNC_INTERVAL, workers=PLAYLIST_SYNC_WORKERS):
+        self.sync_interval = sync_interval
+        # Pool só das páginas: a sincronização em segundo plano roda no background_executor
+        self._pool = ContextExecutor(max_workers=workers, thread_name_prefix='playlist-sync')
+        self._flights = SingleFlight()
+        self.lists_synced = 0
+        self.playlists_synced = 0
+        self.playlists_skipped = 0
+        self.pages_fetched = 0
+        super().__init__(path)
+
+    def _count(self, **counters):
+        with self._lock:
+            for name, value in counters.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def state(self, user_key):
+        """Quando a lista do usuário foi sincronizada pela última vez (None se nunca)"""
+        row = self._connect().execute('SELECT synced_at FROM playlist_sync WHERE user_key = ?', (user_key,)).fetchone()
+        return row[0] if row else None
+
+    def is_stale(self, synced_at):
+        return synced_at is None or time.time() - synced_at >= self.sync_interval
+
+    def playlists(self, user_key):
+        rows = self._connect().execute(
+            'SELECT p.data, s.snapshot_id = p.snapshot_id FROM playlists p '
+            'LEFT JOIN playlist_snapshots s ON s.playlist_id = p.id '
+            'WHERE p.user_key = ? ORDER BY p.position',
+            (user_key,),
+        ).fetchall()
+        return [dict(json.loads(data), synced=bool(synced)) for data, synced in rows]
+
+    def playlist(self, user_key, playlist_id):
+        """Resumo da playlist, se ela está na lista do usuário (controle de acesso)"""
+        row = self._connect().execute(
+            'SELECT data FROM playlists WHERE user_key = ? AND id = ?', (user_key, playlist_id)
+        ).fetchone()
+        if row is None:
+            raise PlaylistNotFound('Playlist não encontrada')
+        return json.loads(row[0])
+
+    def items(self, playlist_id, position=0, limit=PLAYLIST_PAGE_SIZE):
+        """Itens a partir de position e a posição da próxima página (None se acabou)"""
+        rows = self._connect().execute(
+            'SELECT i.position, i.added_at, t.data FROM playlist_items i JOIN tracks t ON t.id = i.track_id '
+            'WHERE i.playlist_id = ? AND i.position >= ? ORDER BY i.position LIMIT ?',
+            (playlist_id, position, limit + 1),
+        ).fetchall()
+        registry = {}
+        items = [
+            {'position': pos, 'added_at': added_at, 'track': Track.from_api(json.loads(data), registry)}
+            for pos, added_at, data in rows[:limit]
+        ]
+        return items, rows[limit][0] if len(rows) > limit else None
+
+    def has_snapshot(self, playlist_id, snapshot_id):
+        return self._connect().execute(
+            'SELECT 1 FROM playlist_snapshots WHERE playlist_id = ? AND snapshot_id = ?', (playlist_id, snapshot_id)
+        ).fetchone() is not None
+
+    def count(self, user_key):
+        return self._connect().execute('SELECT count(*) FROM playlists WHERE user_key = ?', (user_key,)).fetchone()[0]
+
+    def stale(self, user_key, playlist_id=None):
+        """(id, snapshot_id) das playlists do usuário cujo conteúdo local está desatualizado"""
+        return self._connect().execute(
+            'SELECT p.id, p.snapshot_id FROM playlists p '
+            'LEFT JOIN playlist_snapshots s ON s.playlist_id = p.id '
+            'WHERE p.user_key = ? AND (s.snapshot_id IS NULL OR s.snapshot_id != p.snapshot_id) '
+            'AND (? IS NULL OR p.id = ?) ORDER BY p.position',
+            (user_key, playlist_id, playlist_id),
+        ).fetchall()
+
+    def record_list(self, user_key, pages):
+        """Substitui a lista de playlists do usuário, com o snapshot_id atual de cada uma"""
+        items = [item for page in pages for item in items_of(page) if item and item.get('id')]
+        rows = [
+            (user_key, item['id'], position, item.get('snapshot_id') or '', json.dumps(playlist_summary(item)))
+            for position, item in enumerate(items)
+        ]
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM playlists WHERE user_key = ?', (user_key,))
+            conn.executemany('INSERT OR REPLACE INTO playlists VALUES (?, ?, ?, ?, ?)', rows)
+            conn.execute(
+                'INSERT INTO playlist_sync (user_key, synced_at) VALUES (?, ?) '
+                'ON CONFLICT(user_key) DO UPDATE SET synced_at = excluded.synced_at',
+                (user_key, time.time()),
+            )
+        self._count(lists_synced=1)
+
+    def record_items(self, playlist_id, snapshot_id, pages):
+        """Grava todos os itens da playlist numa transação e marca o snapshot como baixado"""
+        rows, tracks = [], {}
+        for offset, page in pages:
+            for index, item in enumerate(items_of(page)):
+                track = (item or {}).get('track')
+                # Arquivos locais e episódios removidos não têm ID
+                if not track or not track.get('id'):
+                    continue
+                rows.append((playlist_id, offset + index, track['id'], item.get('added_at')))
+                tracks[track['id']] = json.dumps(slim_track(track))
+        conn = self._connect()
+        with conn:
+            # Não sobrescreve músicas já gravadas pelo histórico (com o JSON completo)
+            conn.executemany('INSERT OR IGNORE INTO tracks (id, data) VALUES (?, ?)', tracks.items())
+            conn.execute('DELETE FROM playlist_items WHERE playlist_id = ?', (playlist_id,))
+            conn.executemany('INSERT INTO playlist_items VALUES (?, ?, ?, ?)', rows)
+            conn.execute(
+                'INSERT INTO playlist_snapshots (playlist_id, snapshot_id, synced_at) VALUES (?, ?, ?) '
+                'ON CONFLICT(playlist_id) DO UPDATE SET snapshot_id = excluded.snapshot_id, synced_at = excluded.synced_at',
+                (playlist_id, snapshot_id, time.time()),
+            )
+        self._count(playlists_synced=1)
+
+    def _fetch_all(self, fetch, batch):
+        """Primeira página para saber o total; as demais em paralelo, devolvidas na ordem"""
+        first = fetch(0)
+        offsets = page_offsets(first, batch)
+        pages = [(0, first), *zip(offsets, self._pool.map(fetch, offsets))]
+        self._count(pages_fetched=len(pages))
+        return pages
+
+    def sync_list(self, user_key, sp):
+        pages = self._fetch_all(lambda offset: sp.current_user_playlists(limit=LIST_BATCH, offset=offset), LIST_BATCH)
+        self.record_list(user_key, [page for _, page in pages])
+
+    def sync_playlist(self, playlist_id, snapshot_id, sp):
+        """Baixa os itens da playlist; chamadas simultâneas para o mesmo snapshot compartilham o download"""
+        def download():
+            if self.has_snapshot(playlist_id, snapshot_id):
+                return  # outra sincronização baixou esse snapshot enquanto esta esperava
+            pages = self._fetch_all(
+                lambda offset: sp.playlist_items(
+                    playlist_id, fields=ITEM_FIELDS, limit=ITEMS_BATCH, offset=offset, additional_types=('track',),
+                ),
+                ITEMS_BATCH,
+            )
+            self.record_items(playlist_id, snapshot_id, pages)
+        self._flights.do((playlist_id, snapshot_id), 'playlist_items', download)
+
+    def sync(self, user_key, sp):
+        """Confere a lista e baixa só as playlists com snapshot_id novo; devolve quantas baixou"""
+        self.sync_list(user_key, sp)
+        stale = self.stale(user_key)
+        self._count(playlists_skipped=self.count(user_key) - len(stale))
+        for playlist_id, snapshot_id in stale:
+            self.sync_playlist(playlist_id, snapshot_id, sp)
+        return len(stale)
+
+    # Primeira visita baixa a lista na hora; os itens (e as conferências seguintes) em segundo plano
+    def sync_first(self, user_key, sp):
+        self.sync_list(user_key, sp)
+
+    def needs_background(self, synced_at):
+        return self.is_stale(synced_at)
+
+    def sync_background(self, user_key, sp, synced_at):
+        if synced_at is not None:
+            self.sync(user_key, sp)
+        else:
+            for playlist_id, snapshot_id in self.stale(user_key):
+                self.sync_playlist(playlist_id, snapshot_id, sp)
+
+    def ensure(self, user_key, playlist_id, sp):
+        """Resumo da playlist com os itens locais em dia (baixa agora se o snapshot mudou)"""
+        playlist = self.playlist(user_key, playlist_id)
+        for _, snapshot_id in self.stale(user_key, playlist_id):
+            self.sync_playlist(playlist_id, snapshot_id, sp)
+        return playlist
+
+    async def _fetch_all_async(self, fetch, batch):
+        first = await fetch(0)
+        offsets = page_offsets(first, batch)
+        pages = [(0, first), *zip(offsets, await asyncio.gather(*(fetch(offset) for offset in offsets)))]
+        self._count(pages_fetched=len(pages))
+        return pages
+
+    async def sync_list_async(self, user_key, sp):
+        pages = await self._fetch_all_async(lambda offset: sp.current_user_playlists(limit=LIST_BATCH, offset=offset), LIST_BATCH)
+        await asyncio.to_thread(self.record_list, user_key, [page for _, page in pages])
+
+    async def sync_playlist_async(self, playlist_id, snapshot_id, sp):
+        async def download():
+            if await asyncio.to_thread(self.has_snapshot, playlist_id, snapshot_id):
+                return
+            pages = await self._fetch_all_async(
+                lambda offset: sp.playlist_items(
+                    playlist_id, fields=ITEM_FIELDS, limit=ITEMS_BATCH, offset=offset, additional_types=('track',),
+                ),
+                ITEMS_BATCH,
+            )
+            await asyncio.to_thread(self.record_items, playlist_id, snapshot_id, pages)
+        await self._flights.do_async((playlist_id, snapshot_id), 'playlist_items', download)
+
+    async def sync_async(self, user_key, sp):
+        await self.sync_list_async(user_key, sp)
+        stale = await asyncio.to_thread(self.stale, user_key)
+        self._count(playlists_skipped=await asyncio.to_thread(self.count, user_key) - len(stale))
+        for playlist_id, snapshot_id in stale:
+            await self.sync_playlist_async(playlist_id, snapshot_id, sp)
+        return len(stale)
+
+    async def sync_first_async(self, user_key, sp):
+        await self.sync_list_async(user_key, sp)
+
+    async def sync_background_async(self, user_key, sp, synced_at):
+        if synced_at is not None:
+            await self.sync_async(user_key, sp)
+        else:
+            for playlist_id, snapshot_id in await asyncio.to_thread(self.stale, user_key):
+                await self.sync_playlist_async(playlist_id, snapshot_id, sp)
+
+    async def ensure_async(self, user_key, playlist_id, sp):
+        playlist = await asyncio.to_thread(self.playlist, user_key, playlist_id)
+        for _, snapshot_id in await asyncio.to_thread(self.stale, user_key, playlist_id):
+            await self.sync_playlist_async(playlist_id, snapshot_id, sp)
+        return playlist
+
+    def stats(self):
+        with self._lock:
+            return {
+                'lists_synced': self.lists_synced,
+                'playlists_synced': self.playlists_synced,
+                'playlists_skipped': self.playlists_skipped,
+                'pages_fetched': self.pages_fetched,
+                'syncing_users': len(self._syncing),
+            }
@@ -0,0 +1,93 @@
+import asyncio
+import os
+import threading
+import time
+
+from fanout import background_executor
+
+# Intervalo (segundos) após o qual o perfil é renovado em segundo plano
+PROFILE_REFRESH_INTERVAL = int(os.getenv('PROFILE_REFRESH_INTERVAL', '3600'))
+
+
+class ProfileStore:
+    """Perfil do usuário (display_name, product...) resolvido uma vez por sessão.
+
+    Leituras são locais; quando o perfil passa do intervalo de renovação, o valor
+    atual continua sendo servido enquanto uma única renovação roda no pool do fan-out.
+    """
+
+    def __init__(self, refresh_interval=PROFILE_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self._profiles = {}
+        self._refreshing = set()
+        self._tasks = set()
+        self._lock = threading.Lock()
+
+    def put(self, user_key, profile):
+        with self._lock:
+            self._profiles[user_key] = (time.monotonic(), profile)
+
+    def discard(self, user_key):
+        with self._lock:
+            self._profiles.pop(user_key, None)
+
+    def get(self, user_key, sp):
+        profile = self.peek(user_key, sp)
+        if profile is None:
+            # Sessão anterior ao processo atual (ex.: reinício): busca síncrona uma vez
+            profile = sp.current_user()
+            self.put(user_key, profile)
+        return profile
+
+    async def get_async(self, user_key, sp):
+        """Como get, com o cliente assíncrono; a renovação roda como tarefa do event loop"""
+        profile, stale = self._lookup(user_key)
+        if profile is None:
+            profile = await sp.current_user()
+            self.put(user_key, profile)
+        elif stale and self._claim(user_key):
+            task = asyncio.create_task(self._refresh_async(user_key, sp))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return profile
+
+    def peek(self, user_key, sp):
+        """Perfil guardado ou None, sem chamar a API; agenda a renovação se estiver velho"""
+        profile, stale = self._lookup(user_key)
+        if stale and self._claim(user_key):
+            background_executor.submit(self._refresh, user_key, sp)
+        return profile
+
+    def _lookup(self, user_key):
+        """(perfil guardado ou None, se passou do intervalo de renovação)"""
+        with self._lock:
+            entry = self._profiles.get(user_key)
+        if entry is None:
+            return None, False
+        fetched_at, profile = entry
+        return profile, time.monotonic() - fetched_at > self.refresh_interval
+
+    def _claim(self, user_key):
+        with self._lock:
+            if user_key in self._refreshing:
+                return False
+            self._refreshing.add(user_key)
+            return True
+
+    def _refresh(self, user_key, sp):
+        try:
+            self.put(user_key, sp.current_user())
+        except Exception:
+            pass  # mantém o perfil anterior; tenta de novo na próxima leitura
+        finally:
+            with self._lock:
+                self._refreshing.discard(user_key)
+
+    async def _refresh_async(self, user_key, sp):
+        try:
+            self.put(user_key, await sp.current_user())
+        except Exception:
+            pass
+        finally:
+            with self._lock:
+                self._refreshing.discard(user_key)
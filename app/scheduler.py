@@ -0,0 +1,289 @@
+import asyncio
+import hashlib
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Orçamento de chamadas ao Spotify (requisições/s e rajada); taxa 0 desliga o limite
+APP_RATE = float(os.getenv('SPOTIFY_APP_RATE', '50'))
+APP_BURST = float(os.getenv('SPOTIFY_APP_BURST', '100'))
+USER_RATE = float(os.getenv('SPOTIFY_USER_RATE', '5'))
+USER_BURST = float(os.getenv('SPOTIFY_USER_BURST', '20'))
+# Tempo máximo que uma chamada espera na fila (inclui pausas por 429)
+QUEUE_DEADLINE = float(os.getenv('SPOTIFY_QUEUE_DEADLINE', '6'))
+THROTTLE_RETRIES = int(os.getenv('SPOTIFY_THROTTLE_RETRIES', '2'))
+# Pausa quando o 429 vem sem Retry-After (dobra a cada nova tentativa)
+THROTTLE_BACKOFF = 1.0
+MAX_RETRY_AFTER = 60.0
+USER_BUCKETS_MAX = 10000
+ASYNC_POLL_INTERVAL = 0.05
+# Cabeçalho interno com a user_key da chamada; o adapter o retira antes do envio ao Spotify
+USER_HEADER = 'X-Scheduler-User'
+
+# Classes de prioridade: menor valor sai primeiro da fila
+PLAYBACK, INTERACTIVE, BACKGROUND = 0, 1, 2
+PRIORITY_NAMES = {PLAYBACK: 'playback', INTERACTIVE: 'interactive', BACKGROUND: 'background'}
+
+
+def classify(method, path):
+    """Prioridade pela rota da API: comandos do player, leituras da tela, listas/estatísticas"""
+    path = path.lstrip('/').split('?', 1)[0]
+    if path.startswith('me/player'):
+        return INTERACTIVE if method == 'GET' else PLAYBACK
+    if path.rstrip('/') == 'me' or path.startswith('search'):
+        return INTERACTIVE
+    return BACKGROUND
+
+
+def user_of(user_key, authorization=None):
+    """Chave do orçamento por usuário: a user_key do login, que sobrevive à renovação do token;
+    sem ela (cliente sem usuário conhecido), um hash do bearer token"""
+    if user_key:
+        return user_key
+    if not authorization:
+        return 'anonymous'
+    return hashlib.sha256(authorization.encode()).hexdigest()[:16]
+
+
+def retry_after(headers, attempt):
+    """Segundos de pausa pedidos no 429; sem cabeçalho, backoff exponencial"""
+    try:
+        delay = float((headers or {}).get('Retry-After'))
+    except (TypeError, ValueError):
+        delay = THROTTLE_BACKOFF * 2 ** attempt
+    return min(max(delay, 0.0), MAX_RETRY_AFTER)
+
+
+class RateLimited(Exception):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def wait_time(self, now):
+        """Segundos até haver uma ficha (0 se já há)"""
+        if self.rate <= 0:
+            return 0.0
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        if self.rate > 0:
+            self.tokens -= 1
+
+    def drain(self, now):
+        self.wait_time(now)
+        self.tokens = min(self.tokens, 0)
+
+
+class RequestScheduler:
+    """Fila única das chamadas ao Spotify com orçamento do app e de cada usuário.
+
+    Uma chamada sai da fila quando é a de maior prioridade (e mais antiga) entre as
+    que têm ficha no balde do seu usuário, e o balde do app também tem ficha. Um 429
+    pausa a fila inteira pelo Retry-After, já que o limite do Spotify é por app.
+
+    Cada usuário tem um heap com as suas chamadas; só a primeira de cada um concorre.
+    Usuários com ficha ficam no heap `_ready` (pela chamada da frente) e os sem ficha
+    no heap `_parked` (pela hora da próxima ficha), então achar a próxima chamada não
+    percorre a fila. Quem não está na frente espera sem prazo próprio e é acordado
+    quando alguém sai da fila.
+    """
+
+    def __init__(self, app_rate=APP_RATE, app_burst=APP_BURST, user_rate=USER_RATE,
+                 user_burst=USER_BURST, deadline=QUEUE_DEADLINE):
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.deadline = deadline
+        self._app = TokenBucket(app_rate, app_burst)
+        self._users = OrderedDict()
+        self._pending = {}  # usuário -> heap de (prioridade, ordem de chegada, usuário)
+        self._ready = []  # chamadas da frente dos usuários com ficha
+        self._parked = []  # (hora da próxima ficha, ordem, usuário, chamada) dos usuários sem ficha
+        self._placed = {}  # usuário -> registro válido em _ready ou _parked
+        self._removed = set()  # chamadas que saíram antes de chegar à frente do seu usuário
+        self._waiting = set()
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self.blocked_until = 0.0
+        self.granted = dict.fromkeys(PRIORITY_NAMES.values(), 0)
+        self.depth = dict.fromkeys(PRIORITY_NAMES.values(), 0)
+        self.expired = 0
+        self.throttle_events = 0
+        self.wait_seconds = 0.0
+        self.max_queue_depth = 0
+
+    def _user_bucket(self, user):
+        bucket = self._users.get(user)
+        if bucket is None:
+            bucket = self._users[user] = TokenBucket(self.user_rate, self.user_burst)
+            while len(self._users) > USER_BUCKETS_MAX:
+                self._users.popitem(last=False)
+        self._users.move_to_end(user)
+        return bucket
+
+    def _head(self, user):
+        """Chamada da frente do usuário (descarta as que já saíram)"""
+        pending = self._pending.get(user)
+        while pending and pending[0][1] in self._removed:
+            self._removed.discard(heapq.heappop(pending)[1])
+        if not pending:
+            self._pending.pop(user, None)
+            return None
+        return pending[0]
+
+    def _place(self, user, now):
+        """Põe a chamada da frente do usuário em _ready ou, sem ficha, em _parked"""
+        self._placed.pop(user, None)
+        head = self._head(user)
+        if head is None:
+            return
+        wait = self._user_bucket(user).wait_time(now)
+        record = head if wait <= 0 else (now + wait, head[1], user, head)
+        heapq.heappush(self._ready if wait <= 0 else self._parked, record)
+        self._placed[user] = record
+
+    def _advance(self, now):
+        """Acorda os usuários cuja ficha chegou e limpa registros vencidos do topo de _ready"""
+        while self._parked and self._parked[0][0] <= now:
+            record = heapq.heappop(self._parked)
+            if self._placed.get(record[2]) is record:
+                self._place(record[2], now)
+        while self._ready and self._placed.get(self._ready[0][2]) is not self._ready[0]:
+            heapq.heappop(self._ready)
+
+    def _enqueue(self, entry):
+        user = entry[2]
+        head = self._head(user)
+        heapq.heappush(self._pending.setdefault(user, []), entry)
+        self._waiting.add(entry[1])
+        self.depth[PRIORITY_NAMES[entry[0]]] += 1
+        self.max_queue_depth = max(self.max_queue_depth, len(self._waiting))
+        if head is None or entry < head:
+            self._place(user, time.monotonic())
+
+    def _dequeue(self, entry, now):
+        self._waiting.discard(entry[1])
+        self.depth[PRIORITY_NAMES[entry[0]]] -= 1
+        user = entry[2]
+        if self._pending.get(user) and self._pending[user][0] is entry:
+            heapq.heappop(self._pending[user])
+            self._place(user, now)
+        else:
+            self._removed.add(entry[1])
+
+    def _poll(self, entry, now):
+        """(liberada, espera sugerida) para a entrada; libera consumindo as fichas.
+
+        Espera None: há outra chamada pronta na frente, e ela avisa quando sair.
+        """
+        if now < self.blocked_until:
+            return False, self.blocked_until - now
+        self._advance(now)
+        if not self._ready or self._ready[0] is not entry:
+            record = self._placed.get(entry[2])
+            if record is not None and len(record) == 4:
+                # O próprio usuário está sem ficha: nada muda antes da próxima
+                return False, max(record[0] - now, 0.0)
+            return False, None
+        app_wait = self._app.wait_time(now)
+        if app_wait > 0:
+            return False, app_wait
+        heapq.heappop(self._ready)
+        self._app.take()
+        self._user_bucket(entry[2]).take()
+        self._dequeue(entry, now)
+        self.granted[PRIORITY_NAMES[entry[0]]] += 1
+        return True, 0.0
+
+    def _expire(self, now, deadline):
+        """Desiste se o prazo acabou ou se a pausa do 429 passa do prazo"""
+        if now < deadline and self.blocked_until <= deadline:
+            return None
+        self.expired += 1
+        if self.blocked_until > now:
+            return RateLimited(f'Limite de requisições do Spotify atingido; tente de novo em {self.blocked_until - now:.0f}s')
+        return RateLimited('Fila de requisições ao Spotify cheia; tente de novo em instantes')
+
+    def acquire(self, user, priority=BACKGROUND, deadline=None):
+        """Bloqueia até a chamada poder sair; RateLimited se o prazo não permitir"""
+        started = time.monotonic()
+        deadline = deadline or started + self.deadline
+        entry = (priority, next(self._seq), user)
+        with self._cond:
+            self._enqueue(entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    granted, wait = self._poll(entry, now)
+                    if granted:
+                        self.wait_seconds += now - started
+                        return
+                    error = self._expire(now, deadline)
+                    if error:
+                        raise error
+                    self._cond.wait(deadline - now if wait is None else min(wait, deadline - now))
+            finally:
+                if entry[1] in self._waiting:
+                    self._dequeue(entry, time.monotonic())
+                self._cond.notify_all()
+
+    async def acquire_async(self, user, priority=BACKGROUND, deadline=None):
+        started = time.monotonic()
+        deadline = deadline or started + self.deadline
+        entry = (priority, next(self._seq), user)
+        with self._cond:
+            self._enqueue(entry)
+        try:
+            while True:
+                with self._cond:
+                    now = time.monotonic()
+                    granted, wait = self._poll(entry, now)
+                    if granted:
+                        self.wait_seconds += now - started
+                        return
+                    error = self._expire(now, deadline)
+                    if error:
+                        raise error
+                # O event loop não espera no Condition: confere de novo a cada ASYNC_POLL_INTERVAL
+                await asyncio.sleep(min(ASYNC_POLL_INTERVAL if wait is None else wait, deadline - now, ASYNC_POLL_INTERVAL))
+        finally:
+            with self._cond:
+                if entry[1] in self._waiting:
+                    self._dequeue(entry, time.monotonic())
+                self._cond.notify_all()
+
+    def throttled(self, delay):
+        """Spotify respondeu 429: pausa a fila e recomeça do balde vazio"""
+        with self._cond:
+            now = time.monotonic()
+            self.throttle_events += 1
+            self.blocked_until = max(self.blocked_until, now + delay)
+            self._app.drain(now)
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            now = time.monotonic()
+            granted = sum(self.granted.values())
+            return {
+                'queue_depth': len(self._waiting),
+                'queue_by_priority': dict(self.depth),
+                'max_queue_depth': self.max_queue_depth,
+                'granted': dict(self.granted),
+                'expired': self.expired,
+                'throttle_events': self.throttle_events,
+                'blocked_for': max(0.0, self.blocked_until - now),
+                'avg_wait_ms': self.wait_seconds / granted * 1000 if granted else 0.0,
+                'app_tokens': round(self._app.tokens, 2),
+                'users': len(self._users),
+            }
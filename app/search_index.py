@@ -0,0 +1,193 @@
+import heapq
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+from models import Track
+from views import items_of, track_view
+
+# Sugestões por consulta e mínimo de acertos locais antes de recorrer ao Spotify
+SUGGEST_LIMIT = int(os.getenv('SUGGEST_LIMIT', '8'))
+SUGGEST_MIN_LOCAL = int(os.getenv('SUGGEST_MIN_LOCAL', '3'))
+# Consultas mais curtas que isso nunca vão ao Spotify (só índice local)
+SUGGEST_MIN_CHARS = int(os.getenv('SUGGEST_MIN_CHARS', '2'))
+UPSTREAM_LIMIT = 20
+
+INDEX_MAX_TRACKS = int(os.getenv('SEARCH_INDEX_MAX_TRACKS', '5000'))
+INDEX_MAX_USERS = int(os.getenv('SEARCH_INDEX_MAX_USERS', '1000'))
+# Prefixos indexados por palavra; termos maiores são conferidos nas palavras guardadas
+PREFIX_MAX = 12
+COMPLETE_QUERIES_MAX = 200
+
+
+def normalize(text):
+    """Minúsculas e sem acentos, para 'musica' encontrar 'Música'"""
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def words_of(text):
+    return [w for w in re.split(r'\W+', normalize(text)) if w]
+
+
+def prefixes(words):
+    return {w[:n] for w in words for n in range(1, min(len(w), PREFIX_MAX) + 1)}
+
+
+class TrackIndex:
+    """Índice de prefixos (edge n-grams) das músicas já vistas por um usuário.
+
+    Cada palavra de nome, artista e álbum entra com todos os seus prefixos; uma
+    consulta é a interseção dos conjuntos dos prefixos dos seus termos.
+    """
+
+    def __init__(self, max_tracks=INDEX_MAX_TRACKS):
+        self.max_tracks = max_tracks
+        self._tracks = OrderedDict()  # id -> (view, palavras)
+        self._postings = {}  # prefixo -> ids
+        # Consultas cuja resposta do Spotify veio inteira: extensões delas só filtram o índice
+        self._complete = OrderedDict()
+
+    def add(self, items):
+        for track in map(Track.from_api, items):
+            if not track or not track.id:
+                continue
+            track_id = track.id
+            if track_id in self._tracks:
+                self._tracks.move_to_end(track_id)
+                continue
+            view = track_view(track)
+            words = tuple(set(words_of(f"{view['name']} {view['artist']} {view['album']}")))
+            for prefix in prefixes(words):
+                self._postings.setdefault(prefix, set()).add(track_id)
+            self._tracks[track_id] = (view, words)
+            while len(self._tracks) > self.max_tracks:
+                self._remove(next(iter(self._tracks)))
+
+    def _remove(self, track_id):
+        _, words = self._tracks.pop(track_id)
+        for prefix in prefixes(words):
+            ids = self._postings.get(prefix)
+            if ids is not None:
+                ids.discard(track_id)
+                if not ids:
+                    del self._postings[prefix]
+
+    def search(self, query, limit):
+        terms = words_of(query)
+        if not terms:
+            return []
+        candidates = None
+        for term in sorted(set(terms), key=len, reverse=True):
+            ids = self._postings.get(term[:PREFIX_MAX])
+            if not ids:
+                return []
+            candidates = set(ids) if candidates is None else candidates & ids
+            if not candidates:
+                return []
+
+        long_terms = [t for t in terms if len(t) > PREFIX_MAX]
+        matches = []
+        for track_id in candidates:
+            view, words = self._tracks[track_id]
+            if all(any(w.startswith(t) for w in words) for t in long_terms):
+                matches.append(view)
+
+        # Nome começando pela consulta primeiro, depois as mais populares
+        normalized = ' '.join(terms)
+        return heapq.nsmallest(
+            limit, matches,
+            key=lambda v: (not normalize(v['name']).startswith(normalized), -(v['popularity'] or 0), v['name']),
+        )
+
+    def mark_complete(self, query):
+        terms = tuple(words_of(query))
+        if not terms:
+            return
+        self._complete[terms] = True
+        while len(self._complete) > COMPLETE_QUERIES_MAX:
+            self._complete.popitem(last=False)
+
+    def is_complete(self, query):
+        """Se uma consulta completa já responde esta, comparando termo a termo: os mesmos
+        termos, com o último podendo ter sido só estendido ('ab c' não vem de 'ab')"""
+        terms = tuple(words_of(query))
+        if not terms:
+            return False
+        head, last = terms[:-1], terms[-1]
+        return any(head + (last[:n],) in self._complete for n in range(1, len(last) + 1))
+
+    def __len__(self):
+        return len(self._tracks)
+
+
+class SearchIndex:
+    """Um TrackIndex por usuário, alimentado pelas músicas que as páginas já carregaram"""
+
+    def __init__(self, max_users=INDEX_MAX_USERS):
+        self.max_users = max_users
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.upstream_calls = 0
+
+    def _index(self, user_key):
+        index = self._indexes.get(user_key)
+        if index is None:
+            index = self._indexes[user_key] = TrackIndex()
+            while len(self._indexes) > self.max_users:
+                self._indexes.popitem(last=False)
+        self._indexes.move_to_end(user_key)
+        return index
+
+    def add(self, user_key, items):
+        with self._lock:
+            self._index(user_key).add(items)
+
+    def discard(self, user_key):
+        with self._lock:
+            self._indexes.pop(user_key, None)
+
+    def lookup(self, user_key, query, limit=SUGGEST_LIMIT):
+        """Sugestões locais e a consulta a mandar ao Spotify (None se o índice basta)"""
+        with self._lock:
+            index = self._index(user_key)
+            items = index.search(query, limit)
+            complete = index.is_complete(query)
+        upstream_query = ' '.join(words_of(query))
+        if complete or len(items) >= min(limit, SUGGEST_MIN_LOCAL) or len(upstream_query) < SUGGEST_MIN_CHARS:
+            with self._lock:
+                self.local_hits += 1
+            return items, None
+        return items, upstream_query
+
+    def merge_upstream(self, user_key, query, items, results, limit=SUGGEST_LIMIT):
+        """Indexa o resultado do Spotify e completa as sugestões locais sem repetir músicas"""
+        page = (results or {}).get('tracks') or {}
+        tracks = [Track.from_api(t) for t in items_of(page) if t]
+        with self._lock:
+            self.upstream_calls += 1
+            index = self._index(user_key)
+            index.add(tracks)
+            if (page.get('total') or 0) <= len(tracks):
+                index.mark_complete(query)
+        seen = {item['id'] for item in items}
+        merged = list(items)
+        for track in tracks:
+            if len(merged) >= limit:
+                break
+            if track.id not in seen:
+                seen.add(track.id)
+                merged.append(track_view(track))
+        return merged
+
+    def stats(self):
+        with self._lock:
+            return {
+                'users': len(self._indexes),
+                'tracks': sum(len(index) for index in self._indexes.values()),
+                'local_hits': self.local_hits,
+                'upstream_calls': self.upstream_calls,
+            }
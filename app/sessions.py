@@ -0,0 +1,179 @@
+import json
+import os
+import secrets
+import threading
+import time
+
+from flask.sessions import SecureCookieSessionInterface, SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+from cache import redis_client_from_env
+
+# Sessão expira após esse tempo (segundos) sem uso; cada requisição renova o prazo
+# (é também o PERMANENT_SESSION_LIFETIME do app, que dá a validade do cookie)
+SESSION_TTL = int(os.getenv('SESSION_TTL', '604800'))
+
+
+def new_session_id():
+    return secrets.token_urlsafe(32)
+
+
+def cookie_options(interface, app):
+    """Atributos do cookie de sessão pela config do Flask (SESSION_COOKIE_*), iguais no Flask e no ASGI"""
+    return {
+        'domain': interface.get_cookie_domain(app),
+        'path': interface.get_cookie_path(app),
+        'httponly': interface.get_cookie_httponly(app),
+        'secure': interface.get_cookie_secure(app),
+        'samesite': interface.get_cookie_samesite(app),
+    }
+
+
+def cookie_max_age(app):
+    """Validade do cookie: PERMANENT_SESSION_LIFETIME, o mesmo prazo da sessão no servidor"""
+    return int(app.permanent_session_lifetime.total_seconds())
+
+
+class MemorySessionStore:
+    """Sessões em memória do processo (um único worker)"""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def get(self, sid):
+        with self._lock:
+            entry = self._data.get(sid)
+            if entry is None:
+                return None
+            expires_at, raw = entry
+            if expires_at <= time.monotonic():
+                del self._data[sid]
+                return None
+            return json.loads(raw)
+
+    def set(self, sid, data, ttl):
+        with self._lock:
+            # Guardado serializado: cada requisição recebe a sua cópia, como no Redis
+            self._data[sid] = (time.monotonic() + ttl, json.dumps(data))
+            self._writes += 1
+            if self._writes % 1000 == 0:
+                self._purge()
+
+    def touch(self, sid, ttl):
+        with self._lock:
+            entry = self._data.get(sid)
+            if entry is not None:
+                self._data[sid] = (time.monotonic() + ttl, entry[1])
+
+    def delete(self, sid):
+        with self._lock:
+            self._data.pop(sid, None)
+
+    def _purge(self):
+        now = time.monotonic()
+        for sid in [sid for sid, (expires_at, _) in self._data.items() if expires_at <= now]:
+            del self._data[sid]
+
+
+class RedisSessionStore:
+    """Sessões no Redis do docker-compose: valem para vários workers e nós"""
+
+    def __init__(self, client, namespace='spotify-session:'):
+        self.client = client
+        self.namespace = namespace
+
+    def get(self, sid):
+        raw = self.client.get(self.namespace + sid)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, sid, data, ttl):
+        self.client.setex(self.namespace + sid, int(ttl), json.dumps(data))
+
+    def touch(self, sid, ttl):
+        self.client.expire(self.namespace + sid, int(ttl))
+
+    def delete(self, sid):
+        self.client.delete(self.namespace + sid)
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """Dados da sessão guardados no servidor; o cookie leva só o ID opaco"""
+
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(session):
+            session.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid or new_session_id()
+        self.new = new
+        self.modified = False
+        self.previous_sid = None
+
+    def rotate(self):
+        """Troca o ID (ex.: no login) para que um ID anterior não dê acesso à sessão"""
+        if not self.new:
+            self.previous_sid = self.previous_sid or self.sid
+        self.sid = new_session_id()
+        self.new = True
+        self.modified = True
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """SessionInterface do Flask sobre um session store, com expiração deslizante"""
+
+    def __init__(self, store, ttl=SESSION_TTL):
+        self.store = store
+        self.ttl = ttl
+
+    def load(self, sid):
+        data = self.store.get(sid) if sid else None
+        if data is None:
+            return ServerSession(new=True)
+        return ServerSession(data, sid=sid)
+
+    def persist(self, session):
+        """Grava a sessão e diz o que fazer com o cookie: 'set' (sessão nova), 'refresh'
+        (renovar a validade), 'delete' ou None"""
+        if session.previous_sid:
+            self.store.delete(session.previous_sid)
+            session.previous_sid = None
+        if not session:
+            if session.new:
+                return None  # visitante anônimo: nada guardado, nenhum cookie
+            self.store.delete(session.sid)
+            return 'delete'
+        if session.modified or session.new:
+            self.store.set(session.sid, dict(session), self.ttl)
+        else:
+            self.store.touch(session.sid, self.ttl)
+        return 'set' if session.new else 'refresh'
+
+    def cookie_action(self, app, session):
+        """Grava a sessão; 'set' quando o cookie deve ser (re)enviado, 'delete' ou None"""
+        action = self.persist(session)
+        if action == 'refresh':
+            # Expiração deslizante também no navegador, como o Flask faz com sessões permanentes
+            return 'set' if app.config['SESSION_REFRESH_EACH_REQUEST'] else None
+        return action
+
+    def open_session(self, app, request):
+        return self.load(request.cookies.get(self.get_cookie_name(app)))
+
+    def save_session(self, app, session, response):
+        action = self.cookie_action(app, session)
+        name = self.get_cookie_name(app)
+        if action == 'delete':
+            response.delete_cookie(name, **cookie_options(self, app))
+        elif action == 'set':
+            response.set_cookie(name, session.sid, max_age=cookie_max_age(app), **cookie_options(self, app))
+
+
+def create_session_interface():
+    """Escolhe pelo ambiente: SESSION_BACKEND=memory (padrão), redis, fake-redis ou cookie"""
+    if os.getenv('SESSION_BACKEND') == 'cookie':
+        # Sessão inteira no cookie assinado (comportamento padrão do Flask)
+        return SecureCookieSessionInterface()
+    client = redis_client_from_env('SESSION_BACKEND')
+    return ServerSideSessionInterface(MemorySessionStore() if client is None else RedisSessionStore(client))
@@ -0,0 +1,168 @@
+import json
+import os
+import time
+
+import aiohttp
+from spotipy.exceptions import SpotifyException
+
+from cache import CACHE_TTLS, INVALIDATES, cache_key
+from metrics import observe_spotify
+from scheduler import THROTTLE_RETRIES, classify, retry_after, user_of
+from transport import HTTP_TIMEOUT, SPOTIFY_API_URL, scheduler
+
+# Conexões simultâneas do cliente assíncrono com a API do Spotify
+ASYNC_POOL_SIZE = int(os.getenv('SPOTIFY_ASYNC_POOL_SIZE', '1000'))
+
+_http_client = None
+
+
+def get_http_client():
+    """aiohttp.ClientSession do processo (criada no event loop do servidor ASGI)"""
+    global _http_client
+    if _http_client is None or _http_client.closed:
+        _http_client = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=ASYNC_POOL_SIZE, keepalive_timeout=30),
+            timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT),
+        )
+    return _http_client
+
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.close()
+        _http_client = None
+
+
+class AsyncSpotify:
+    """Cliente assíncrono com os mesmos nomes de métodos do spotipy usados pelas rotas"""
+
+    def __init__(self, access_token, client=None, user_key=None):
+        self.access_token = access_token
+        self.client = client or get_http_client()
+        self.user_key = user_key
+
+    async def _call(self, method, path, params=None, payload=None):
+        params = {k: str(v) for k, v in (params or {}).items() if v is not None}
+        authorization = f'Bearer {self.access_token}'
+        user, priority = user_of(self.user_key, authorization), classify(method, path)
+        deadline = time.monotonic() + scheduler.deadline
+        for attempt in range(THROTTLE_RETRIES + 1):
+            await scheduler.acquire_async(user, priority, deadline)
+            start, status = time.perf_counter(), 'error'
+            try:
+                async with self.client.request(
+                    method, SPOTIFY_API_URL + path, params=params, json=payload,
+                    headers={'Authorization': authorization},
+                ) as response:
+                    body = await response.read()
+                    status = response.status
+            finally:
+                observe_spotify(method, path, status, time.perf_counter() - start)
+            if response.status == 429 and attempt < THROTTLE_RETRIES:
+                scheduler.throttled(retry_after(response.headers, attempt))
+                continue
+            if response.status >= 400:
+                try:
+                    error = json.loads(body).get('error', {})
+                    msg, reason = error.get('message'), error.get('reason')
+                except ValueError:
+                    msg, reason = body.decode(errors='replace') or None, None
+                raise SpotifyException(
+                    response.status, -1, f'{response.url}:\n {msg}',
+                    reason=reason, headers=dict(response.headers),
+                )
+            break
+        if not body:
+            return None
+        return json.loads(body)
+
+    async def current_user(self):
+        return await self._call('GET', 'me/')
+
+    async def current_user_playing_track(self):
+        return await self._call('GET', 'me/player/currently-playing')
+
+    async def devices(self):
+        return await self._call('GET', 'me/player/devices')
+
+    async def current_user_top_tracks(self, limit=20, offset=0, time_range='medium_term'):
+        return await self._call('GET', 'me/top/tracks', {'time_range': time_range, 'limit': limit, 'offset': offset})
+
+    async def current_user_top_artists(self, limit=20, offset=0, time_range='medium_term'):
+        return await self._call('GET', 'me/top/artists', {'time_range': time_range, 'limit': limit, 'offset': offset})
+
+    async def current_user_recently_played(self, limit=50, after=None, before=None):
+        return await self._call('GET', 'me/player/recently-played', {'limit': limit, 'after': after, 'before': before})
+
+    async def current_user_playlists(self, limit=50, offset=0):
+        return await self._call('GET', 'me/playlists', {'limit': limit, 'offset': offset})
+
+    async def playlist_items(self, playlist_id, fields=None, limit=100, offset=0, market=None, additional_types=('track', 'episode')):
+        return await self._call('GET', f'playlists/{playlist_id}/tracks', {
+            'fields': fields, 'limit': limit, 'offset': offset, 'market': market,
+            'additional_types': ','.join(additional_types),
+        })
+
+    async def artists(self, artists):
+        return await self._call('GET', 'artists', {'ids': ','.join(artists)})
+
+    async def tracks(self, tracks, market=None):
+        return await self._call('GET', 'tracks', {'ids': ','.join(tracks), 'market': market})
+
+    async def search(self, q, limit=10, offset=0, type='track', market=None):
+        return await self._call('GET', 'search', {'q': q, 'limit': limit, 'offset': offset, 'type': type, 'market': market})
+
+    async def start_playback(self):
+        return await self._call('PUT', 'me/player/play', payload={})
+
+    async def pause_playback(self):
+        return await self._call('PUT', 'me/player/pause')
+
+    async def next_track(self):
+        return await self._call('POST', 'me/player/next')
+
+    async def previous_track(self):
+        return await self._call('POST', 'me/player/previous')
+
+
+class AsyncCachedSpotify:
+    """Equivalente assíncrono do CachedSpotify, sobre o mesmo ResponseCache"""
+
+    def __init__(self, client, cache, user_key, ttls=CACHE_TTLS):
+        self._client = client
+        self._cache = cache
+        self._user_key = user_key
+        self._ttls = ttls
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name in self._ttls:
+            return self._cached(name, attr)
+        if name in INVALIDATES:
+            return self._invalidating(name, attr)
+        return attr
+
+    def _cached(self, name, method):
+        async def call(*args, **kwargs):
+            key = cache_key(self._user_key, name, args, kwargs)
+            value = self._cache.get(key)
+            if value is not None:
+                return value
+            return await self._cache.flights.do_async(key, name, lambda: self._fetch(key, name, method, args, kwargs))
+        return call
+
+    async def _fetch(self, key, name, method, args, kwargs):
+        value = await method(*args, **kwargs)
+        if value is not None:
+            self._cache.set(key, value, self._ttls[name])
+        return value
+
+    def _invalidating(self, name, method):
+        async def call(*args, **kwargs):
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                for stale in INVALIDATES[name]:
+                    self._cache.invalidate(self._user_key, stale)
+        return call
@@ -0,0 +1,6 @@
+// Funções usadas pelos scripts de mais de uma página
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text;
+    return div.innerHTML;
+}
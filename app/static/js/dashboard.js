@@ -0,0 +1,120 @@
+// Comandos do player: a tela muda na hora e o estado real chega depois pelo SSE
+async function sendPlayback(action, optimistic, errorLabel) {
+    if (!isPremium) {
+        alert('⚠️ Esta funcionalidade requer Spotify Premium');
+        return;
+    }
+
+    const previous = nowPlaying;
+    renderNowPlaying(optimistic);
+    try {
+        const response = await fetch('/api/' + action, { method: 'POST' });
+        const result = await response.json();
+        if (!result.success) {
+            renderNowPlaying(previous);
+            alert('Erro: ' + result.error);
+        } else if (!window.EventSource) {
+            setTimeout(() => location.reload(), 1000);
+        }
+    } catch (error) {
+        renderNowPlaying(previous);
+        alert(errorLabel + error);
+    }
+}
+
+function togglePlayPause() {
+    sendPlayback('toggle-playback', Object.assign({}, nowPlaying, { is_playing: !nowPlaying.is_playing }),
+        'Erro ao controlar reprodução: ');
+}
+
+function nextTrack() {
+    sendPlayback('next-track', Object.assign({}, nowPlaying, { is_playing: true, skip: (nowPlaying.skip || 0) + 1 }),
+        'Erro ao avançar música: ');
+}
+
+function previousTrack() {
+    sendPlayback('previous-track', Object.assign({}, nowPlaying, { is_playing: true, skip: (nowPlaying.skip || 0) - 1 }),
+        'Erro ao voltar música: ');
+}
+
+function shareTrack(spotifyUrl, trackName, artistName) {
+    if (navigator.share) {
+        navigator.share({
+            title: trackName + ' - ' + artistName,
+            text: 'Escute esta música no Spotify!',
+            url: spotifyUrl
+        });
+    } else {
+        // Fallback para navegadores sem Web Share API
+        const text = `🎵 Escutando: ${trackName} - ${artistName}\n${spotifyUrl}`;
+        navigator.clipboard.writeText(text).then(() => {
+            alert('Link copiado para a área de transferência!');
+        }).catch(() => {
+            prompt('Copie este link:', spotifyUrl);
+        });
+    }
+}
+
+function formatDuration(ms) {
+    const seconds = Math.floor((ms % 60000) / 1000);
+    return Math.floor(ms / 60000) + ':' + String(seconds).padStart(2, '0');
+}
+
+// Atualiza só o card da música atual com o estado recebido do servidor
+function renderNowPlaying(state) {
+    nowPlaying = state;
+    const track = state.track;
+    document.getElementById('playPauseBtn').textContent = state.is_playing ? '⏸️' : '▶️';
+    document.getElementById('trackActions').style.display = track ? '' : 'none';
+    // Troca de música ainda não confirmada: card esmaecido até o estado real chegar
+    document.getElementById('trackInfo').style.opacity = state.skip ? 0.5 : '';
+    if (!track) {
+        document.getElementById('trackInfo').innerHTML = `
+            <div class="track-title">Nenhuma música tocando</div>
+            <div class="track-artist">Abra o Spotify e comece a tocar algo!</div>`;
+        return;
+    }
+    document.getElementById('trackInfo').innerHTML = `
+        <div class="track-title">${escapeHtml(track.name)}</div>
+        <div class="track-artist">${escapeHtml(track.artist)}</div>
+        <div class="track-details">
+            <div>💿 <strong>Álbum:</strong> ${escapeHtml(track.album)}</div>
+            <div>📅 <strong>Lançamento:</strong> ${escapeHtml(track.release_date)}</div>
+            <div>⭐ <strong>Popularidade:</strong> ${track.popularity}/100</div>
+            <div>⏱️ <strong>Duração:</strong> ${formatDuration(track.duration_ms)}</div>
+        </div>
+        <div style="margin: 10px 0;">
+            <span style="background: rgba(0,0,0,0.3); padding: 5px 10px; border-radius: 15px;">
+                ${state.is_playing ? '▶️ Tocando' : '⏸️ Pausado'}
+            </span>
+        </div>
+        <a href="${escapeHtml(track.url)}" target="_blank" class="spotify-link">
+            🎧 Abrir no Spotify
+        </a>`;
+}
+
+// Atualizações da música atual via Server-Sent Events
+if (window.EventSource) {
+    const stream = new EventSource('/api/now-playing/stream');
+    stream.addEventListener('now-playing', (event) => {
+        const state = JSON.parse(event.data);
+        if (state.error) {
+            // Comando recusado pelo Spotify: volta ao estado real (se veio) e avisa
+            if ('track' in state) renderNowPlaying(state);
+            alert(state.error);
+            return;
+        }
+        const current = nowPlaying.track ? nowPlaying.track.id : null;
+        const next = state.track ? state.track.id : null;
+        if (current !== next || nowPlaying.is_playing !== state.is_playing || nowPlaying.skip) {
+            renderNowPlaying(state);
+        }
+    });
+} else {
+    // Navegadores sem EventSource: recarrega a cada 30 segundos
+    setInterval(() => {
+        if (document.visibilityState === 'visible') {
+            location.reload();
+        }
+    }, 30000);
+}
@@ -0,0 +1,97 @@
+// Listas paginadas: a próxima página vem da API JSON quando o fim da lista aparece na tela
+const lazyList = document.getElementById('lazy-list');
+const lazyMore = document.getElementById('lazy-more');
+let lazyLoading = false;
+
+function element(tag, props = {}, children = []) {
+    const node = Object.assign(document.createElement(tag), props);
+    children.forEach(child => node.append(child));
+    return node;
+}
+
+function spotifyLink(url) {
+    return element('div', {style: 'margin-top: 8px;'}, [
+        element('a', {href: url, target: '_blank', className: 'spotify-link', textContent: '🎧 Abrir no Spotify'}),
+    ]);
+}
+
+// Mesma marcação das linhas renderizadas pelo template de cada página
+const rowRenderers = {
+    'top-tracks': (track, index, data) => {
+        const artist = (data.artists || {})[track.artist_id];
+        return element('li', {}, [
+            element('span', {className: 'rank', textContent: data.offset + index + 1}),
+            element('strong', {textContent: track.name}), element('br'),
+            element('em', {textContent: track.artist}), element('br'),
+            ...(artist ? [element('small', {style: 'color: #b3b3b3;', textContent: `🎵 ${artist.genres_text}`}), element('br')] : []),
+            element('small', {textContent: `Popularidade: ${track.popularity}/100`}),
+            spotifyLink(track.url),
+        ]);
+    },
+    'top-artists': (artist, index, data) => element('li', {}, [
+        element('span', {className: 'rank', textContent: data.offset + index + 1}),
+        element('strong', {textContent: artist.name}),
+        element('span', {className: 'popularity', textContent: `⭐ ${artist.popularity}/100`}), element('br'),
+        element('div', {className: 'genres', textContent: `🎵 ${artist.genres_text}`}),
+        element('div', {className: 'followers', textContent: `👥 ${artist.followers_formatted} seguidores`}),
+    ]),
+    'recent': (item, index, data) => {
+        const artist = (data.artists || {})[item.track.artist_id];
+        return element('li', {}, [
+            element('strong', {textContent: item.track.name}), element('br'),
+            element('em', {textContent: item.track.artist}), element('br'),
+            ...(artist ? [element('div', {className: 'time', textContent: `🎵 ${artist.genres_text}`})] : []),
+            element('div', {className: 'time', textContent: `📅 ${item.played_at.slice(0, 10)} às ${item.played_at.slice(11, 16)}`}),
+            spotifyLink(item.track.url),
+        ]);
+    },
+    'playlist': (item, index, data) => {
+        const seconds = Math.floor(item.track.duration_ms / 1000);
+        return element('li', {}, [
+            element('span', {className: 'rank', textContent: item.position + 1}),
+            element('div', {}, [
+                element('strong', {textContent: item.track.name}), element('br'),
+                element('em', {textContent: item.track.artist}), ' · ',
+                element('small', {textContent: item.track.album}), element('br'),
+                element('small', {textContent: `${Math.floor(seconds / 60)}:${String(seconds % 60).padStart(2, '0')}`}),
+            ]),
+        ]);
+    },
+};
+
+function loadNextPage() {
+    if (lazyLoading || !lazyMore.dataset.cursor) return;
+    lazyLoading = true;
+    fetch(`${lazyList.dataset.api}?cursor=${encodeURIComponent(lazyMore.dataset.cursor)}`)
+        .then(response => response.json())
+        .then(data => {
+            if (data.success === false) throw new Error(data.error);
+            const render = rowRenderers[lazyList.dataset.kind];
+            data.items.forEach((item, index) => lazyList.appendChild(render(item, index, data)));
+            if (data.next_cursor) {
+                lazyMore.dataset.cursor = data.next_cursor;
+                lazyMore.href = `${location.pathname}?cursor=${encodeURIComponent(data.next_cursor)}`;
+                // Observa de novo: se o fim da lista continua visível, já busca a próxima
+                observer.unobserve(lazyMore);
+                observer.observe(lazyMore);
+            } else {
+                lazyMore.parentNode.remove();
+                observer.disconnect();
+            }
+        })
+        .catch(error => console.error('Erro ao carregar mais itens:', error))
+        .finally(() => { lazyLoading = false; });
+}
+
+let observer = null;
+if (lazyMore && 'IntersectionObserver' in window) {
+    // Começa a buscar um pouco antes do fim da lista ficar visível
+    observer = new IntersectionObserver(entries => {
+        if (entries.some(entry => entry.isIntersecting)) loadNextPage();
+    }, {rootMargin: '400px'});
+    observer.observe(lazyMore);
+    lazyMore.addEventListener('click', event => {
+        event.preventDefault();
+        loadNextPage();
+    });
+}
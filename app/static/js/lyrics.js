@@ -0,0 +1,49 @@
+// Modal de letras: busca em /api/lyrics; se não houver letra, mostra onde procurar
+function lyricsLinks(trackName, artistName) {
+    const query = encodeURIComponent(trackName + ' ' + artistName + ' letra');
+    return `
+        <p>🎵 <strong>Onde encontrar a letra:</strong></p>
+        <p>• <a href="https://www.google.com/search?q=${query}" target="_blank" style="color: #1db954;">Google: "${escapeHtml(trackName)}" letra</a></p>
+        <p>• <a href="https://www.letras.mus.br/" target="_blank" style="color: #1db954;">Letras.mus.br</a></p>
+        <p>• <a href="https://genius.com/" target="_blank" style="color: #1db954;">Genius.com</a></p>
+        <p>• <a href="https://www.azlyrics.com/" target="_blank" style="color: #1db954;">AZLyrics.com</a></p>
+        <br>
+        <p><small>💡 <em>Dica: Clique nos links acima para buscar a letra em sites especializados!</em></small></p>
+    `;
+}
+
+let lyricsRequest = 0;
+
+function showLyrics(trackName, artistName) {
+    const content = document.getElementById('lyricsContent');
+    const requestId = ++lyricsRequest;
+    document.getElementById('lyricsTitle').textContent = trackName + ' - ' + artistName;
+    content.textContent = '⏳ Buscando letra...';
+    document.getElementById('lyricsModal').style.display = 'block';
+
+    fetch(`/api/lyrics?track=${encodeURIComponent(trackName)}&artist=${encodeURIComponent(artistName)}`)
+        .then(response => response.json())
+        .then(data => {
+            // Ignora a resposta se outra letra foi pedida enquanto esta carregava
+            if (requestId !== lyricsRequest) return;
+            if (data.success) {
+                content.textContent = data.lyrics;
+            } else {
+                content.innerHTML = `<p>😔 ${escapeHtml(data.error)}</p>` + lyricsLinks(trackName, artistName);
+            }
+        })
+        .catch(() => {
+            if (requestId === lyricsRequest) content.innerHTML = lyricsLinks(trackName, artistName);
+        });
+}
+
+function closeLyrics() {
+    document.getElementById('lyricsModal').style.display = 'none';
+}
+
+// Fechar modal clicando fora
+document.getElementById('lyricsModal').onclick = function(e) {
+    if (e.target === this) {
+        closeLyrics();
+    }
+}
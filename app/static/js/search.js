@@ -0,0 +1,42 @@
+// Sugestões enquanto digita: respostas do índice local chegam em poucos ms
+const searchInput = document.getElementById('searchInput');
+const suggestions = document.getElementById('suggestions');
+let suggestTimer = null;
+let suggestRequest = 0;
+
+function renderSuggestions(items) {
+    suggestions.innerHTML = '';
+    items.forEach(item => {
+        const li = document.createElement('li');
+        li.textContent = item.name;
+        const detail = document.createElement('small');
+        detail.textContent = ` — ${item.artist}`;
+        li.appendChild(detail);
+        li.addEventListener('mousedown', () => {
+            searchInput.value = `${item.name} ${item.artist}`;
+            searchInput.form.submit();
+        });
+        suggestions.appendChild(li);
+    });
+}
+
+searchInput.addEventListener('input', () => {
+    clearTimeout(suggestTimer);
+    const query = searchInput.value.trim();
+    if (!query) {
+        renderSuggestions([]);
+        return;
+    }
+    suggestTimer = setTimeout(() => {
+        const requestId = ++suggestRequest;
+        fetch(`/api/search/suggest?q=${encodeURIComponent(query)}`)
+            .then(response => response.json())
+            .then(data => {
+                // Ignora respostas atrasadas de consultas já digitadas por cima
+                if (requestId === suggestRequest) renderSuggestions(data.items || []);
+            })
+            .catch(() => {});
+    }, 120);
+});
+
+searchInput.addEventListener('blur', () => renderSuggestions([]));
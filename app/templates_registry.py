@@ -0,0 +1,31 @@
+import os
+
+from flask import Response, render_template, stream_template
+from jinja2 import FileSystemBytecodeCache
+
+from metrics import timed_render, timed_stream
+
+# Diretório opcional para o cache de bytecode do Jinja (workers novos já sobem "quentes")
+TEMPLATE_BYTECODE_CACHE = os.getenv('TEMPLATE_BYTECODE_CACHE')
+
+TEMPLATES = {}
+
+
+def init_templates(app):
+    """Compila todos os templates de app/templates uma única vez na inicialização"""
+    if TEMPLATE_BYTECODE_CACHE:
+        os.makedirs(TEMPLATE_BYTECODE_CACHE, exist_ok=True)
+        app.jinja_options = {**app.jinja_options, 'bytecode_cache': FileSystemBytecodeCache(TEMPLATE_BYTECODE_CACHE)}
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        TEMPLATES[name] = app.jinja_env.get_template(name)
+    return TEMPLATES
+
+
+def render_page(name, **context):
+    """Renderiza um template já compilado, com os context processors do Flask"""
+    return timed_render(name, lambda: render_template(TEMPLATES[name], **context))
+
+
+def stream_page(name, **context):
+    """Como render_page, mas envia o HTML em partes à medida que o template avança"""
+    return Response(timed_stream(name, stream_template(TEMPLATES[name], **context)), mimetype='text/html')
@@ -0,0 +1,172 @@
+import json
+import os
+import threading
+import time
+import uuid
+
+from spotipy.cache_handler import CacheHandler
+
+from cache import redis_client_from_env
+
+# Renova o token quando faltar menos que isso (segundos) para expires_at
+REFRESH_MARGIN = int(os.getenv('TOKEN_REFRESH_MARGIN', '120'))
+# Quanto tempo uma requisição espera pela renovação feita por outro worker
+REFRESH_WAIT = float(os.getenv('TOKEN_REFRESH_WAIT', '5'))
+
+
+class TokenRefreshTimeout(Exception):
+    """Outro worker segurou o lock de renovação além de REFRESH_WAIT e o token já expirou"""
+
+
+class MemoryTokenStore:
+    """Tokens por usuário em memória do processo"""
+
+    def __init__(self):
+        self._tokens = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_key):
+        with self._lock:
+            return self._tokens.get(user_key)
+
+    def set(self, user_key, token_info):
+        with self._lock:
+            self._tokens[user_key] = token_info
+
+    def delete(self, user_key):
+        with self._lock:
+            self._tokens.pop(user_key, None)
+
+    def try_lock(self, user_key, ttl):
+        # Um único processo: o lock por usuário do TokenManager já basta
+        return True
+
+    def unlock(self, user_key, owner):
+        pass
+
+
+class RedisTokenStore:
+    """Tokens por usuário no Redis, com lock de renovação entre workers (SET NX)"""
+
+    def __init__(self, client, namespace='spotify-token:'):
+        self.client = client
+        self.namespace = namespace
+
+    def get(self, user_key):
+        raw = self.client.get(self.namespace + user_key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, user_key, token_info):
+        self.client.set(self.namespace + user_key, json.dumps(token_info))
+
+    def delete(self, user_key):
+        self.client.delete(self.namespace + user_key)
+
+    def try_lock(self, user_key, ttl):
+        """Identificador do dono do lock, ou None se outro worker já o tem"""
+        owner = uuid.uuid4().hex
+        if self.client.set(self.namespace + 'lock:' + user_key, owner, ex=int(ttl) + 1, nx=True):
+            return owner
+        return None
+
+    def unlock(self, user_key, owner):
+        # Se o lock expirou e outro worker o pegou, o valor não é mais o nosso e fica como está
+        key = self.namespace + 'lock:' + user_key
+        current = self.client.get(key)
+        if current is not None and (current.decode() if isinstance(current, bytes) else current) == owner:
+            self.client.delete(key)
+
+
+class StoreCacheHandler(CacheHandler):
+    """Adapta um token store ao CacheHandler do spotipy para um usuário"""
+
+    def __init__(self, store, user_key):
+        self.store = store
+        self.user_key = user_key
+
+    def get_cached_token(self):
+        return self.store.get(self.user_key)
+
+    def save_token_to_cache(self, token_info):
+        self.store.set(self.user_key, token_info)
+
+
+def token_expiring(token_info, margin=REFRESH_MARGIN):
+    return token_info.get('expires_at', 0) - time.time() < margin
+
+
+class TokenManager:
+    """Entrega tokens válidos, renovando antes de expirar com uma só renovação por usuário"""
+
+    def __init__(self, store, oauth_factory, margin=REFRESH_MARGIN):
+        self.store = store
+        self.oauth_factory = oauth_factory
+        self.margin = margin
+        self.refreshes = 0
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def save(self, user_key, token_info):
+        self.store.set(user_key, token_info)
+
+    def discard(self, user_key):
+        self.store.delete(user_key)
+        with self._locks_guard:
+            self._locks.pop(user_key, None)
+
+    def get_token(self, user_key, fallback=None):
+        """Token atual do usuário; `fallback` (ex.: o da sessão) é usado se o store estiver vazio"""
+        token_info = self.store.get(user_key)
+        if token_info is None and fallback is not None:
+            # Sessão anterior ao processo atual: adota o token que veio na sessão
+            token_info = fallback
+            self.store.set(user_key, fallback)
+        if token_info is None or not token_expiring(token_info, self.margin):
+            return token_info
+        with self._user_lock(user_key):
+            # Outra requisição pode ter renovado enquanto esperávamos o lock
+            current = self.store.get(user_key) or token_info
+            if not token_expiring(current, self.margin):
+                return current
+            return self._refresh(user_key, current)
+
+    def _refresh(self, user_key, token_info):
+        owner = self.store.try_lock(user_key, REFRESH_WAIT)
+        if not owner:
+            return self._wait_for_refresh(user_key)
+        # Só quem pegou o lock o solta: o lock de outro worker nunca é apagado daqui
+        try:
+            oauth = self.oauth_factory(StoreCacheHandler(self.store, user_key))
+            refreshed = oauth.refresh_access_token(token_info['refresh_token'])
+            self.refreshes += 1
+            return refreshed
+        finally:
+            self.store.unlock(user_key, owner)
+
+    def _wait_for_refresh(self, user_key):
+        """Outro worker está renovando: espera o token novo aparecer no store, sem renovar daqui
+        (o refresh token que temos pode já ter sido trocado por ele)"""
+        deadline = time.monotonic() + REFRESH_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            current = self.store.get(user_key)
+            if current and not token_expiring(current, self.margin):
+                return current
+        # Prazo esgotado: o token do store ainda serve se não expirou de fato
+        current = self.store.get(user_key)
+        if current and current.get('expires_at', 0) > time.time():
+            return current
+        raise TokenRefreshTimeout(f'Renovação do token de {user_key} não terminou em {REFRESH_WAIT}s')
+
+    def _user_lock(self, user_key):
+        with self._locks_guard:
+            lock = self._locks.get(user_key)
+            if lock is None:
+                lock = self._locks[user_key] = threading.Lock()
+            return lock
+
+
+def create_token_store():
+    """Escolhe o store pelo ambiente: TOKEN_BACKEND=memory (padrão), redis ou fake-redis"""
+    client = redis_client_from_env('TOKEN_BACKEND')
+    return MemoryTokenStore() if client is None else RedisTokenStore(client)
@@ -0,0 +1,182 @@
+import os
+import socket
+import threading
+import time
+
+import requests
+import spotipy
+import urllib3
+from requests.adapters import HTTPAdapter
+
+from metrics import observe_spotify
+from scheduler import USER_HEADER, RequestScheduler, THROTTLE_RETRIES, classify, retry_after, user_of
+
+# Configuração do transporte HTTP compartilhado por todos os clientes Spotify
+SPOTIFY_API_URL = os.getenv('SPOTIFY_API_URL', 'https://api.spotify.com/v1/')
+POOL_SIZE = int(os.getenv('SPOTIFY_POOL_SIZE', '32'))
+POOL_HOSTS = int(os.getenv('SPOTIFY_POOL_HOSTS', '4'))
+HTTP_RETRIES = int(os.getenv('SPOTIFY_HTTP_RETRIES', '3'))
+HTTP_TIMEOUT = float(os.getenv('SPOTIFY_HTTP_TIMEOUT', '5'))
+KEEPALIVE = os.getenv('SPOTIFY_KEEPALIVE', '1') == '1'
+
+
+# Fila com orçamento e prioridades por onde passam todas as chamadas à API (síncronas e assíncronas)
+scheduler = RequestScheduler()
+
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter com keep-alive TCP e contagem de requisições para estatísticas.
+
+    Chamadas à API do Spotify passam pelo scheduler: esperam a vez na fila e,
+    num 429, pausam a fila pelo Retry-After e tentam de novo.
+    """
+
+    def __init__(self, *args, keepalive=True, scheduler=None, **kwargs):
+        self.keepalive = keepalive
+        self.scheduler = scheduler
+        self.requests_sent = 0
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self.keepalive:
+            kwargs['socket_options'] = urllib3.connection.HTTPConnection.default_socket_options + [
+                (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+            ]
+        super().init_poolmanager(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        user_key = request.headers.pop(USER_HEADER, None)
+        if not request.url.startswith(SPOTIFY_API_URL):
+            return self._send(request, **kwargs)
+        path = request.url[len(SPOTIFY_API_URL):]
+        if self.scheduler is None:
+            return self._timed_send(request, path, **kwargs)
+        user = user_of(user_key, request.headers.get('Authorization'))
+        priority = classify(request.method, path)
+        deadline = time.monotonic() + self.scheduler.deadline
+        for attempt in range(THROTTLE_RETRIES + 1):
+            self.scheduler.acquire(user, priority, deadline)
+            response = self._timed_send(request, path, **kwargs)
+            if response.status_code != 429 or attempt == THROTTLE_RETRIES:
+                return response
+            self.scheduler.throttled(retry_after(response.headers, attempt))
+            response.close()
+
+    def _timed_send(self, request, path, **kwargs):
+        """_send com latência e status registrados nas métricas (cada tentativa conta)"""
+        start = time.perf_counter()
+        status = 'error'
+        try:
+            response = self._send(request, **kwargs)
+            status = response.status_code
+            return response
+        finally:
+            observe_spotify(request.method, path, status, time.perf_counter() - start)
+
+    def _send(self, request, **kwargs):
+        with self._lock:
+            self.requests_sent += 1
+            self.in_flight += 1
+        if not self.keepalive:
+            request.headers['Connection'] = 'close'
+        try:
+            return super().send(request, **kwargs)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+class SharedSession(requests.Session):
+    """Sessão de processo; ignora o close() que o spotipy chama no __del__ de cada cliente"""
+
+    def close(self):
+        pass
+
+    def shutdown(self):
+        super().close()
+
+
+def build_session(pool_size=POOL_SIZE, pool_hosts=POOL_HOSTS, retries=HTTP_RETRIES, keepalive=KEEPALIVE,
+                  scheduler=scheduler):
+    session = SharedSession()
+    retry = urllib3.Retry(
+        total=retries,
+        connect=None,
+        read=False,
+        # Só leituras são repetidas num 5xx: repetir POST next/previous ou PUT play pularia
+        # duas faixas num clique; comandos do player falham direto para quem chamou
+        allowed_methods=frozenset(['GET']),
+        status=retries,
+        backoff_factor=0.3,
+        status_forcelist=(500, 502, 503, 504),
+        # 429 fica com o scheduler, que pausa todas as chamadas e não só esta conexão
+        respect_retry_after_header=False,
+    )
+    adapter = PooledAdapter(
+        pool_connections=pool_hosts,
+        pool_maxsize=pool_size,
+        max_retries=retry,
+        pool_block=False,
+        keepalive=keepalive,
+        scheduler=scheduler,
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+http_session = build_session()
+
+
+class UserSpotify(spotipy.Spotify):
+    """spotipy.Spotify que identifica o usuário das chamadas para o orçamento do scheduler"""
+
+    user_key = None
+
+    def _auth_headers(self):
+        headers = super()._auth_headers()
+        if self.user_key:
+            headers[USER_HEADER] = self.user_key
+        return headers
+
+
+def create_spotify(access_token, user_key=None):
+    """Cliente spotipy leve: só o bearer token muda, a conexão é do pool compartilhado"""
+    sp = UserSpotify(auth=access_token, requests_session=http_session, requests_timeout=HTTP_TIMEOUT)
+    sp.prefix = SPOTIFY_API_URL
+    sp.user_key = user_key
+    return sp
+
+
+def pool_stats(session=None):
+    """Conexões em uso/ociosas e taxa de reaproveitamento das conexões"""
+    session = session or http_session
+    adapter = session.get_adapter(SPOTIFY_API_URL)
+    pools = []
+    opened = idle_total = 0
+    for key in list(adapter.poolmanager.pools.keys()):
+        pool = adapter.poolmanager.pools.get(key)
+        if pool is None:
+            continue
+        idle = sum(1 for conn in list(pool.pool.queue) if conn is not None)
+        opened += pool.num_connections
+        idle_total += idle
+        pools.append({
+            'host': f'{pool.scheme}://{pool.host}:{pool.port}',
+            'idle': idle,
+            'opened': pool.num_connections,
+            'requests': pool.num_requests,
+        })
+    sent = adapter.requests_sent
+    return {
+        'pool_size': adapter._pool_maxsize,
+        'keepalive': adapter.keepalive,
+        'in_use': adapter.in_flight,
+        'idle': idle_total,
+        'requests': sent,
+        'connections_opened': opened,
+        'reuse_ratio': 1 - opened / sent if sent else 0.0,
+        'pools': pools,
+    }
@@ -0,0 +1,134 @@
+import hashlib
+import json
+
+from flask import Response, request
+
+from models import Artist, Track
+
+
+def track_view(item):
+    """Campos de uma música que as páginas e a API JSON usam"""
+    track = Track.from_api(item)
+    return {
+        'id': track.id,
+        'name': track.name,
+        'artist': track.artists[0].name if track.artists else '',
+        'artist_id': track.artists[0].id if track.artists else None,
+        'album': track.album.name,
+        'release_date': track.album.release_date,
+        'popularity': track.popularity,
+        'duration_ms': track.duration_ms,
+        'url': track.url,
+    }
+
+
+def artist_view(artist):
+    """Artista com gêneros e seguidores já formatados para exibição"""
+    artist = Artist.from_api(artist)
+    genres_text = "Gênero não especificado"
+    if artist.genres:
+        genres_text = ', '.join(artist.genres[:3])  # Pegar até 3 gêneros
+    return {
+        'id': artist.id,
+        'name': artist.name,
+        'popularity': artist.popularity,
+        'genres_text': genres_text,
+        'followers': artist.followers,
+        'followers_formatted': "{:,}".format(artist.followers).replace(',', '.'),
+    }
+
+
+def items_of(page):
+    return (page or {}).get('items') or []
+
+
+def dashboard_payload(context):
+    now_playing = dict(context['now_playing'])
+    # progress_ms muda a cada consulta; fora do payload para o ETag só mudar com a música
+    now_playing.pop('progress_ms', None)
+    return {
+        'user': {'display_name': context['user_name'], 'is_premium': context['is_premium']},
+        'now_playing': now_playing,
+        'devices': [
+            {
+                'name': device.get('name'),
+                'type': device.get('type'),
+                'is_active': device.get('is_active', False),
+                'volume_percent': device.get('volume_percent'),
+            }
+            for device in (context['devices'] or {}).get('devices', [])
+        ],
+    }
+
+
+def stats_payload(context):
+    return {
+        'top_tracks_short': [track_view(t) for t in items_of(context['top_tracks_short'])],
+        'top_tracks_medium': [track_view(t) for t in items_of(context['top_tracks_medium'])],
+        'top_artists_short': context['artists_short_processed'],
+        'top_artists_medium': context['artists_medium_processed'],
+        'listening': context['listening'],
+    }
+
+
+def page_fields(context):
+    """Posição da página e cursor da seguinte, comuns às listas paginadas"""
+    return {key: context.get(key) for key in ('time_range', 'offset', 'next_cursor') if key in context}
+
+
+def top_tracks_payload(context):
+    return {
+        'items': [track_view(t) for t in items_of(context['top_tracks'])],
+        'artists': context['artists'],
+        **page_fields(context),
+    }
+
+
+def top_artists_payload(context):
+    return {'items': context['processed_artists'], **page_fields(context)}
+
+
+def recent_payload(context):
+    return {
+        'items': [
+            {'played_at': play.played_at, 'track': track_view(play.track)}
+            for play in items_of(context['recent'])
+        ],
+        'artists': context['artists'],
+        'next_before': context.get('next_before'),
+        **page_fields(context),
+    }
+
+
+def playlists_payload(context):
+    return {'items': context['playlists']}
+
+
+def playlist_payload(context):
+    return {
+        'playlist': context['playlist'],
+        'items': [
+            {'position': item['position'], 'added_at': item['added_at'], 'track': track_view(item['track'])}
+            for item in context['items']
+        ],
+        **page_fields(context),
+    }
+
+
+def json_etag(payload):
+    """Corpo JSON normalizado e seu ETag forte"""
+    body = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return body, hashlib.sha256(body.encode()).hexdigest()[:32]
+
+
+def conditional_json(payload):
+    """Resposta JSON com ETag forte do payload normalizado; 304 se If-None-Match bater"""
+    body, etag = json_etag(payload)
+    # Comparação fraca: a resposta comprimida devolve o mesmo ETag como W/"..."
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
@@ -0,0 +1,68 @@
+"""Resumo do /stats com histórico grande: recálculo completo x agregados incrementais.
+
+Grava N reproduções sintéticas num SQLite temporário e mede o primeiro resumo
+(carga das colunas), o resumo seguinte com algumas reproduções novas e, como
+referência, o recálculo completo a cada visita.
+
+Uso: python benchmarks/bench_analytics.py [reproduções]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from analytics import AnalyticsEngine, ListeningStats  # noqa: E402
+from history import HistoryStore  # noqa: E402
+from mock_spotify import make_track  # noqa: E402
+
+USER = 'bench-user'
+START_MS = 1_500_000_000_000
+
+
+def plays(start, count):
+    items = []
+    for i in range(start, start + count):
+        played_at = START_MS + i * 600_000
+        items.append({
+            'played_at': time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime(played_at / 1000)),
+            'track': make_track(i % 3000),
+        })
+    return {'items': items}
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    with tempfile.TemporaryDirectory() as tmp:
+        history = HistoryStore(os.path.join(tmp, 'history.db'))
+        for start in range(0, total, 5000):
+            history.record(USER, plays(start, min(5000, total - start)))
+        engine = AnalyticsEngine(history)
+
+        first = timed(lambda: engine.summary(USER))
+        history.record(USER, plays(total, 20))
+        incremental = timed(lambda: engine.summary(USER))
+        unchanged = timed(lambda: engine.summary(USER))
+
+        def full():
+            stats = ListeningStats()
+            stats.append(history.plays_since(USER, 0))
+            stats.summary({})
+        recompute = timed(full)
+
+    print(f'{total} reproduções')
+    print(f'primeiro resumo (carga das colunas) {first:9.1f} ms')
+    print(f'resumo com 20 reproduções novas     {incremental:9.1f} ms')
+    print(f'resumo sem novidades                {unchanged:9.1f} ms')
+    print(f'recálculo completo por visita       {recompute:9.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
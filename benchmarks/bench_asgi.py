@@ -0,0 +1,81 @@
+"""Compara o app síncrono (Flask) com o modo ASGI sob carga concorrente.
+
+Sobe a API mock, o servidor Flask (threaded) e o uvicorn com asgi:app em
+subprocessos, dispara requisições concorrentes de muitos usuários distintos
+(para que o cache não esconda as chamadas ao Spotify) e mostra req/s, p50 e p99.
+
+Uso: python benchmarks/bench_asgi.py [--route /dashboard] [--concurrency 200] [--requests 2000] [--latency 0.1]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import aiohttp
+
+from harness import SERVERS, client_session, is_error, percentile, session_cookies, spawn, start_mock, wait_ready
+
+
+async def drive(base_url, route, cookies, concurrency, total):
+    latencies = []
+    errors = 0
+    counter = iter(range(total))
+
+    async with client_session(base_url, concurrency) as client:
+        async def worker():
+            nonlocal errors
+            for i in counter:
+                start = time.perf_counter()
+                try:
+                    headers = {'Cookie': f'session={cookies[i % len(cookies)]}'}
+                    async with client.get(route, headers=headers, allow_redirects=False) as response:
+                        text = await response.text()
+                    if is_error(response.status, text):
+                        errors += 1
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    errors += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'rps': total / elapsed,
+        'p50': statistics.median(latencies),
+        'p99': percentile(latencies, 0.99),
+        'errors': errors,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--route', default='/dashboard')
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.1)
+    parser.add_argument('--mock-port', type=int, default=8900)
+    args = parser.parse_args()
+
+    mock, env = start_mock(args.mock_port, args.latency)
+    cookies = session_cookies(args.requests)
+    print(f'rota {args.route}, {args.concurrency} concorrentes, {args.requests} requisições, '
+          f'latência da API {args.latency * 1000:.0f} ms')
+    try:
+        for name, command, port in SERVERS.values():
+            process = spawn(command, env)
+            try:
+                await wait_ready(f'http://127.0.0.1:{port}/')
+                result = await drive(f'http://127.0.0.1:{port}', args.route, cookies, args.concurrency, args.requests)
+            finally:
+                process.terminate()
+                process.wait()
+            print(f'{name:<13} {result["rps"]:8.1f} req/s  p50={result["p50"]:8.1f} ms  '
+                  f'p99={result["p99"]:8.1f} ms  erros={result["errors"]}')
+    finally:
+        mock.terminate()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,64 @@
+"""Compara chamadas sequenciais x fan-out paralelo das rotas /stats e /dashboard.
+
+Uso: python benchmarks/bench_fanout.py [latência_em_segundos] [repetições]
+"""
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+import spotipy  # noqa: E402
+from fanout import fan_out  # noqa: E402
+from mock_spotify import start_mock_server  # noqa: E402
+
+
+def stats_calls(sp):
+    return {
+        'top_tracks_short': lambda: sp.current_user_top_tracks(limit=5, time_range='short_term'),
+        'top_tracks_medium': lambda: sp.current_user_top_tracks(limit=5, time_range='medium_term'),
+        'top_artists_short': lambda: sp.current_user_top_artists(limit=5, time_range='short_term'),
+        'top_artists_medium': lambda: sp.current_user_top_artists(limit=5, time_range='medium_term'),
+    }
+
+
+def dashboard_calls(sp):
+    return {
+        'current_track': sp.current_user_playing_track,
+        'user_profile': sp.current_user,
+        'devices': sp.devices,
+    }
+
+
+def sequential(calls):
+    return {name: fn() for name, fn in calls.items()}
+
+
+def measure(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+def main():
+    latency = float(sys.argv[1]) if len(sys.argv) > 1 else 0.05
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    server, prefix = start_mock_server(latency=latency)
+    sp = spotipy.Spotify(auth='mock-token')
+    sp.prefix = prefix
+
+    print(f'latência simulada: {latency * 1000:.0f} ms, {repeat} repetições')
+    for route, build in (('/stats', stats_calls), ('/dashboard', dashboard_calls)):
+        seq = measure(lambda: sequential(build(sp)), repeat)
+        par = measure(lambda: fan_out(build(sp)), repeat)
+        print(f'{route:<11} sequencial p50={seq[0]:7.1f} ms max={seq[1]:7.1f} ms | '
+              f'fan-out p50={par[0]:7.1f} ms max={par[1]:7.1f} ms | {seq[0] / par[0]:.1f}x')
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
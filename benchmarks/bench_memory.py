@@ -0,0 +1,119 @@
+"""Memória de um histórico de 10 mil reproduções por usuário: JSON da API x modelos compactos.
+
+As reproduções são geradas no formato completo do Spotify (mercados, imagens,
+URIs...) e decodificadas página a página, como chegam da API. O footprint é
+medido com tracemalloc para os dicts crus e para os modelos com __slots__
+(músicas repetidas viram o mesmo objeto e as strings são internadas).
+
+O app deduplica só dentro de cada página (um registry por history.page), e é
+essa a redução que vale para ele; o registry único para o histórico inteiro
+aparece como limite superior.
+
+Uso: python benchmarks/bench_memory.py [reproduções] [músicas distintas]
+"""
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from models import Play  # noqa: E402
+
+MARKETS = [f'{chr(65 + i // 26)}{chr(65 + i % 26)}' for i in range(185)]
+
+
+def images(kind, i):
+    return [
+        {'height': size, 'width': size, 'url': f'https://i.scdn.co/image/{kind}{i}x{size}'}
+        for size in (640, 300, 64)
+    ]
+
+
+def api_track(i):
+    artist = {
+        'id': f'artist{i % 400}', 'name': f'Artista {i % 400}', 'type': 'artist',
+        'uri': f'spotify:artist:artist{i % 400}', 'href': f'https://api.spotify.com/v1/artists/artist{i % 400}',
+        'external_urls': {'spotify': f'https://open.spotify.com/artist/artist{i % 400}'},
+    }
+    return {
+        'id': f'track{i}', 'name': f'Música {i}', 'type': 'track', 'uri': f'spotify:track:track{i}',
+        'href': f'https://api.spotify.com/v1/tracks/track{i}', 'popularity': 50 + i % 50,
+        'duration_ms': 180000 + i * 7, 'explicit': False, 'is_local': False, 'disc_number': 1,
+        'track_number': 1 + i % 12, 'preview_url': f'https://p.scdn.co/mp3-preview/track{i}',
+        'external_ids': {'isrc': f'BRXXX{i:07d}'},
+        'external_urls': {'spotify': f'https://open.spotify.com/track/track{i}'},
+        'available_markets': MARKETS,
+        'artists': [artist],
+        'album': {
+            'id': f'album{i % 900}', 'name': f'Álbum {i % 900}', 'album_type': 'album', 'type': 'album',
+            'release_date': '2023-01-01', 'release_date_precision': 'day', 'total_tracks': 12,
+            'uri': f'spotify:album:album{i % 900}', 'href': f'https://api.spotify.com/v1/albums/album{i % 900}',
+            'external_urls': {'spotify': f'https://open.spotify.com/album/album{i % 900}'},
+            'available_markets': MARKETS, 'images': images('album', i % 900), 'artists': [artist],
+        },
+    }
+
+
+def api_pages(plays, distinct):
+    """Páginas de 50 reproduções serializadas como a API responde"""
+    start = int(time.time() * 1000)
+    for offset in range(0, plays, 50):
+        items = [
+            {
+                'played_at': time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime((start - i * 200000) / 1000)),
+                'track': api_track(i % distinct),
+                'context': None,
+            }
+            for i in range(offset, min(offset + 50, plays))
+        ]
+        yield json.dumps({'items': items})
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    value = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, size
+
+
+def main():
+    plays = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    distinct = int(sys.argv[2]) if len(sys.argv) > 2 else 2_000
+    pages = list(api_pages(plays, distinct))
+
+    def raw():
+        return [item for page in pages for item in json.loads(page)['items']]
+
+    def page_models():
+        # Como o app: um registry por página
+        plays = []
+        for page in pages:
+            registry = {}
+            plays.extend(Play.from_api(item, registry) for item in json.loads(page)['items'])
+        return plays
+
+    def shared_models():
+        registry = {}
+        return [Play.from_api(item, registry) for page in pages for item in json.loads(page)['items']]
+
+    raw_plays, raw_size = measure(raw)
+    page_plays, page_size = measure(page_models)
+    shared_plays, shared_size = measure(shared_models)
+    assert len(raw_plays) == len(page_plays) == len(shared_plays) == plays
+
+    print(f'{plays} reproduções, {distinct} músicas distintas')
+    print(f'JSON da API (dicts)              {raw_size / 2**20:8.1f} MiB  {raw_size / plays:8.0f} bytes/reprodução')
+    print(f'modelos, registry por página     {page_size / 2**20:8.1f} MiB  {page_size / plays:8.0f} bytes/reprodução'
+          f'  {raw_size / page_size:6.1f}x (app)')
+    print(f'modelos, registry único          {shared_size / 2**20:8.1f} MiB  {shared_size / plays:8.0f} bytes/reprodução'
+          f'  {raw_size / shared_size:6.1f}x (limite superior)')
+
+
+if __name__ == '__main__':
+    main()
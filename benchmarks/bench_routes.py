@@ -0,0 +1,127 @@
+"""Benchmark de carga por rota contra a API mock do Spotify, totalmente offline.
+
+Sobe a API mock (latência, jitter, 429 e erros configuráveis) e o app no modo
+escolhido, simula N usuários distintos navegando por todas as rotas em sequência
+e mostra, para cada rota, req/s, p50, p95, p99 e erros.
+
+Uso: python benchmarks/bench_routes.py [--users 50] [--rounds 5] [--mode sync|async|both]
+                                       [--latency 0.05] [--jitter 0.02] [--rate-429 0] [--error-rate 0]
+                                       [--routes /dashboard,/api/stats]
+"""
+import argparse
+import asyncio
+import time
+
+import aiohttp
+
+from harness import SERVERS, client_session, is_error, percentile, session_cookies, spawn, start_mock, wait_ready
+
+ROUTES = [
+    ('GET', '/dashboard'),
+    ('GET', '/stats'),
+    ('GET', '/top-tracks'),
+    ('GET', '/top-artists'),
+    ('GET', '/recent'),
+    ('GET', '/search?q=Música 1'),
+    ('GET', '/api/search/suggest?q=mus'),
+    ('GET', '/api/dashboard'),
+    ('GET', '/api/stats'),
+    ('GET', '/api/top-tracks'),
+    ('GET', '/api/top-artists'),
+    ('GET', '/api/recent'),
+    ('POST', '/api/toggle-playback'),
+    ('POST', '/api/next-track'),
+    ('POST', '/api/previous-track'),
+]
+
+
+async def run_users(base_url, routes, cookies, rounds):
+    """Cada usuário percorre todas as rotas `rounds` vezes; usuários rodam em paralelo"""
+    samples = {route: [] for route in routes}
+    errors = {route: 0 for route in routes}
+
+    async with client_session(base_url, len(cookies)) as client:
+        async def user(cookie):
+            headers = {'Cookie': f'session={cookie}'}
+            for _ in range(rounds):
+                for route in routes:
+                    method, path = route
+                    start = time.perf_counter()
+                    try:
+                        async with client.request(method, path, headers=headers, allow_redirects=False) as response:
+                            text = await response.text()
+                        if is_error(response.status, text):
+                            errors[route] += 1
+                    except (aiohttp.ClientError, asyncio.TimeoutError):
+                        errors[route] += 1
+                    samples[route].append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(user(cookie) for cookie in cookies))
+        elapsed = time.perf_counter() - start
+
+    report = []
+    for route in routes:
+        latencies = sorted(samples[route])
+        report.append({
+            'route': f'{route[0]} {route[1]}',
+            'requests': len(latencies),
+            # Tempo de parede é compartilhado: req/s de cada rota dentro do mix completo
+            'rps': len(latencies) / elapsed,
+            'p50': percentile(latencies, 0.50),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+            'errors': errors[route],
+        })
+    total = sum(row['requests'] for row in report)
+    return report, total / elapsed
+
+
+def print_report(name, report, total_rps):
+    print(f'\n{name}: {total_rps:.1f} req/s no total')
+    print(f'{"rota":<28} {"n":>6} {"req/s":>8} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"erros":>6}')
+    for row in report:
+        print(f'{row["route"]:<28} {row["requests"]:>6} {row["rps"]:>8.1f} {row["p50"]:>9.1f} '
+              f'{row["p95"]:>9.1f} {row["p99"]:>9.1f} {row["errors"]:>6}')
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--mode', choices=['sync', 'async', 'both'], default='both')
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--jitter', type=float, default=0.02)
+    parser.add_argument('--rate-429', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--routes', default='', help='lista de caminhos separados por vírgula (padrão: todas)')
+    parser.add_argument('--mock-port', type=int, default=8900)
+    args = parser.parse_args()
+
+    routes = ROUTES
+    if args.routes:
+        wanted = set(args.routes.split(','))
+        routes = [route for route in ROUTES if route[1] in wanted]
+    modes = ['sync', 'async'] if args.mode == 'both' else [args.mode]
+
+    mock, env = start_mock(args.mock_port, args.latency, args.jitter, args.rate_429, args.error_rate)
+    cookies = session_cookies(args.users)
+    print(f'{args.users} usuários x {args.rounds} rodadas x {len(routes)} rotas; API mock '
+          f'{args.latency * 1000:.0f}±{args.jitter * 1000:.0f} ms, 429={args.rate_429:.0%}, erros={args.error_rate:.0%}')
+    try:
+        for mode in modes:
+            name, command, port = SERVERS[mode]
+            process = spawn(command, env)
+            try:
+                await wait_ready(f'http://127.0.0.1:{port}/')
+                report, total_rps = await run_users(f'http://127.0.0.1:{port}', routes, cookies, args.rounds)
+            finally:
+                process.terminate()
+                process.wait()
+            print_report(name, report, total_rps)
+    finally:
+        mock.terminate()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
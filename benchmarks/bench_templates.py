@@ -0,0 +1,81 @@
+"""Tempo de renderização por rota: render_template_string (antes) x registro compilado (depois).
+
+Uso: python benchmarks/bench_templates.py [repetições]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from mock_spotify import start_mock_server  # noqa: E402
+
+# Contextos montados pelos loaders das rotas contra a API mock: acompanham as mudanças dos templates
+_mock, _prefix = start_mock_server(latency=0)
+os.environ['SPOTIFY_API_URL'] = _prefix
+os.environ.setdefault('HISTORY_DB', os.path.join(tempfile.mkdtemp(), 'bench.db'))
+os.environ.setdefault('LYRICS_DB', os.path.join(tempfile.mkdtemp(), 'lyrics.db'))
+os.environ.setdefault('SPOTIFY_USER_RATE', '0')
+os.environ.setdefault('SPOTIFY_APP_RATE', '0')
+
+import main as routes  # noqa: E402
+from flask import render_template_string, session  # noqa: E402
+from models import Track  # noqa: E402
+from paging import list_context  # noqa: E402
+from templates_registry import TEMPLATES, render_page  # noqa: E402
+
+app = routes.app
+TOKEN = {'access_token': 'bench', 'refresh_token': 'bench', 'expires_at': 4102444800}
+
+
+def listed(load, sp):
+    """Contexto de lista com só a primeira página (lista, não gerador: pode ser renderizado de novo)"""
+    first = routes.load_page(load, sp)
+    return list_context(first, [first])
+
+
+def contexts():
+    """{template: (caminho da requisição, contexto)} a partir dos loaders das rotas"""
+    loaders = {
+        'index.html': ('/', lambda sp: {}),
+        'dashboard.html': ('/dashboard', lambda sp: routes.load_page(routes.load_dashboard, sp)),
+        'stats.html': ('/stats', lambda sp: routes.load_page(routes.load_stats, sp)),
+        'top_artists.html': ('/top-artists', lambda sp: listed(routes.load_top_artists, sp)),
+        'top_tracks.html': ('/top-tracks', lambda sp: listed(routes.load_top_tracks, sp)),
+        'recent.html': ('/recent', lambda sp: listed(routes.load_recent, sp)),
+        'playlists.html': ('/playlists', lambda sp: routes.load_page(routes.load_playlists, sp)),
+        'playlist.html': ('/playlists/playlist1', lambda sp: listed(routes.load_playlist, sp)),
+        'search.html': ('/search?q=musica', lambda sp: {
+            'query': 'musica',
+            'tracks': [Track.from_api(t) for t in sp.search(q='musica', type='track', limit=15)['tracks']['items']],
+        }),
+    }
+    result = {}
+    for name, (path, load) in loaders.items():
+        with app.test_request_context(path):
+            session['token_info'] = TOKEN
+            result[name] = (path, load(routes.get_spotify_client()))
+    return result
+
+
+def measure(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print(f'{"template":<18} {"antes (µs)":>12} {"depois (µs)":>12} {"ganho":>7}')
+    for name, (path, context) in contexts().items():
+        with app.test_request_context(path):
+            source = TEMPLATES[name].environment.loader.get_source(app.jinja_env, name)[0]
+            before = measure(lambda: render_template_string(source, **context), repeat)
+            after = measure(lambda: render_page(name, **context), repeat)
+            print(f'{name:<18} {before:12.1f} {after:12.1f} {before / after:6.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Utilitários compartilhados pelos benchmarks de carga (servidores, sessões, percentis)."""
+import asyncio
+import math
+import os
+import subprocess
+import sys
+import time
+
+import aiohttp
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(HERE, '..', 'app')
+sys.path.insert(0, APP_DIR)
+
+# Os servidores medidos rodam em outro processo: sem Redis, sessões em cookie assinado
+# são o único jeito de o benchmark entregar sessões prontas a eles
+os.environ['SESSION_BACKEND'] = 'cookie'
+
+SYNC_SERVER = 'from main import app; app.run(host="127.0.0.1", port={port}, threaded=True)'
+SERVERS = {
+    'sync': ('sync (Flask)', [sys.executable, '-c', SYNC_SERVER.format(port=8901)], 8901),
+    'async': ('async (ASGI)', [sys.executable, '-m', 'uvicorn', 'asgi:app', '--port', '8902', '--log-level', 'warning'], 8902),
+}
+
+
+def session_cookies(n):
+    """Cookies de sessão válidos para n usuários fictícios"""
+    from main import app
+    serializer = app.session_interface.get_signing_serializer(app)
+    return [
+        serializer.dumps({
+            'token_info': {'access_token': f'tok{i}', 'refresh_token': f'ref{i}', 'expires_at': 4102444800},
+            'user_key': f'bench-user-{i}',
+        })
+        for i in range(n)
+    ]
+
+
+def start_mock(port, latency, jitter=0.0, rate_429=0.0, error_rate=0.0):
+    """Sobe a API mock num subprocesso e devolve (processo, variáveis de ambiente do app)"""
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(HERE, 'mock_spotify.py'), '--port', str(port),
+         '--latency', str(latency), '--jitter', str(jitter),
+         '--rate-429', str(rate_429), '--error-rate', str(error_rate)],
+        stdout=subprocess.DEVNULL,
+    )
+    return process, dict(os.environ, SPOTIFY_API_URL=f'http://127.0.0.1:{port}/v1/')
+
+
+def spawn(args, env):
+    return subprocess.Popen(args, cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def wait_ready(url, timeout=15):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as client:
+        while time.monotonic() < deadline:
+            try:
+                async with client.get(url):
+                    return
+            except aiohttp.ClientConnectionError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError(f'{url} não respondeu')
+
+
+def percentile(samples, fraction):
+    return samples[min(len(samples) - 1, math.ceil(len(samples) * fraction) - 1)]
+
+
+def client_session(base_url, concurrency):
+    return aiohttp.ClientSession(
+        base_url,
+        connector=aiohttp.TCPConnector(limit=concurrency),
+        timeout=aiohttp.ClientTimeout(total=60),
+        cookie_jar=aiohttp.DummyCookieJar(),
+    )
+
+
+def is_error(status, text):
+    """Respostas de erro do app: status HTTP, texto 'Erro ...' ou JSON com success false"""
+    return status >= 400 or text.startswith('Erro') or text.startswith('{"error"') or '"success":false' in text
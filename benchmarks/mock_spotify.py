@@ -0,0 +1,284 @@
+"""Servidor local que imita a Web API do Spotify para benchmarks offline.
+
+Implementado sobre asyncio para aguentar milhares de conexões simultâneas sem
+virar o gargalo das medições.
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+import unicodedata
+from urllib.parse import parse_qsl, urlparse
+
+
+def make_track(i):
+    return {
+        'id': f'track{i}',
+        'name': f'Música {i}',
+        'popularity': 50 + i % 50,
+        'duration_ms': 180000 + i * 1000,
+        'artists': [{'id': f'artist{i % 40}', 'name': f'Artista {i % 40}'}],
+        'album': {'id': f'album{i % 80}', 'name': f'Álbum {i % 80}', 'release_date': '2023-01-01'},
+        'external_urls': {'spotify': f'https://open.spotify.com/track/track{i}'},
+    }
+
+
+RANGE_SHIFT = {'short_term': 0, 'medium_term': 7, 'long_term': 19}
+
+
+def make_artist(i):
+    return {
+        'id': f'artist{i}',
+        'name': f'Artista {i}',
+        'popularity': 40 + i % 60,
+        'genres': ['pop', 'rock', 'mpb'][: 1 + i % 3],
+        'followers': {'total': 1000 * i},
+    }
+
+
+def make_play(i):
+    # Uma reprodução a cada 4 minutos, da mais recente para a mais antiga
+    played_at = PLAYS_START_MS - i * 240000
+    return {
+        'track': make_track(i % 500),
+        'played_at': time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime(played_at / 1000)),
+        '_ms': played_at,
+    }
+
+
+PLAYS_START_MS = int(time.time() * 1000)
+TOTAL_PLAYS = 2000
+PLAYS = [make_play(i) for i in range(TOTAL_PLAYS)]
+SEARCH_CATALOG = [make_track(i) for i in range(500)]
+TOTAL_PLAYLISTS = 120
+
+
+def playlist_size(i):
+    # Tamanhos variados: de uma página de itens a vários milhares de músicas
+    return 1 + (i * 37) % 400 if i % 10 else 2500 + i
+
+
+def make_playlist(i, version=0):
+    return {
+        'id': f'playlist{i}',
+        'name': f'Playlist {i}',
+        'snapshot_id': f'snap{i}-{version}',
+        'description': '',
+        'public': i % 2 == 0,
+        'collaborative': False,
+        'owner': {'id': 'mock-user', 'display_name': 'Mock'},
+        'images': [{'url': f'https://i.scdn.co/image/playlist{i}'}],
+        'tracks': {'total': playlist_size(i)},
+        'external_urls': {'spotify': f'https://open.spotify.com/playlist/playlist{i}'},
+    }
+
+
+def fold(text):
+    return ''.join(c for c in unicodedata.normalize('NFKD', text.casefold()) if not unicodedata.combining(c))
+
+
+def page(items, params, total=None):
+    limit = int(params.get('limit', 20))
+    offset = int(params.get('offset', 0))
+    return {'items': items[offset:offset + limit], 'limit': limit, 'offset': offset, 'total': total or len(items)}
+
+
+class MockSpotify:
+    """Servidor HTTP/1.1 keep-alive mínimo que imita os endpoints usados pelo app.
+
+    latency/jitter: atraso de cada resposta (segundos, jitter uniforme +-).
+    rate_429: fração das requisições respondidas com 429 e Retry-After.
+    error_rate: fração das requisições respondidas com 500.
+    """
+
+    def __init__(self, latency=0.05, jitter=0.0, rate_429=0.0, error_rate=0.0, retry_after=1, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.counts = {}
+        self.is_playing = True
+        self.current = 1
+        self.playlist_versions = [0] * TOTAL_PLAYLISTS
+        self.routes = {
+            ('GET', '/v1/me'): lambda p: {'id': 'mock-user', 'display_name': 'Mock', 'product': 'premium'},
+            ('GET', '/v1/me/player/currently-playing'): self.currently_playing,
+            ('GET', '/v1/me/player/devices'): lambda p: {'devices': [{'id': 'd1', 'name': 'PC', 'type': 'Computer', 'is_active': True, 'volume_percent': 50}]},
+            ('GET', '/v1/me/top/tracks'): lambda p: page([make_track(i + RANGE_SHIFT[p.get('time_range', 'medium_term')]) for i in range(50)], p),
+            ('GET', '/v1/me/top/artists'): lambda p: page([make_artist(i + RANGE_SHIFT[p.get('time_range', 'medium_term')]) for i in range(50)], p),
+            ('GET', '/v1/me/player/recently-played'): self.recently_played,
+            ('GET', '/v1/me/playlists'): lambda p: page([make_playlist(i, v) for i, v in enumerate(self.playlist_versions)], p),
+            ('GET', '/v1/search'): self.search,
+            ('GET', '/v1/artists'): lambda p: {'artists': [make_artist(int(i[6:])) for i in p['ids'].split(',')]},
+            ('GET', '/v1/tracks'): lambda p: {'tracks': [make_track(int(i[5:])) for i in p['ids'].split(',')]},
+            ('PUT', '/v1/me/player/play'): self.play,
+            ('PUT', '/v1/me/player/pause'): self.pause,
+            ('POST', '/v1/me/player/next'): lambda p: self.skip(1),
+            ('POST', '/v1/me/player/previous'): lambda p: self.skip(-1),
+        }
+
+    def currently_playing(self, params):
+        return {'is_playing': self.is_playing, 'progress_ms': 1000, 'item': make_track(self.current)}
+
+    def recently_played(self, params):
+        limit = min(int(params.get('limit', 20)), 50)
+        if 'after' in params:
+            plays = [p for p in PLAYS if p['_ms'] > int(params['after'])][-limit:]
+        elif 'before' in params:
+            plays = [p for p in PLAYS if p['_ms'] < int(params['before'])][:limit]
+        else:
+            plays = PLAYS[:limit]
+        items = [{k: v for k, v in p.items() if k != '_ms'} for p in plays]
+        cursors = {'after': str(plays[0]['_ms']), 'before': str(plays[-1]['_ms'])} if plays else None
+        return {'items': items, 'limit': limit, 'cursors': cursors}
+
+    def edit_playlist(self, i):
+        """Simula uma edição: a playlist ganha um snapshot_id novo"""
+        self.playlist_versions[i] += 1
+
+    def playlist_items(self, playlist_id, params):
+        i = int(playlist_id[8:])
+        added_at = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(PLAYS_START_MS / 1000 - i * 86400))
+        items = [{'added_at': added_at, 'track': make_track((i * 7 + n) % 500)} for n in range(playlist_size(i))]
+        return page(items, params)
+
+    def search(self, params):
+        # Como a API real, ignora caixa e acentos
+        q = fold(params.get('q', ''))
+        found = [t for t in SEARCH_CATALOG if q in fold(t['name']) or q in fold(t['artists'][0]['name'])]
+        return {'tracks': page(found, params)}
+
+    def play(self, params):
+        self.is_playing = True
+
+    def pause(self, params):
+        self.is_playing = False
+
+    def skip(self, step):
+        self.current = max(0, self.current + step)
+
+    def respond(self, method, path):
+        url = urlparse(path)
+        key = (method, url.path.rstrip('/'))
+        self.counts[key[1]] = self.counts.get(key[1], 0) + 1
+        route = self.routes.get(key)
+        parts = key[1].split('/')
+        if route is None and method == 'GET' and len(parts) == 5 and parts[2] == 'playlists' and parts[4] == 'tracks':
+            route = lambda p: self.playlist_items(parts[3], p)
+        if route is None:
+            return 404, {'error': {'status': 404, 'message': 'Not found'}}, {}
+        roll = self.random.random()
+        if roll < self.rate_429:
+            return 429, {'error': {'status': 429, 'message': 'API rate limit exceeded'}}, {'Retry-After': str(self.retry_after)}
+        if roll < self.rate_429 + self.error_rate:
+            return 500, {'error': {'status': 500, 'message': 'Server error'}}, {}
+        payload = route(dict(parse_qsl(url.query)))
+        return (200 if payload is not None else 204), payload, {}
+
+    def delay(self):
+        if not self.jitter:
+            return self.latency
+        return max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                length = 0
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    if name.strip().lower() == 'content-length':
+                        length = int(value.strip())
+                if length:
+                    await reader.readexactly(length)
+                self.requests += 1
+                await asyncio.sleep(self.delay())
+                status, payload, headers = self.respond(method, path)
+                body = json.dumps(payload).encode() if payload is not None else b''
+                extra = ''.join(f'{name}: {value}\r\n' for name, value in headers.items())
+                writer.write(
+                    f'HTTP/1.1 {status} X\r\nContent-Type: application/json\r\n{extra}'
+                    f'Content-Length: {len(body)}\r\n\r\n'.encode() + body
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            try:
+                writer.close()
+            except RuntimeError:
+                pass  # event loop já encerrado junto com o processo
+
+    async def serve(self, port=0, ready=None):
+        server = await asyncio.start_server(self.handle, '127.0.0.1', port, backlog=4096)
+        if ready is not None:
+            ready(server.sockets[0].getsockname()[1])
+        async with server:
+            await server.serve_forever()
+
+
+class MockServerThread:
+    """Mock rodando no event loop de uma thread própria (uso dentro de outro processo)"""
+
+    def __init__(self, mock, port=0):
+        self.mock = mock
+        self.port = None
+        self._ready = threading.Event()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, args=(port,), daemon=True)
+
+    def _run(self, port):
+        asyncio.set_event_loop(self._loop)
+        self._task = self._loop.create_task(self.mock.serve(port, self._on_ready))
+        try:
+            self._loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+
+    def _on_ready(self, port):
+        self.port = port
+        self._ready.set()
+
+    def start(self):
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def shutdown(self):
+        self._loop.call_soon_threadsafe(self._task.cancel)
+        self._thread.join(timeout=5)
+
+
+def start_mock_server(latency=0.05, port=0, **options):
+    """Sobe o servidor numa thread e devolve (servidor, prefixo da API)"""
+    server = MockServerThread(MockSpotify(latency=latency, **options), port).start()
+    return server, f'http://127.0.0.1:{server.port}/v1/'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--rate-429', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+    mock = MockSpotify(
+        latency=args.latency, jitter=args.jitter, rate_429=args.rate_429,
+        error_rate=args.error_rate, retry_after=args.retry_after, seed=args.seed,
+    )
+    print(f'mock Spotify API em http://127.0.0.1:{args.port}/v1/', flush=True)
+    asyncio.run(mock.serve(args.port))
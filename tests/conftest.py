@@ -0,0 +1,34 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Os módulos do app são importados pelo nome, como no main.py
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+# Bancos do app (importado pelos testes de rota) fora da árvore do projeto
+_data_dir = tempfile.mkdtemp(prefix='spotify-app-tests-')
+os.environ.setdefault('HISTORY_DB', os.path.join(_data_dir, 'history.db'))
+os.environ.setdefault('LYRICS_DB', os.path.join(_data_dir, 'lyrics.db'))
+
+
+class Clock:
+    """Relógio controlado pelo teste no lugar de time.monotonic"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    import time
+    fake = Clock()
+    monkeypatch.setattr(time, 'monotonic', fake)
+    return fake
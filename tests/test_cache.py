@@ -0,0 +1,118 @@
+import pytest
+
+from cache import CachedSpotify, FakeRedis, MemoryBackend, RedisBackend, ResponseCache, create_backend, redis_client_from_env
+from sessions import MemorySessionStore, RedisSessionStore, create_session_interface
+from tokens import MemoryTokenStore, RedisTokenStore, create_token_store
+
+
+class FakeSpotify:
+    """Cliente com a interface do spotipy que conta as chamadas"""
+
+    def __init__(self):
+        self.calls = []
+
+    def current_user_top_tracks(self, limit=20, time_range='medium_term'):
+        self.calls.append(('current_user_top_tracks', limit, time_range))
+        return {'items': [{'id': f'track{i}'} for i in range(limit)]}
+
+    def current_user_playing_track(self):
+        self.calls.append(('current_user_playing_track',))
+        return None
+
+    def next_track(self):
+        self.calls.append(('next_track',))
+
+
+@pytest.fixture(params=['memory', 'fake-redis'])
+def backend(request, clock):
+    return MemoryBackend() if request.param == 'memory' else RedisBackend(FakeRedis())
+
+
+def test_miss_then_hit(backend):
+    cache = ResponseCache(backend)
+    client = FakeSpotify()
+    sp = CachedSpotify(client, cache, 'user')
+
+    first = sp.current_user_top_tracks(limit=5)
+    second = sp.current_user_top_tracks(limit=5)
+
+    assert first == second
+    assert len(client.calls) == 1
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_arguments_and_users_have_separate_entries(backend):
+    cache = ResponseCache(backend)
+    client = FakeSpotify()
+
+    CachedSpotify(client, cache, 'user').current_user_top_tracks(limit=5)
+    CachedSpotify(client, cache, 'user').current_user_top_tracks(limit=10)
+    CachedSpotify(client, cache, 'other').current_user_top_tracks(limit=5)
+
+    assert len(client.calls) == 3
+
+
+def test_entry_expires_after_ttl(backend, clock):
+    cache = ResponseCache(backend)
+    client = FakeSpotify()
+    sp = CachedSpotify(client, cache, 'user', ttls={'current_user_top_tracks': 60})
+
+    sp.current_user_top_tracks()
+    clock.advance(59)
+    sp.current_user_top_tracks()
+    assert len(client.calls) == 1
+
+    clock.advance(2)
+    sp.current_user_top_tracks()
+    assert len(client.calls) == 2
+
+
+def test_empty_responses_are_not_cached(backend):
+    client = FakeSpotify()
+    sp = CachedSpotify(client, ResponseCache(backend), 'user')
+
+    sp.current_user_playing_track()
+    sp.current_user_playing_track()
+
+    assert len(client.calls) == 2
+
+
+def test_playback_command_invalidates_player_state(backend):
+    cache = ResponseCache(backend)
+    client = FakeSpotify()
+    sp = CachedSpotify(client, cache, 'user', ttls={'current_user_top_tracks': 60, 'current_user_playing_track': 60})
+    client.current_user_playing_track = lambda: client.calls.append(('playing',)) or {'is_playing': True}
+
+    sp.current_user_playing_track()
+    sp.current_user_top_tracks()
+    sp.next_track()
+    sp.current_user_playing_track()
+    sp.current_user_top_tracks()
+
+    assert client.calls.count(('playing',)) == 2
+    assert client.calls.count(('current_user_top_tracks', 20, 'medium_term')) == 1
+
+
+def test_memory_backend_evicts_least_recently_used(clock):
+    backend = MemoryBackend(max_entries=2)
+    backend.set('a', 1, 60)
+    backend.set('b', 2, 60)
+    backend.get('a')
+    backend.set('c', 3, 60)
+
+    assert backend.get('a') == 1
+    assert backend.get('b') is None
+    assert backend.get('c') == 3
+
+
+@pytest.mark.parametrize('kind, client', [('memory', type(None)), ('fake-redis', FakeRedis)])
+def test_backends_share_one_redis_factory(monkeypatch, kind, client):
+    for variable in ('CACHE_BACKEND', 'TOKEN_BACKEND', 'SESSION_BACKEND'):
+        monkeypatch.setenv(variable, kind)
+
+    assert isinstance(redis_client_from_env('CACHE_BACKEND'), client)
+    redis = kind != 'memory'
+    assert isinstance(create_backend(), RedisBackend if redis else MemoryBackend)
+    assert isinstance(create_token_store(), RedisTokenStore if redis else MemoryTokenStore)
+    assert isinstance(create_session_interface().store, RedisSessionStore if redis else MemorySessionStore)
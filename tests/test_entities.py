@@ -0,0 +1,43 @@
+import asyncio
+
+from entities import EntityCache
+
+
+class SlowArtists:
+    async def artists(self, ids):
+        await asyncio.sleep(10)
+
+
+class Artists:
+    def __init__(self):
+        self.calls = []
+
+    async def artists(self, ids):
+        self.calls.append(list(ids))
+        return {'artists': [{'id': i, 'name': f'Artista {i}'} for i in ids]}
+
+
+def test_missing_ids_are_fetched_once_in_batches():
+    cache = EntityCache()
+    client = Artists()
+
+    async def scenario():
+        await cache.get_many_async('artist', [f'a{i}' for i in range(60)], client)
+        return await cache.get_many_async('artist', ['a1', 'a59'], client)
+
+    found = asyncio.run(scenario())
+    assert sorted(found) == ['a1', 'a59']
+    assert [len(ids) for ids in client.calls] == [50, 10]
+
+
+def test_cancelled_fetch_releases_claimed_ids():
+    cache = EntityCache()
+
+    async def scenario():
+        task = asyncio.ensure_future(cache.get_many_async('artist', ['a1', 'a2'], SlowArtists()))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return await asyncio.wait_for(cache.get_many_async('artist', ['a1'], Artists()), 1)
+
+    assert list(asyncio.run(scenario())) == ['a1']
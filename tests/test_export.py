@@ -0,0 +1,143 @@
+import gzip
+import json
+import random
+import time
+
+import pytest
+
+from export import SECTIONS, LibraryExporter, columnar_blocks, columnar_stream, ndjson_stream, parse_sections
+from history import HistoryStore
+from paging import TIME_RANGES
+from playlists import PlaylistStore
+
+START_MS = 1_700_000_000_000
+
+
+def track(i, prefix='track'):
+    return {'id': f'{prefix}{i}', 'name': f'Música {i}', 'artists': [{'id': 'a', 'name': 'Artista'}], 'album': {'name': 'Álbum'}}
+
+
+class FakeSpotify:
+    """Tops, histórico e playlists; cada página demora um tempo aleatório para embaralhar o paralelismo"""
+
+    def __init__(self, tops=120, plays=10, playlists=None, fail=()):
+        self.tops = tops
+        self.plays = plays
+        self.playlists = playlists or {'p1': 3, 'p2': 2}
+        self.fail = set(fail)
+
+    def _call(self, name):
+        time.sleep(random.random() * 0.005)
+        if name in self.fail:
+            raise RuntimeError(f'{name} indisponível')
+
+    def current_user_top_tracks(self, limit, offset, time_range):
+        self._call('top_tracks')
+        ids = range(offset, min(offset + limit, self.tops))
+        return {'items': [track(i, f'{time_range}-') for i in ids], 'total': self.tops}
+
+    def current_user_top_artists(self, limit, offset, time_range):
+        self._call('top_artists')
+        ids = range(offset, min(offset + limit, self.tops))
+        return {'items': [{'id': f'{time_range}-{i}', 'name': f'Artista {i}', 'genres': ['mpb']} for i in ids], 'total': self.tops}
+
+    def current_user_recently_played(self, limit, after=None):
+        self._call('recent')
+        items = [
+            {'played_at': time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime(START_MS / 1000 + i * 60)), 'track': track(i)}
+            for i in reversed(range(self.plays))
+        ]
+        if after is not None:
+            items = []
+        return {'items': items[:limit]}
+
+    def current_user_playlists(self, limit, offset):
+        self._call('playlists')
+        items = [
+            {'id': pid, 'name': pid, 'snapshot_id': f'{pid}-1', 'tracks': {'total': size}}
+            for pid, size in self.playlists.items()
+        ]
+        return {'items': items[offset:offset + limit], 'total': len(items)}
+
+    def playlist_items(self, playlist_id, fields, limit, offset, additional_types):
+        self._call(playlist_id)
+        size = self.playlists[playlist_id]
+        items = [{'added_at': None, 'track': track(i)} for i in range(offset, min(offset + limit, size))]
+        return {'items': items, 'total': size}
+
+
+@pytest.fixture
+def exporter(tmp_path):
+    return LibraryExporter(HistoryStore(str(tmp_path / 'history.db')), PlaylistStore(str(tmp_path / 'playlists.db')))
+
+
+def ndjson_lines(exporter, sp, sections=SECTIONS):
+    body = b''.join(ndjson_stream(exporter.records('user', sp, sections)))
+    return [json.loads(line) for line in body.decode().splitlines()]
+
+
+def test_ndjson_lines_come_in_a_stable_order(exporter):
+    lines = ndjson_lines(exporter, FakeSpotify())
+
+    assert lines[0]['type'] == 'export' and lines[0]['sections'] == list(SECTIONS)
+    types = [line['type'] for line in lines[1:]]
+    # Seções na ordem de SECTIONS, cada uma contígua
+    assert list(dict.fromkeys(types)) == ['top_tracks', 'top_artists', 'recent', 'playlists', 'playlist_items']
+
+    # Páginas buscadas em paralelo, escritas na ordem: período a período, rank a rank
+    for section in ('top_tracks', 'top_artists'):
+        ranks = [(line['time_range'], line['rank']) for line in lines if line['type'] == section]
+        assert ranks == [(time_range, rank) for time_range in TIME_RANGES for rank in range(1, 121)]
+
+    recent = [line['played_at'] for line in lines if line['type'] == 'recent']
+    assert len(recent) == 10 and recent == sorted(recent, reverse=True)
+    items = [(line['playlist_id'], line['position']) for line in lines if line['type'] == 'playlist_items']
+    assert items == [('p1', 0), ('p1', 1), ('p1', 2), ('p2', 0), ('p2', 1)]
+
+
+def test_failed_section_becomes_an_error_record(exporter):
+    lines = ndjson_lines(exporter, FakeSpotify(fail={'top_artists'}), ('top_tracks', 'top_artists', 'recent'))
+
+    errors = [line for line in lines if line['type'] == 'errors']
+    assert errors == [{'type': 'errors', 'section': 'top_artists', 'error': 'top_artists indisponível'}]
+    # As outras seções saem inteiras, antes e depois do erro
+    assert sum(line['type'] == 'top_tracks' for line in lines) == 360
+    assert sum(line['type'] == 'recent' for line in lines) == 10
+
+
+def test_failed_playlist_does_not_stop_the_others(exporter):
+    lines = ndjson_lines(exporter, FakeSpotify(fail={'p1'}), ('playlists',))
+
+    errors = [line for line in lines if line['type'] == 'errors']
+    assert [(line['section'], line['playlist_id']) for line in errors] == [('playlists', 'p1')]
+    assert [line['playlist_id'] for line in lines if line['type'] == 'playlist_items'] == ['p2', 'p2']
+
+
+def test_columnar_blocks_hold_one_section_with_equal_columns():
+    records = [('a', {'x': i}) for i in range(5)] + [('b', {'x': 1, 'y': 'só em b'}), ('b', {'z': True})]
+
+    blocks = [json.loads(block) for block in columnar_blocks(records, batch=2)]
+
+    assert [(block['section'], block['rows']) for block in blocks] == [('a', 2), ('a', 2), ('a', 1), ('b', 2)]
+    assert blocks[0]['columns'] == {'x': [0, 1]}
+    # Campos que faltam numa linha ficam None: toda coluna tem uma posição por linha
+    assert blocks[-1]['columns'] == {'x': [1, None], 'y': ['só em b', None], 'z': [None, True]}
+
+
+def test_columnar_export_is_gzip_of_json_blocks(exporter):
+    body = gzip.decompress(b''.join(columnar_stream(exporter.records('user', FakeSpotify(), ('top_tracks', 'recent')))))
+    blocks = [json.loads(line) for line in body.decode().splitlines()]
+
+    assert blocks[0]['section'] == 'export'
+    top = [block for block in blocks if block['section'] == 'top_tracks']
+    assert sum(block['rows'] for block in top) == 360
+    for block in blocks:
+        assert all(len(values) == block['rows'] for values in block['columns'].values())
+    assert top[0]['columns']['rank'][:3] == [1, 2, 3]
+
+
+def test_sections_are_validated_and_kept_in_order():
+    assert parse_sections(None) == SECTIONS
+    assert parse_sections('recent, top_tracks') == ('top_tracks', 'recent')
+    with pytest.raises(ValueError):
+        parse_sections('recent,likes')
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from fanout import Blocking, ClientCall, SpotifyCall, run_steps, run_steps_async
+
+
+class SyncSpotify:
+    def current_user(self):
+        return {'id': 'user'}
+
+    def devices(self):
+        raise RuntimeError('sem dispositivos')
+
+
+class AsyncSpotify:
+    async def current_user(self):
+        return {'id': 'user'}
+
+    async def devices(self):
+        raise RuntimeError('sem dispositivos')
+
+
+class Store:
+    def __init__(self):
+        self.calls = []
+
+    def refresh(self, user_key, sp):
+        self.calls.append(('refresh', user_key))
+
+    async def refresh_async(self, user_key, sp):
+        self.calls.append(('refresh_async', user_key))
+
+
+def loader(store, log):
+    yield ClientCall(store, 'refresh', 'user')
+    results = yield {'profile': SpotifyCall('current_user'), 'devices': SpotifyCall('devices')}
+    # Falha isolada no fan-out: None no resultado; falha de um passo único volta para o loader
+    try:
+        yield SpotifyCall('devices')
+    except RuntimeError as e:
+        log.append(str(e))
+    count = yield Blocking(len, results)
+    return results, count
+
+
+def test_sync_and_async_drivers_run_the_same_loader():
+    sync_store, async_store, log = Store(), Store(), []
+
+    sync = run_steps(loader(sync_store, log), SyncSpotify())
+    result = asyncio.run(run_steps_async(loader(async_store, log), AsyncSpotify()))
+
+    assert sync == result == ({'profile': {'id': 'user'}, 'devices': None}, 2)
+    assert sync_store.calls == [('refresh', 'user')]
+    assert async_store.calls == [('refresh_async', 'user')]
+    assert log == ['sem dispositivos'] * 2
+
+
+def test_unhandled_step_errors_reach_the_caller():
+    def failing():
+        yield SpotifyCall('devices')
+
+    with pytest.raises(RuntimeError):
+        run_steps(failing(), SyncSpotify())
@@ -0,0 +1,89 @@
+import time
+
+from history import SYNC_BATCH, HistoryStore
+
+START_MS = 1_700_000_000_000
+
+
+def play(i):
+    """Reprodução i, uma a cada minuto"""
+    ms = START_MS + i * 60000
+    return {
+        'played_at': time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime(ms / 1000)),
+        'track': {'id': f'track{i % 7}', 'name': f'Música {i % 7}', 'artists': [{'id': 'a', 'name': 'Artista'}], 'album': {}},
+        '_ms': ms,
+    }
+
+
+class FakeSpotify:
+    """recently-played como o da API: after devolve as mais antigas depois do cursor, da mais nova para a mais velha"""
+
+    def __init__(self, count):
+        self.plays = [play(i) for i in reversed(range(count))]
+        self.calls = []
+
+    def add(self, count):
+        first = len(self.plays)
+        self.plays[:0] = [play(i) for i in reversed(range(first, first + count))]
+
+    def current_user_recently_played(self, limit, after=None):
+        self.calls.append(after)
+        if after is not None:
+            plays = [p for p in self.plays if p['_ms'] > after][-limit:]
+        else:
+            plays = self.plays[:limit]
+        return {'items': [{k: v for k, v in p.items() if k != '_ms'} for p in plays]}
+
+
+def test_first_sync_takes_the_recent_window(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.db'))
+    sp = FakeSpotify(80)
+
+    assert store.sync('user', sp) == SYNC_BATCH
+    assert sp.calls == [None]
+    assert store.state('user')[0] == START_MS + 79 * 60000
+
+
+def test_later_syncs_ask_only_for_plays_after_the_cursor(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.db'))
+    sp = FakeSpotify(10)
+    store.sync('user', sp)
+    cursor = store.state('user')[0]
+
+    sp.calls.clear()
+    assert store.sync('user', sp) == 0
+    assert sp.calls == [cursor]
+
+    # Mais reproduções do que cabem numa página: segue o cursor até alcançar a mais recente
+    sp.add(120)
+    sp.calls.clear()
+    assert store.sync('user', sp) == 120
+    assert sp.calls[0] == cursor and len(sp.calls) == 3
+    assert store.state('user')[0] == START_MS + 129 * 60000
+
+
+def test_keyset_pages_cover_the_history_without_gaps(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.db'))
+    sp = FakeSpotify(10)
+    store.sync('user', sp)
+    sp.add(65)
+    store.sync('user', sp)
+
+    seen, before = [], None
+    while True:
+        items, before = store.page('user', before, limit=20)
+        seen.extend(item.played_at for item in items)
+        if before is None:
+            break
+
+    expected = [p['played_at'] for p in sp.plays]
+    assert seen == expected
+    assert len(seen) == 75
+
+
+def test_pages_are_per_user(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.db'))
+    store.sync('a', FakeSpotify(5))
+
+    assert store.page('b') == ([], None)
+    assert len(store.page('a')[0]) == 5
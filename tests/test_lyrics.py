@@ -0,0 +1,167 @@
+import time
+
+import pytest
+
+import lyrics
+from lyrics import HttpLyricsProvider, LocalLyricsProvider, LyricsCache, lyrics_key
+
+
+class CountingProvider:
+    """Provedor em memória que conta as buscas"""
+
+    def __init__(self, lyrics):
+        self.lyrics = {lyrics_key(track, artist): text for (track, artist), text in lyrics.items()}
+        self.calls = 0
+
+    def fetch(self, track, artist):
+        self.calls += 1
+        return self.lyrics.get(lyrics_key(track, artist))
+
+
+@pytest.fixture
+def now(monkeypatch):
+    """Relógio de parede controlado (o cache de letras usa time.time, persistido no SQLite)"""
+    current = [1_000_000.0]
+    monkeypatch.setattr(time, 'time', lambda: current[0])
+    return current
+
+
+def song(i):
+    return (f'Song {i}', f'Band {i}')
+
+
+def text(i):
+    # Conteúdo pouco compressível: o tamanho em disco fica previsível
+    return ''.join(chr(0x4e00 + (i * 7919 + j * 104729) % 20000) for j in range(300))
+
+
+def test_key_ignores_case_accents_and_versions():
+    assert lyrics_key('Águas de Março (Ao Vivo) - Remastered 2011', 'ELIS REGINA') == lyrics_key('aguas de marco', 'Elis Regina')
+
+
+def test_hit_is_served_without_provider(tmp_path):
+    provider = CountingProvider({song(1): text(1)})
+    cache = LyricsCache(provider, str(tmp_path / 'lyrics.db'))
+
+    assert cache.get(*song(1)) == (text(1), 'provider')
+    assert cache.get('song 1 (live)', 'band 1') == (text(1), 'cache')
+    assert provider.calls == 1
+
+
+def test_miss_is_cached_until_ttl(tmp_path, now):
+    provider = CountingProvider({})
+    cache = LyricsCache(provider, str(tmp_path / 'lyrics.db'), miss_ttl=60)
+
+    assert cache.get(*song(1)) == (None, 'provider')
+    assert cache.get(*song(1)) == (None, 'cache')
+    assert provider.calls == 1
+
+    now[0] += 61
+    assert cache.get(*song(1)) == (None, 'provider')
+    assert provider.calls == 2
+
+
+def test_budget_evicts_least_recently_used(tmp_path, now):
+    provider = CountingProvider({song(i): text(i) for i in range(4)})
+    probe = LyricsCache(CountingProvider({song(0): text(0)}), str(tmp_path / 'probe.db'))
+    probe.get(*song(0))
+    # Cabem três letras
+    cache = LyricsCache(provider, str(tmp_path / 'lyrics.db'), max_bytes=probe.bytes * 3 + 10)
+
+    for i in range(3):
+        cache.get(*song(i))
+        now[0] += 120
+    cache.get(*song(0))  # song 0 volta a ser a mais recente
+    now[0] += 120
+    cache.get(*song(3))
+
+    assert cache.stats()['evictions'] == 1
+    assert cache.bytes <= cache.max_bytes
+    assert cache.get(*song(0))[1] == 'cache'
+    assert cache.get(*song(1))[1] == 'provider'
+
+
+def test_oversized_lyrics_are_not_stored(tmp_path):
+    provider = CountingProvider({song(1): text(1)})
+    cache = LyricsCache(provider, str(tmp_path / 'lyrics.db'), max_bytes=100)
+
+    assert cache.get(*song(1)) == (text(1), 'provider')
+    assert cache.bytes == 0
+
+
+def test_cache_persists_across_restarts(tmp_path):
+    path = str(tmp_path / 'lyrics.db')
+    LyricsCache(CountingProvider({song(1): text(1)}), path).get(*song(1))
+
+    provider = CountingProvider({})
+    cache = LyricsCache(provider, path)
+    assert cache.get(*song(1)) == (text(1), 'cache')
+    assert cache.bytes > 0
+    assert provider.calls == 0
+
+
+def test_local_provider_reads_artist_title_files(tmp_path):
+    (tmp_path / 'Louis Armstrong - When The Saints.txt').write_text('Oh when the saints', encoding='utf-8')
+    provider = LocalLyricsProvider(str(tmp_path))
+
+    assert provider.fetch('When the Saints (Live)', 'louis armstrong') == 'Oh when the saints'
+    assert provider.fetch('Other', 'Louis Armstrong') is None
+
+
+def test_http_provider_uses_timeout():
+    class Response:
+        status_code = 200
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {'lyrics': ' la la \n'}
+
+    class Session:
+        def get(self, url, timeout=None):
+            self.url, self.timeout = url, timeout
+            return Response()
+
+    session = Session()
+    provider = HttpLyricsProvider('https://lyrics.test/{artist}/{track}', session=session, timeout=3)
+
+    assert provider.fetch('Águas (Ao Vivo)', 'Elis Regina') == 'la la'
+    assert session.url == 'https://lyrics.test/Elis%20Regina/%C3%81guas'
+    assert session.timeout == 3
+
+
+def test_workers_sharing_the_file_see_the_same_size_and_budget(tmp_path, now):
+    path = str(tmp_path / 'lyrics.db')
+    provider = CountingProvider({song(i): text(i) for i in range(3)})
+    probe = LyricsCache(CountingProvider({song(0): text(0)}), str(tmp_path / 'probe.db'))
+    probe.get(*song(0))
+    # Dois workers, cada um com seu LyricsCache, sobre o mesmo arquivo; cabem duas letras
+    first = LyricsCache(provider, path, max_bytes=probe.bytes * 2 + 10)
+    second = LyricsCache(provider, path, max_bytes=probe.bytes * 2 + 10)
+
+    first.get(*song(0))
+    now[0] += 120
+    second.get(*song(1))
+    now[0] += 120
+    first.get(*song(2))
+
+    assert first.bytes == second.bytes <= first.max_bytes
+    assert second.get(*song(0))[1] == 'provider'
+
+
+def test_default_provider_follows_the_lyrics_directory(monkeypatch, tmp_path):
+    monkeypatch.delenv('LYRICS_PROVIDER', raising=False)
+    monkeypatch.setattr(lyrics, 'LYRICS_DIR', str(tmp_path / 'missing'))
+    assert isinstance(lyrics.create_lyrics_provider(), HttpLyricsProvider)
+
+    monkeypatch.setattr(lyrics, 'LYRICS_DIR', str(tmp_path))
+    assert isinstance(lyrics.create_lyrics_provider(), LocalLyricsProvider)
+
+
+def test_local_provider_without_directory_fails_loudly(monkeypatch, tmp_path):
+    monkeypatch.setenv('LYRICS_PROVIDER', 'local')
+    monkeypatch.setattr(lyrics, 'LYRICS_DIR', str(tmp_path / 'missing'))
+
+    with pytest.raises(RuntimeError, match='missing'):
+        lyrics.create_lyrics_provider()
@@ -0,0 +1,154 @@
+import threading
+import time
+
+import pytest
+
+from playback import CommandBatch, PlaybackPipeline
+
+
+class FakeHub:
+    def __init__(self):
+        self.published = []
+        self.pokes = 0
+        self.changed = threading.Condition()
+
+    def state(self, user_key):
+        return None
+
+    def publish(self, user_key, state):
+        with self.changed:
+            self.published.append(state)
+            self.changed.notify_all()
+
+    def poke(self, user_key):
+        self.pokes += 1
+
+    def wait_for(self, predicate, timeout=2):
+        with self.changed:
+            assert self.changed.wait_for(lambda: any(predicate(state) for state in self.published), timeout)
+
+
+class FakeSpotify:
+    """Player que registra os comandos; o envio pode ser segurado pelo teste"""
+
+    def __init__(self, fail=None):
+        self.commands = []
+        self.fail = fail
+        self.release = threading.Event()
+        self.release.set()
+        self.track = 1
+        self.playing = True
+
+    def _send(self, name):
+        self.release.wait(2)
+        if name == self.fail:
+            raise RuntimeError('dispositivo indisponível')
+        self.commands.append(name)
+
+    def next_track(self):
+        self._send('next')
+        self.track += 1
+
+    def previous_track(self):
+        self._send('previous')
+        self.track -= 1
+
+    def start_playback(self):
+        self._send('play')
+        self.playing = True
+
+    def pause_playback(self):
+        self._send('pause')
+        self.playing = False
+
+    def current_user_playing_track(self):
+        return {
+            'is_playing': self.playing, 'progress_ms': 0,
+            'item': {'id': f'track{self.track}', 'name': f'Música {self.track}', 'duration_ms': 1000,
+                     'artists': [{'id': 'a', 'name': 'Artista'}], 'album': {'name': 'Álbum'}},
+        }
+
+
+def batch_calls(playing, *commands):
+    batch = CommandBatch(playing)
+    for command in commands:
+        batch.add(command)
+    return [call.__name__ for call in batch.calls(FakeSpotify())]
+
+
+@pytest.mark.parametrize('playing, commands, calls', [
+    (True, ['next', 'next', 'next'], ['next_track'] * 3),
+    (True, ['next', 'previous'], []),
+    (True, ['next', 'next', 'previous'], ['next_track']),
+    (True, ['previous', 'previous', 'next'], ['previous_track']),
+    (True, ['toggle', 'toggle'], []),
+    (False, ['toggle'], ['start_playback']),
+    # Trocar de música volta a tocar: não precisa de play
+    (False, ['next'], ['next_track']),
+    (True, ['next', 'toggle'], ['next_track', 'pause_playback']),
+    # Avançar e voltar estando pausado: as trocas se anulam, mas o player volta a tocar
+    (False, ['next', 'previous'], ['start_playback']),
+])
+def test_clicks_are_netted_into_one_batch(playing, commands, calls):
+    assert batch_calls(playing, *commands) == calls
+
+
+def test_submit_answers_optimistically_before_the_upstream_call():
+    hub, sp = FakeHub(), FakeSpotify()
+    sp.release.clear()
+    pipeline = PlaybackPipeline(hub, reconcile_delay=0.01)
+
+    future, state = pipeline.submit('user', 'toggle', lambda: sp, {'is_playing': True, 'track': None})
+
+    assert state == {'track': None, 'is_playing': False, 'pending': True}
+    assert not future.done()
+    # Play/pause já aparece nas abas; a troca de música espera o estado real
+    assert hub.published == [state]
+    sp.release.set()
+    assert future.result(2) == 1
+    assert sp.commands == ['pause']
+
+
+def test_clicks_during_a_batch_are_combined_into_the_next():
+    hub, sp = FakeHub(), FakeSpotify()
+    sp.release.clear()
+    pipeline = PlaybackPipeline(hub, reconcile_delay=0.01)
+
+    first, _ = pipeline.submit('user', 'next', lambda: sp, {'is_playing': True})
+    time.sleep(0.05)  # o primeiro lote já está sendo enviado
+    futures = [pipeline.submit('user', command, lambda: sp, {})[0] for command in ('next', 'next', 'previous')]
+    _, state = pipeline.submit('user', 'next', lambda: sp, {})
+
+    assert state['skip'] == 2 and state['pending']
+    sp.release.set()
+    first.result(2)
+    assert all(future.result(2) == 2 for future in futures)
+    assert sp.commands == ['next', 'next', 'next']
+    assert pipeline.stats()['saved_calls'] == 2
+
+
+def test_real_state_is_published_after_the_batch():
+    hub, sp = FakeHub(), FakeSpotify()
+    pipeline = PlaybackPipeline(hub, reconcile_delay=0.01)
+
+    pipeline.submit('user', 'next', lambda: sp, {'is_playing': True})
+
+    hub.wait_for(lambda state: not state.get('pending'))
+    reconciled = hub.published[-1]
+    assert reconciled['track']['id'] == 'track2' and reconciled['is_playing']
+    assert pipeline.known_state('user') == reconciled
+
+
+def test_failed_batch_reverts_the_tabs_with_an_error():
+    hub, sp = FakeHub(), FakeSpotify(fail='pause')
+    pipeline = PlaybackPipeline(hub, reconcile_delay=0.01)
+
+    future, state = pipeline.submit('user', 'toggle', lambda: sp, {'is_playing': True})
+
+    assert state['is_playing'] is False
+    with pytest.raises(RuntimeError):
+        future.result(2)
+    hub.wait_for(lambda state: 'error' in state)
+    failure = hub.published[-1]
+    assert failure['is_playing'] is True and 'dispositivo indisponível' in failure['error']
+    assert pipeline.stats()['errors'] == 1
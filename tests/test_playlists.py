@@ -0,0 +1,75 @@
+import threading
+import time
+
+from playlists import PlaylistStore
+
+
+def track(i):
+    return {'id': f'track{i}', 'name': f'Música {i}', 'artists': [{'id': 'a', 'name': 'Artista'}], 'album': {}}
+
+
+class FakeSpotify:
+    """Playlists com snapshot_id controlado pelo teste; conta as páginas de itens pedidas"""
+
+    def __init__(self, sizes):
+        self.sizes = sizes
+        self.versions = dict.fromkeys(sizes, 0)
+        self.item_calls = []
+        self.item_threads = set()
+
+    def current_user_playlists(self, limit, offset):
+        items = [
+            {'id': pid, 'name': pid, 'snapshot_id': f'{pid}-{self.versions[pid]}', 'tracks': {'total': size}}
+            for pid, size in self.sizes.items()
+        ]
+        return {'items': items[offset:offset + limit], 'total': len(items)}
+
+    def playlist_items(self, playlist_id, fields, limit, offset, additional_types):
+        self.item_calls.append((playlist_id, offset))
+        self.item_threads.add(threading.current_thread().name)
+        size = self.sizes[playlist_id]
+        items = [{'added_at': None, 'track': track(i)} for i in range(offset, min(offset + limit, size))]
+        return {'items': items, 'total': size}
+
+
+def test_unchanged_snapshot_is_not_fetched_again(tmp_path):
+    store = PlaylistStore(path=str(tmp_path / 'playlists.db'))
+    sp = FakeSpotify({'p1': 150, 'p2': 3})
+
+    assert store.sync('user', sp) == 2
+    assert sorted(sp.item_calls) == [('p1', 0), ('p1', 100), ('p2', 0)]
+
+    sp.item_calls.clear()
+    assert store.sync('user', sp) == 0
+    assert sp.item_calls == []
+    assert store.stats()['playlists_skipped'] == 2
+
+    # Só a playlist com snapshot_id novo é baixada de novo
+    sp.versions['p2'] += 1
+    assert store.sync('user', sp) == 1
+    assert sp.item_calls == [('p2', 0)]
+    items, _ = store.items('p1')
+    assert len(items) == 50 and items[0]['track'].id == 'track0'
+
+
+def test_snapshot_is_shared_between_followers(tmp_path):
+    store = PlaylistStore(path=str(tmp_path / 'playlists.db'))
+    sp = FakeSpotify({'p1': 3})
+    store.sync('a', sp)
+    sp.item_calls.clear()
+
+    assert store.sync('b', sp) == 0
+    assert sp.item_calls == []
+
+
+def test_background_sync_does_not_use_the_fanout_pool(tmp_path):
+    store = PlaylistStore(path=str(tmp_path / 'playlists.db'))
+    sp = FakeSpotify({'p1': 3})
+
+    store.refresh('user', sp)
+    deadline = time.monotonic() + 2
+    while store.stats()['syncing_users'] and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert sp.item_threads and all(name.startswith('background-sync') for name in sp.item_threads)
+    assert store.stale('user') == []
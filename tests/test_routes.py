@@ -0,0 +1,204 @@
+import gzip
+import re
+
+import brotli
+import pytest
+
+import main
+from paging import STREAM_PAGES, TOP_TRACKS_PAGE_SIZE, decode_cursor
+
+TOKEN_INFO = {'access_token': 'token', 'refresh_token': 'refresh', 'expires_at': 4102444800}
+
+
+def track(i, time_range='medium_term'):
+    return {
+        'id': f'{time_range}-{i}', 'name': f'Música {i}', 'popularity': 50, 'duration_ms': 1000,
+        'artists': [{'id': f'artist{i % 3}', 'name': 'Artista'}], 'album': {'name': 'Álbum'},
+    }
+
+
+class FakeSpotify:
+    """Tops com total controlado pelo teste; registra os offsets pedidos"""
+
+    def __init__(self, total=60, plays=45):
+        self.total = total
+        self.plays = plays
+        self.offsets = []
+        self.fail_offset = None
+
+    def current_user_top_tracks(self, limit, offset, time_range):
+        self.offsets.append(offset)
+        if offset == self.fail_offset:
+            raise RuntimeError('falha na página')
+        ids = range(offset, min(offset + limit, self.total))
+        return {'items': [track(i, time_range) for i in ids], 'total': self.total}
+
+    def current_user_recently_played(self, limit, after=None):
+        if after is not None:
+            return {'items': []}
+        return {'items': [
+            {'played_at': f'2024-01-01T00:{59 - i:02d}:00.000Z', 'track': track(i)} for i in range(min(limit, self.plays))
+        ]}
+
+    def artists(self, ids):
+        return {'artists': [{'id': artist_id, 'name': 'Artista', 'genres': [], 'followers': {'total': 1}} for artist_id in ids]}
+
+
+@pytest.fixture
+def client():
+    return main.app.test_client()
+
+
+@pytest.fixture
+def sp(client, monkeypatch):
+    """Usuário logado com o cliente do Spotify trocado pelo FakeSpotify"""
+    fake = FakeSpotify()
+    monkeypatch.setattr(main, 'get_spotify_client', lambda: fake)
+    with client.session_transaction() as session:
+        session['token_info'] = TOKEN_INFO
+    return fake
+
+
+def asset_urls(html):
+    return re.findall(r'(?:href|src)="(/static/[^"]+)"', html)
+
+
+def test_pages_link_fingerprinted_immutable_assets(client):
+    urls = asset_urls(client.get('/').text)
+
+    assert urls and all(re.search(r'\.[0-9a-f]{12}\.(css|js)$', url) for url in urls)
+    response = client.get(urls[0])
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+    assert client.get(urls[0], headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+
+def test_unversioned_asset_path_is_revalidated(client):
+    response = client.get('/static/js/common.js')
+
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'no-cache'
+    assert client.get('/static/js/missing.js').status_code == 404
+
+
+@pytest.mark.parametrize('accept, encoding, decode', [
+    ('gzip, br', 'br', brotli.decompress),
+    ('gzip', 'gzip', gzip.decompress),
+    ('br;q=0, gzip', 'gzip', gzip.decompress),
+])
+def test_assets_use_the_best_accepted_encoding(client, accept, encoding, decode):
+    plain = client.get('/static/js/lazy_list.js').data
+    response = client.get('/static/js/lazy_list.js', headers={'Accept-Encoding': accept})
+
+    assert response.headers['Content-Encoding'] == encoding
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert decode(response.data) == plain
+
+
+def test_responses_are_compressed_only_when_accepted_and_large(client, sp):
+    plain = client.get('/api/top-tracks')
+    compressed = client.get('/api/top-tracks', headers={'Accept-Encoding': 'gzip'})
+
+    assert 'Content-Encoding' not in plain.headers
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(compressed.data) == plain.data
+    # Pequenas demais para compensar
+    assert 'Content-Encoding' not in client.get('/static/js/common.js', headers={'Accept-Encoding': 'gzip'}).headers
+
+
+def test_streamed_page_and_json_etag_survive_compression(client, sp):
+    plain = client.get('/top-tracks')
+    compressed = client.get('/top-tracks', headers={'Accept-Encoding': 'br'})
+    assert compressed.is_streamed and compressed.headers['Content-Encoding'] == 'br'
+    assert brotli.decompress(compressed.data) == plain.data
+
+    response = client.get('/api/top-tracks', headers={'Accept-Encoding': 'gzip'})
+    etag = response.headers['ETag']
+    # Corpo comprimido: ETag fraco, e ele ainda serve para o 304
+    assert etag.startswith('W/')
+    assert client.get('/api/top-tracks', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag}).status_code == 304
+
+
+def test_json_cursor_walks_every_top_track_once(client, sp):
+    ids, cursor = [], None
+    while True:
+        page = client.get('/api/top-tracks', query_string={'range': 'short_term', 'cursor': cursor or ''}).json
+        ids.extend(item['id'] for item in page['items'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+        assert decode_cursor(cursor)['range'] == 'short_term'
+
+    assert ids == [f'short_term-{i}' for i in range(60)]
+    assert sp.offsets == [0, 25, 50]
+
+
+def test_bad_cursor_is_a_client_error(client, sp):
+    response = client.get('/api/top-tracks?cursor=bm90LWpzb24')
+
+    assert response.status_code == 400
+    assert response.json == {'success': False, 'error': 'Cursor inválido'}
+
+
+def test_streamed_list_loads_later_pages_while_sending(client, sp):
+    response = client.get('/top-tracks')
+    # Só a primeira página antes de responder; a seguinte quando o template chega nela
+    assert response.is_streamed and sp.offsets == [0]
+
+    html = response.get_data(as_text=True)
+    assert sp.offsets == [0, TOP_TRACKS_PAGE_SIZE]
+    assert html.count('Música ') >= STREAM_PAGES * TOP_TRACKS_PAGE_SIZE
+    more = re.search(r'data-cursor="([^"]+)"', html).group(1)
+    assert decode_cursor(more) == {'range': 'medium_term', 'offset': STREAM_PAGES * TOP_TRACKS_PAGE_SIZE}
+
+
+def test_failed_later_page_keeps_its_cursor_in_the_html(client, sp):
+    sp.fail_offset = TOP_TRACKS_PAGE_SIZE
+    html = client.get('/top-tracks').get_data(as_text=True)
+
+    more = re.search(r'data-cursor="([^"]+)"', html).group(1)
+    assert decode_cursor(more)['offset'] == TOP_TRACKS_PAGE_SIZE
+
+
+def test_recent_pages_follow_the_local_history(client, sp):
+    first = client.get('/api/recent').json
+    second = client.get('/api/recent', query_string={'cursor': first['next_cursor']}).json
+
+    played = [item['played_at'] for item in first['items'] + second['items']]
+    assert len(played) == 45 and played == sorted(played, reverse=True)
+    assert second['next_cursor'] is None
+
+
+@pytest.fixture
+def metrics_token(monkeypatch):
+    import metrics
+    monkeypatch.setattr(metrics, 'METRICS_TOKEN', 'scrape')
+    return {'Authorization': 'Bearer scrape'}
+
+
+def test_metrics_need_the_configured_token(client, monkeypatch, metrics_token):
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer outro'}).status_code == 401
+    assert client.get('/metrics', headers=metrics_token).status_code == 200
+
+    import metrics
+    monkeypatch.setattr(metrics, 'METRICS_TOKEN', '')
+    assert client.get('/metrics', headers=metrics_token).status_code == 404
+
+
+@pytest.mark.parametrize('path', ['/api/cache-stats', '/api/scheduler-stats', '/api/transport-stats', '/api/playlist-stats'])
+def test_stats_endpoints_are_gone(client, path):
+    assert client.get(path).status_code == 404
+
+
+def test_metrics_report_routes_spotify_calls_and_components(client, sp, metrics_token):
+    client.get('/api/top-tracks')
+    # Corpo em streaming: a requisição é registrada quando o último byte sai
+    client.get('/top-tracks').get_data()
+
+    text = client.get('/metrics', headers=metrics_token).text
+    assert text.endswith('\n')
+    assert re.search(r'http_requests_total\{route="/api/<any\(dashboard, [^}]*",method="GET",status="200"\} [1-9]', text)
+    assert re.search(r'http_request_duration_seconds_count\{route="/top-tracks",method="GET"\} [1-9]', text)
+    for family in ('cache_hit_ratio', 'scheduler_queue_depth', 'http_pool_reuse_ratio', 'lyrics_cache_bytes'):
+        assert f'# TYPE {family} gauge' in text
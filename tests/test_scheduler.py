@@ -0,0 +1,142 @@
+import threading
+
+import pytest
+
+from scheduler import (
+    BACKGROUND, INTERACTIVE, PLAYBACK, USER_HEADER, RateLimited, RequestScheduler, TokenBucket, retry_after, user_of,
+)
+from transport import create_spotify
+
+
+def enqueue(scheduler, priority, user):
+    entry = (priority, next(scheduler._seq), user)
+    scheduler._enqueue(entry)
+    return entry
+
+
+def test_bucket_refills_at_its_rate(clock):
+    bucket = TokenBucket(rate=2, burst=2)
+    bucket.take()
+    bucket.take()
+
+    assert bucket.wait_time(clock()) == 0.5
+    clock.advance(0.25)
+    assert bucket.wait_time(clock()) == 0.25
+    clock.advance(0.25)
+    assert bucket.wait_time(clock()) == 0.0
+    # Parado por muito tempo não acumula além da rajada
+    clock.advance(60)
+    bucket.wait_time(clock())
+    assert bucket.tokens == 2
+
+
+def test_user_budget_is_enforced_and_refilled(clock):
+    scheduler = RequestScheduler(app_rate=0, user_rate=1, user_burst=1)
+    scheduler.acquire('user')
+
+    with pytest.raises(RateLimited):
+        scheduler.acquire('user', deadline=clock())
+    # Outro usuário tem o próprio balde
+    scheduler.acquire('other')
+    clock.advance(1)
+    scheduler.acquire('user')
+    assert scheduler.stats()['queue_depth'] == 0
+
+
+def test_higher_priority_leaves_first(clock):
+    scheduler = RequestScheduler(app_rate=1, app_burst=1, user_rate=0)
+    scheduler.throttled(1)
+    background = enqueue(scheduler, BACKGROUND, 'a')
+    interactive = enqueue(scheduler, INTERACTIVE, 'b')
+    playback = enqueue(scheduler, PLAYBACK, 'c')
+    clock.advance(2)
+
+    assert scheduler._poll(background, clock()) == (False, None)
+    assert scheduler._poll(interactive, clock()) == (False, None)
+    assert scheduler._poll(playback, clock()) == (True, 0.0)
+    # Sem ficha do app, a próxima da fila espera a reposição
+    assert scheduler._poll(interactive, clock()) == (False, 1.0)
+    clock.advance(1)
+    assert scheduler._poll(interactive, clock()) == (True, 0.0)
+
+
+def test_user_without_tokens_does_not_hold_the_queue(clock):
+    scheduler = RequestScheduler(app_rate=0, user_rate=1, user_burst=1)
+    scheduler.acquire('busy')
+    first = enqueue(scheduler, PLAYBACK, 'busy')
+    second = enqueue(scheduler, BACKGROUND, 'idle')
+
+    # A chamada mais prioritária espera a ficha do seu usuário; a outra passa
+    assert scheduler._poll(first, clock()) == (False, 1.0)
+    assert scheduler._poll(second, clock()) == (True, 0.0)
+    clock.advance(1)
+    assert scheduler._poll(first, clock()) == (True, 0.0)
+
+
+def test_waiter_behind_a_ready_call_sleeps_until_notified(clock):
+    scheduler = RequestScheduler(app_rate=0, user_rate=0)
+    scheduler.throttled(1)
+    first = enqueue(scheduler, PLAYBACK, 'a')
+    released = threading.Event()
+
+    def wait_turn():
+        scheduler.acquire('b', BACKGROUND, deadline=clock() + 10)
+        released.set()
+
+    clock.advance(2)
+    thread = threading.Thread(target=wait_turn)
+    thread.start()
+    # Enquanto a chamada da frente não sai, a de trás não é liberada nem gira
+    assert not released.wait(0.1)
+    with scheduler._cond:
+        assert scheduler._poll(first, clock()) == (True, 0.0)
+        scheduler._cond.notify_all()
+    assert released.wait(1)
+    thread.join()
+
+
+def test_cancelled_entries_leave_the_queue(clock):
+    scheduler = RequestScheduler(app_rate=0, user_rate=0)
+    first = enqueue(scheduler, BACKGROUND, 'a')
+    second = enqueue(scheduler, BACKGROUND, 'a')
+
+    scheduler._dequeue(first, clock())
+
+    assert scheduler._poll(second, clock()) == (True, 0.0)
+    assert scheduler.stats()['queue_depth'] == 0
+
+
+def test_retry_after_header_or_exponential_backoff():
+    assert retry_after({'Retry-After': '3'}, 0) == 3
+    assert [retry_after({}, attempt) for attempt in range(3)] == [1, 2, 4]
+    assert retry_after({'Retry-After': '3600'}, 0) == 60
+
+
+def test_throttle_pauses_the_queue(clock):
+    scheduler = RequestScheduler(app_rate=0, user_rate=0)
+    scheduler.throttled(retry_after({'Retry-After': '2'}, 0))
+    entry = enqueue(scheduler, PLAYBACK, 'user')
+
+    assert scheduler._poll(entry, clock()) == (False, 2)
+    clock.advance(2)
+    assert scheduler._poll(entry, clock()) == (True, 0.0)
+
+
+def test_pause_beyond_the_deadline_fails_fast(clock):
+    scheduler = RequestScheduler(app_rate=0, user_rate=0)
+    scheduler.throttled(30)
+
+    with pytest.raises(RateLimited, match='30s'):
+        scheduler.acquire('user', deadline=clock() + 5)
+    assert scheduler.stats()['expired'] == 1
+    assert scheduler.stats()['queue_depth'] == 0
+
+
+def test_budget_follows_the_user_across_token_refreshes():
+    assert user_of('user', 'Bearer old') == user_of('user', 'Bearer new')
+    assert user_of(None, 'Bearer old') != user_of(None, 'Bearer new')
+
+
+def test_spotify_client_tags_calls_with_the_user_key():
+    assert create_spotify('token', 'user')._auth_headers()[USER_HEADER] == 'user'
+    assert USER_HEADER not in create_spotify('token')._auth_headers()
@@ -0,0 +1,84 @@
+from search_index import SUGGEST_MIN_LOCAL, SearchIndex, TrackIndex
+
+
+def track(i, name, artist='Artista', album='Álbum', popularity=50):
+    return {
+        'id': f'track{i}', 'name': name, 'popularity': popularity, 'duration_ms': 1000,
+        'artists': [{'id': 'a', 'name': artist}], 'album': {'name': album},
+    }
+
+
+def spotify_results(items, total=None):
+    return {'tracks': {'items': items, 'total': len(items) if total is None else total}}
+
+
+def test_every_term_is_a_word_prefix_ignoring_case_and_accents():
+    index = TrackIndex()
+    index.add([track(1, 'Música Lenta', 'Caetano'), track(2, 'Música Rápida', 'Gil'), track(3, 'Outra')])
+
+    assert {view['id'] for view in index.search('musi', 10)} == {'track1', 'track2'}
+    assert [view['id'] for view in index.search('MÚS cae', 10)] == ['track1']
+    assert index.search('musica zz', 10) == []
+
+
+def test_name_matches_rank_before_popularity():
+    index = TrackIndex()
+    index.add([track(1, 'Outra', album='Sol', popularity=90), track(2, 'Sol Nascente', popularity=10)])
+
+    assert [view['id'] for view in index.search('sol', 10)] == ['track2', 'track1']
+
+
+def test_oldest_tracks_leave_the_index():
+    index = TrackIndex(max_tracks=2)
+    index.add([track(1, 'Primeira'), track(2, 'Segunda'), track(3, 'Terceira')])
+
+    assert len(index) == 2
+    assert index.search('primeira', 10) == []
+
+
+def test_completed_query_answers_only_extensions_of_its_last_term():
+    index = TrackIndex()
+    index.mark_complete('ab')
+
+    assert index.is_complete('ab')
+    assert index.is_complete('Abc')
+    # Termo a termo: um termo a mais não é a mesma consulta
+    assert not index.is_complete('ab c')
+    assert not index.is_complete('a')
+
+    index.mark_complete('ab c')
+    assert index.is_complete('ab cd')
+    assert not index.is_complete('abx c')
+    assert not index.is_complete('c ab')
+
+
+def test_lookup_goes_upstream_until_the_answer_is_complete():
+    search = SearchIndex()
+    search.add('user', [track(1, 'Sol')])
+
+    items, upstream = search.lookup('user', 'so')
+    assert len(items) < SUGGEST_MIN_LOCAL and upstream == 'so'
+
+    merged = search.merge_upstream('user', 'so', items, spotify_results([track(1, 'Sol'), track(2, 'Sonho')]))
+    assert [view['id'] for view in merged] == ['track1', 'track2']
+
+    # A resposta veio inteira: 'son' é só filtro local, 'so n' ainda vai ao Spotify
+    assert search.lookup('user', 'son') == ([merged[1]], None)
+    assert search.lookup('user', 'so n')[1] == 'so n'
+    assert search.stats()['upstream_calls'] == 1
+
+
+def test_partial_upstream_answer_is_not_marked_complete():
+    search = SearchIndex()
+    search.merge_upstream('user', 'so', [], spotify_results([track(1, 'Sol')], total=50))
+
+    assert search.lookup('user', 'sol')[1] == 'sol'
+
+
+def test_indexes_are_per_user():
+    search = SearchIndex()
+    search.add('a', [track(1, 'Sol')])
+
+    assert search.lookup('b', 's') == ([], None)
+    search.discard('a')
+    assert search.stats()['users'] == 1
@@ -0,0 +1,118 @@
+import pytest
+from flask import Flask, session
+
+from cache import FakeRedis
+from sessions import MemorySessionStore, RedisSessionStore, ServerSideSessionInterface
+
+
+@pytest.fixture(params=['memory', 'fake-redis'])
+def store(request):
+    return MemorySessionStore() if request.param == 'memory' else RedisSessionStore(FakeRedis())
+
+
+@pytest.fixture
+def client(store):
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.session_interface = ServerSideSessionInterface(store, ttl=60)
+
+    @app.route('/login')
+    def login():
+        session.rotate()
+        session['token_info'] = {'access_token': 'token'}
+        return 'ok'
+
+    @app.route('/whoami')
+    def whoami():
+        return session.get('token_info', {}).get('access_token', 'anonymous')
+
+    @app.route('/logout')
+    def logout():
+        session.clear()
+        return 'ok'
+
+    return app.test_client()
+
+
+def session_id(client):
+    cookie = client.get_cookie('session')
+    return cookie.value if cookie else None
+
+
+def test_round_trip_keeps_data_on_the_server(client, store):
+    client.get('/login')
+    sid = session_id(client)
+
+    assert client.get('/whoami').text == 'token'
+    # O cookie leva só o ID opaco; os dados estão no store
+    assert 'token' not in sid
+    assert store.get(sid) == {'token_info': {'access_token': 'token'}}
+
+
+def test_anonymous_visit_sets_no_cookie(client):
+    assert client.get('/whoami').text == 'anonymous'
+    assert session_id(client) is None
+
+
+def test_login_rotates_the_session_id(client, store):
+    client.get('/login')
+    first = session_id(client)
+    client.get('/login')
+    second = session_id(client)
+
+    assert first != second
+    assert store.get(first) is None
+    assert client.get('/whoami').text == 'token'
+
+
+def test_logout_deletes_server_data(client, store):
+    client.get('/login')
+    sid = session_id(client)
+    client.get('/logout')
+
+    assert store.get(sid) is None
+    assert session_id(client) is None
+    assert client.get('/whoami').text == 'anonymous'
+
+
+def test_session_expires_without_use(store, clock):
+    interface = ServerSideSessionInterface(store, ttl=60)
+    session_ = interface.load(None)
+    session_['user_key'] = 'user'
+    assert interface.persist(session_) == 'set'
+
+    clock.advance(30)
+    assert interface.load(session_.sid).get('user_key') == 'user'
+    # Cada uso renova o prazo (expiração deslizante)
+    interface.persist(interface.load(session_.sid))
+    clock.advance(45)
+    assert interface.load(session_.sid).get('user_key') == 'user'
+
+    clock.advance(61)
+    assert interface.load(session_.sid).new
+
+
+def test_cookie_lasts_as_long_as_the_server_side_session(store):
+    app = Flask(__name__)
+    app.config.update(PERMANENT_SESSION_LIFETIME=60, SESSION_COOKIE_SECURE=True, SESSION_COOKIE_SAMESITE='Lax')
+    app.session_interface = ServerSideSessionInterface(store, ttl=60)
+
+    @app.route('/login')
+    def login():
+        session['user_key'] = 'user'
+        return 'ok'
+
+    @app.route('/whoami')
+    def whoami():
+        return session.get('user_key', 'anonymous')
+
+    client = app.test_client()
+    cookie = client.get('/login').headers['Set-Cookie']
+    # Sobrevive ao fechar o navegador e segue SESSION_COOKIE_*
+    assert 'Max-Age=60' in cookie and 'Expires=' in cookie
+    assert 'Secure' in cookie and 'HttpOnly' in cookie and 'SameSite=Lax' in cookie
+
+    # Cada uso renova também a validade do cookie
+    assert 'Max-Age=60' in client.get('/whoami').headers['Set-Cookie']
+    app.config['SESSION_REFRESH_EACH_REQUEST'] = False
+    assert 'Set-Cookie' not in client.get('/whoami').headers
@@ -0,0 +1,105 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from cache import FlightCancelled, SingleFlight
+from fanout import FanOutTimeout, fan_out_async
+
+
+def test_concurrent_calls_share_one_upstream_call():
+    flights = SingleFlight()
+    calls = []
+    started = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return 'value'
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flights.do('key', 'endpoint', fetch)))
+    leader.start()
+    started.wait()
+    followers = [threading.Thread(target=lambda: results.append(flights.do('key', 'endpoint', fetch))) for _ in range(4)]
+    for thread in followers:
+        thread.start()
+    for thread in [leader, *followers]:
+        thread.join()
+
+    assert results == ['value'] * 5
+    assert len(calls) == 1
+    assert flights.stats()['saved_calls'] == 4
+    assert flights.stats()['in_flight'] == 0
+
+
+def test_leader_error_reaches_followers_and_releases_key():
+    flights = SingleFlight()
+
+    def fail():
+        raise ValueError('boom')
+
+    with pytest.raises(ValueError):
+        flights.do('key', 'endpoint', fail)
+    assert flights.do('key', 'endpoint', lambda: 'ok') == 'ok'
+
+
+def test_cancelled_async_leader_releases_key():
+    flights = SingleFlight()
+
+    async def slow():
+        await asyncio.sleep(10)
+
+    async def fast():
+        return 'ok'
+
+    async def scenario():
+        leader = asyncio.ensure_future(flights.do_async('key', 'endpoint', slow))
+        follower = asyncio.ensure_future(flights.do_async('key', 'endpoint', slow))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        # Quem esperava recebe um erro comum, não fica preso
+        with pytest.raises(FlightCancelled):
+            await asyncio.wait_for(follower, 1)
+        assert flights.stats()['in_flight'] == 0
+        return await asyncio.wait_for(flights.do_async('key', 'endpoint', fast), 1)
+
+    assert asyncio.run(scenario()) == 'ok'
+
+
+def test_cancelled_follower_does_not_cancel_leader():
+    flights = SingleFlight()
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return 'value'
+
+    async def scenario():
+        leader = asyncio.ensure_future(flights.do_async('key', 'endpoint', slow))
+        follower = asyncio.ensure_future(flights.do_async('key', 'endpoint', slow))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+        return await leader
+
+    assert asyncio.run(scenario()) == 'value'
+
+
+def test_fan_out_timeout_does_not_leave_key_in_flight():
+    flights = SingleFlight()
+
+    async def slow():
+        await asyncio.sleep(10)
+
+    async def fast():
+        return 'ok'
+
+    async def scenario():
+        with pytest.raises(FanOutTimeout):
+            await fan_out_async({'slow': flights.do_async('key', 'endpoint', slow)}, timeout=0.05)
+        return await asyncio.wait_for(flights.do_async('key', 'endpoint', fast), 1)
+
+    assert asyncio.run(scenario()) == 'ok'
@@ -0,0 +1,140 @@
+import threading
+import time
+
+import pytest
+
+from cache import FakeRedis
+from tokens import MemoryTokenStore, RedisTokenStore, TokenManager, TokenRefreshTimeout
+
+
+class FakeOAuth:
+    """Renovação lenta que conta quantas vezes o refresh token foi usado"""
+
+    calls = 0
+    lock = threading.Lock()
+
+    def __init__(self, cache_handler):
+        self.cache_handler = cache_handler
+
+    def refresh_access_token(self, refresh_token):
+        with FakeOAuth.lock:
+            FakeOAuth.calls += 1
+        time.sleep(0.1)
+        token_info = {'access_token': 'new', 'refresh_token': refresh_token, 'expires_at': time.time() + 3600}
+        # Como o spotipy: o token novo é gravado pelo cache handler
+        self.cache_handler.save_token_to_cache(token_info)
+        return token_info
+
+
+@pytest.fixture(autouse=True)
+def reset_oauth():
+    FakeOAuth.calls = 0
+
+
+def expiring():
+    return {'access_token': 'old', 'refresh_token': 'refresh', 'expires_at': time.time() + 10}
+
+
+def concurrently(fn, n=10):
+    results = [None] * n
+    barrier = threading.Barrier(n)
+
+    def run(i):
+        barrier.wait()
+        results[i] = fn(i)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_valid_token_is_returned_without_refresh():
+    manager = TokenManager(MemoryTokenStore(), FakeOAuth)
+    token_info = {'access_token': 'ok', 'refresh_token': 'refresh', 'expires_at': time.time() + 3600}
+
+    assert manager.get_token('user', token_info) == token_info
+    assert FakeOAuth.calls == 0
+
+
+def test_concurrent_requests_share_one_refresh():
+    manager = TokenManager(MemoryTokenStore(), FakeOAuth)
+    manager.save('user', expiring())
+
+    tokens = concurrently(lambda i: manager.get_token('user'))
+
+    assert FakeOAuth.calls == 1
+    assert {token['access_token'] for token in tokens} == {'new'}
+    assert manager.store.get('user')['access_token'] == 'new'
+
+
+def test_workers_sharing_redis_refresh_once():
+    client = FakeRedis()
+    # Um TokenManager por worker, todos sobre o mesmo Redis
+    workers = [TokenManager(RedisTokenStore(client), FakeOAuth) for _ in range(4)]
+    workers[0].save('user', expiring())
+
+    tokens = concurrently(lambda i: workers[i % len(workers)].get_token('user'), n=8)
+
+    assert FakeOAuth.calls == 1
+    assert {token['access_token'] for token in tokens} == {'new'}
+
+
+def test_session_token_is_adopted_when_store_is_empty():
+    manager = TokenManager(MemoryTokenStore(), FakeOAuth)
+    token_info = {'access_token': 'ok', 'refresh_token': 'refresh', 'expires_at': time.time() + 3600}
+
+    assert manager.get_token('user', fallback=token_info) == token_info
+    assert manager.store.get('user') == token_info
+
+
+def test_waiter_does_not_refresh_or_release_another_workers_lock(monkeypatch):
+    monkeypatch.setattr('tokens.REFRESH_WAIT', 0.2)
+    client = FakeRedis()
+    store = RedisTokenStore(client)
+    owner = store.try_lock('user', 5)
+    manager = TokenManager(store, FakeOAuth)
+    # Ainda válido, só dentro da margem: serve enquanto o outro worker não termina
+    token_info = expiring()
+    manager.save('user', token_info)
+
+    assert manager.get_token('user') == token_info
+    assert FakeOAuth.calls == 0
+    assert client.get('spotify-token:lock:user') == owner.encode()
+
+
+def test_waiter_times_out_on_expired_token(monkeypatch):
+    monkeypatch.setattr('tokens.REFRESH_WAIT', 0.2)
+    store = RedisTokenStore(FakeRedis())
+    store.try_lock('user', 5)
+    manager = TokenManager(store, FakeOAuth)
+    manager.save('user', {'access_token': 'old', 'refresh_token': 'refresh', 'expires_at': time.time() - 1})
+
+    with pytest.raises(TokenRefreshTimeout):
+        manager.get_token('user')
+    assert FakeOAuth.calls == 0
+
+
+def test_unlock_keeps_a_lock_taken_over_by_another_worker():
+    client = FakeRedis()
+    store = RedisTokenStore(client)
+    stale = store.try_lock('user', 5)
+    # O lock expirou e outro worker o pegou
+    client.delete('spotify-token:lock:user')
+    current = store.try_lock('user', 5)
+
+    store.unlock('user', stale)
+
+    assert client.get('spotify-token:lock:user') == current.encode()
+
+
+def test_discard_drops_the_user_lock():
+    manager = TokenManager(MemoryTokenStore(), FakeOAuth)
+    manager.save('user', expiring())
+    manager.get_token('user')
+
+    manager.discard('user')
+
+    assert 'user' not in manager._locks
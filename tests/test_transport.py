@@ -0,0 +1,50 @@
+import requests
+
+from scheduler import USER_HEADER
+from transport import SPOTIFY_API_URL, build_session, create_spotify
+
+
+def retry_of(session):
+    return session.get_adapter(SPOTIFY_API_URL).max_retries
+
+
+def test_reads_are_retried_on_server_errors():
+    retry = retry_of(build_session(scheduler=None))
+
+    assert retry.is_retry('GET', 503)
+
+
+def test_player_commands_are_not_replayed_on_server_errors():
+    retry = retry_of(build_session(scheduler=None))
+
+    for method in ('POST', 'PUT', 'DELETE'):
+        assert not retry.is_retry(method, 503)
+
+
+def test_user_header_feeds_the_scheduler_and_is_not_sent():
+    seen = {}
+
+    class Scheduler:
+        deadline = 5
+
+        def acquire(self, user, priority, deadline):
+            seen['user'] = user
+
+    session = build_session(scheduler=Scheduler())
+    adapter = session.get_adapter(SPOTIFY_API_URL)
+
+    def fake_send(request, **kwargs):
+        seen['headers'] = dict(request.headers)
+        response = requests.Response()
+        response.status_code = 200
+        return response
+
+    adapter._send = fake_send
+    request = requests.Request(
+        'GET', SPOTIFY_API_URL + 'me/', headers=create_spotify('token', 'user')._auth_headers(),
+    ).prepare()
+    adapter.send(request)
+
+    assert seen['user'] == 'user'
+    assert USER_HEADER not in seen['headers']
+    assert seen['headers']['Authorization'] == 'Bearer token'